@@ -85,9 +85,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than SQLite's default in-memory test database, so that
+        # tests can reach it from several threads (booking/tests.py)
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
+# Cache
+# Cached public pages and the versions invalidating them, form choices, the
+# autocomplete index version, notification inbox versions and badge counts
+# live here. Deployments with several worker processes need a shared backend
+# (e.g. Redis or Memcached); check --deploy warns (tours.W001) otherwise.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# Seconds before a cache version key (page tags, choices, autocomplete,
+# notification inboxes) is renewed even without a change. Bounds how long a
+# process can serve content another process has already invalidated.
+CACHE_VERSION_TIMEOUT = 60 * 5
+
+# Sessions are read through the cache so conditional notification polls
+# can be answered without touching the database.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -171,6 +195,27 @@ EMAIL_SUBJECT_PREFIX = '[UWA Tours] '
 # NOTIFICATION_FROM_EMAIL = config('NOTIFICATION_FROM_EMAIL', default=DEFAULT_FROM_EMAIL)
 # NOTIFICATION_FROM_PHONE = config('NOTIFICATION_FROM_PHONE', default=TWILIO_PHONE_NUMBER)
 
+# Tour search
+# SQLite FTS5 index kept in sync on save. Without its table (databases other
+# than SQLite, test databases built without migrations) it falls back to
+# 'tours.search.IcontainsSearchBackend', which can also be set directly.
+TOUR_SEARCH_BACKEND = 'tours.search.SqliteFTS5SearchBackend'
+
+# Booking holds
+# Slots of a pending booking are held this long while the tourist pays.
+BOOKING_HOLD_MINUTES = 30
+# Expired holds are released by the expire_pending_bookings command, run from
+# cron or another scheduler (e.g. every minute).
+# Seconds between sweeps of an in-process sweeper thread instead; 0 (the
+# default) disables it. Single-process deployments only: every server process
+# would start its own.
+BOOKING_HOLD_SWEEP_INTERVAL = 0
+
+# Live slot counts (availability_stream, served under ASGI)
+# The in-process backend only reaches viewers connected to the process
+# making the change; several workers need a backend relaying between them.
+SLOT_EVENTS_BACKEND = 'booking.slot_events.InProcessSlotEvents'
+
 # Authentication settings
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/'
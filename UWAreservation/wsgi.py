@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'UWAreservation.settings')
 
 application = get_wsgi_application()
+
+# Release slots held by pending bookings whose payment was abandoned, when
+# BOOKING_HOLD_SWEEP_INTERVAL enables the in-process sweeper (single process only)
+from booking.sweeper import start_hold_sweeper  # noqa: E402
+
+start_hold_sweeper()
+
+# Prefix index behind the tour search typeahead
+from tours.autocomplete import warm_autocomplete  # noqa: E402
+
+warm_autocomplete()
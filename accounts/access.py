@@ -0,0 +1,28 @@
+"""
+Version of what a user may see and do: their roles and account flags.
+
+Conditional pages (tours.page_cache.conditional_page) put it in their ETag,
+so that a role change shows the buttons that go with it on the next visit.
+Like the notification inbox version, it lives in the cache only.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def access_version_key(user_id):
+    return f'user_access_version:{user_id}'
+
+
+def get_access_version(user_id):
+    """Current access version of a user; created on first use"""
+    return cache.get_or_set(access_version_key(user_id), lambda: uuid4().hex, settings.CACHE_VERSION_TIMEOUT)
+
+
+def bump_access_version(user_id):
+    """Mark the roles or flags of a user as changed once the transaction commits"""
+    transaction.on_commit(
+        lambda: cache.set(access_version_key(user_id), uuid4().hex, settings.CACHE_VERSION_TIMEOUT)
+    )
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import Profile, NotificationSettings, Wishlist, UserRole
+from .models import Profile, NotificationSettings, Wishlist, UserRole, Notification
 
 @admin.register(UserRole)
 class UserRoleAdmin(admin.ModelAdmin):
@@ -52,6 +52,13 @@ class WishlistAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'tour__name')
     date_hierarchy = 'added_at'
 
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('user', 'title', 'notification_type', 'is_read', 'created_at')
+    list_filter = ('notification_type', 'is_read')
+    search_fields = ('user__username', 'title')
+    date_hierarchy = 'created_at'
+
 # Use the default UserAdmin without inline
 # Users and Profiles will be managed separately
 admin.site.unregister(User)
@@ -1,44 +1,47 @@
-from datetime import datetime, timedelta
-from django.db.models import Count, Q
-from booking.models import Booking
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+from .models import Notification
 
+# Inbox writes clear the cached count; the timeout only bounds staleness
+# if a writer bypasses them.
+NOTIFICATION_BADGE_TIMEOUT = 60 * 60
 
-def notifications(request):
+
+def notification_badge_cache_key(user_id):
+    return f'notification_badge:{user_id}'
+
+
+def clear_notification_badge(user_id):
+    """Forget the cached badge count of a user (called on inbox changes)"""
+    cache.delete(notification_badge_cache_key(user_id))
+
+
+def get_unread_notification_count(user):
     """
-    Context processor to provide notification count across all templates
+    Unread notification count for the badge, served from the cache.
+    A miss counts the unread rows of the user's inbox.
     """
-    if not request.user.is_authenticated:
-        return {'unread_notifications': 0}
-    
-    # Calculate unread notifications (same logic as profile view)
-    unread_notifications = 0
-    
-    # 1. Check for upcoming tours (next 7 days)
-    upcoming_tours = Booking.objects.filter(
-        tourist=request.user,
-        booking_status='confirmed',
-        availability__date__gte=datetime.now().date(),
-        availability__date__lte=datetime.now().date() + timedelta(days=7)
-    ).count()
+    cache_key = notification_badge_cache_key(user.id)
+    unread_notifications = cache.get(cache_key)
+    if unread_notifications is not None:
+        return unread_notifications
     
-    unread_notifications += upcoming_tours
+    unread_notifications = Notification.objects.filter(user=user, is_read=False).count()
     
-    # 2. Check for recent booking confirmations (last 30 days)
-    recent_confirmations = Booking.objects.filter(
-        tourist=request.user,
-        booking_status='confirmed',
-        booking_date__gte=datetime.now() - timedelta(days=30)
-    ).count()
-    
-    unread_notifications += min(recent_confirmations, 3)  # Cap at 3 to avoid too many notifications
-    
-    # 3. Add promotional notifications
-    total_bookings = Booking.objects.filter(tourist=request.user).count()
-    if total_bookings == 0:
-        unread_notifications += 1  # Welcome/first booking discount
-    elif total_bookings in [5, 10, 25]:  # Milestones
-        unread_notifications += 1  # Milestone achievement notification
+    cache.set(cache_key, unread_notifications, NOTIFICATION_BADGE_TIMEOUT)
+    return unread_notifications
+
+
+def notifications(request):
+    """
+    Context processor to provide notification count across all templates.
+    The count is lazy: templates that never show the badge cost nothing.
+    """
+    def unread_notifications():
+        if not request.user.is_authenticated:
+            return 0
+        return get_unread_notification_count(request.user)
     
     return {
-        'unread_notifications': unread_notifications,
+        'unread_notifications': SimpleLazyObject(unread_notifications),
     }
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from accounts.notifications import refresh_notifications
+
+
+class Command(BaseCommand):
+    help = 'Write date-driven inbox notifications (upcoming tours, achievements) and backfill missing ones. Run periodically, e.g. hourly from cron.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            written = refresh_notifications()
+
+        users = written.pop('users')
+        for notification_type, count in written.items():
+            self.stdout.write(f'{notification_type}: {count} new')
+        self.stdout.write(
+            self.style.SUCCESS(f'Notification inboxes refreshed for {users} users')
+        )
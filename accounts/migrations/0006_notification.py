@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_userrole_remove_profile_role_profile_created_at_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='Stable identifier (e.g. confirmed_12) that keeps writers idempotent', max_length=100)),
+                ('notification_type', models.CharField(choices=[('upcoming', 'Upcoming Tour'), ('confirmation', 'Booking Confirmed'), ('welcome', 'Welcome'), ('achievement', 'Achievement')], max_length=20)),
+                ('title', models.CharField(max_length=255)),
+                ('message', models.TextField()),
+                ('url', models.CharField(blank=True, max_length=200)),
+                ('is_read', models.BooleanField(default=False)),
+                ('read_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['user', '-created_at', '-id'], name='accounts_notif_user_created'), models.Index(fields=['user', 'is_read'], name='accounts_notif_user_unread')],
+                'unique_together': {('user', 'key')},
+            },
+        ),
+    ]
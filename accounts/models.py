@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.functional import cached_property
 
 
 class UserRole(models.Model):
@@ -70,9 +72,23 @@ class Profile(models.Model):
         """Return comma-separated list of user roles"""
         return ", ".join([role.get_name_display() for role in self.roles.all()])
     
+    @cached_property
+    def role_names(self):
+        """
+        Names of the user's roles, loaded once per profile instance (and so
+        once per request for request.user). Uses prefetched roles when present.
+        """
+        if 'roles' in getattr(self, '_prefetched_objects_cache', {}):
+            return frozenset(role.name for role in self.roles.all())
+        return frozenset(self.roles.values_list('name', flat=True))
+    
+    def clear_role_cache(self):
+        """Forget the cached role names after the roles have changed"""
+        self.__dict__.pop('role_names', None)
+    
     def has_role(self, role_name):
         """Check if user has a specific role"""
-        return self.roles.filter(name=role_name).exists()
+        return role_name in self.role_names
     
     def is_tourist(self):
         return self.has_role('tourist')
@@ -128,4 +144,73 @@ class Wishlist(models.Model):
         ordering = ['-added_at']
     
     def __str__(self):
-        return f"{self.user.username} - {self.tour.name}"
\ No newline at end of file
+        return f"{self.user.username} - {self.tour.name}"
+
+
+class Notification(models.Model):
+    """Materialised in-app notification shown in the navbar dropdown"""
+    NOTIFICATION_TYPES = [
+        ('upcoming', 'Upcoming Tour'),
+        ('confirmation', 'Booking Confirmed'),
+        ('welcome', 'Welcome'),
+        ('achievement', 'Achievement'),
+    ]
+    
+    # Dropdown styling per type: (icon, color, bg_color)
+    TYPE_STYLES = {
+        'upcoming': ('calendar-check', 'text-orange-600', 'bg-orange-50'),
+        'confirmation': ('check-circle', 'text-green-600', 'bg-green-50'),
+        'welcome': ('gift', 'text-blue-600', 'bg-blue-50'),
+        'achievement': ('award', 'text-purple-600', 'bg-purple-50'),
+    }
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='inbox_notifications')
+    key = models.CharField(max_length=100, help_text="Stable identifier (e.g. confirmed_12) that keeps writers idempotent")
+    notification_type = models.CharField(max_length=20, choices=NOTIFICATION_TYPES)
+    
+    # Content
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    url = models.CharField(max_length=200, blank=True)
+    
+    # Read state
+    is_read = models.BooleanField(default=False)
+    read_at = models.DateTimeField(null=True, blank=True)
+    
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        unique_together = ['user', 'key']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='accounts_notif_user_created'),
+            models.Index(fields=['user', 'is_read'], name='accounts_notif_user_unread'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.title}"
+    
+    def to_dict(self):
+        """Representation used by the notification dropdown"""
+        icon, color, bg_color = self.TYPE_STYLES.get(self.notification_type, ('bell', 'text-gray-600', 'bg-gray-50'))
+        
+        if self.notification_type == 'upcoming':
+            time_text = 'Upcoming'
+        elif self.notification_type in ('welcome', 'achievement') and not self.is_read:
+            time_text = 'New'
+        else:
+            days_ago = (timezone.now().date() - self.created_at.date()).days
+            time_text = 'Today' if days_ago == 0 else f'{days_ago} day{"s" if days_ago > 1 else ""} ago'
+        
+        return {
+            'id': self.key,
+            'type': self.notification_type,
+            'title': self.title,
+            'message': self.message,
+            'time': time_text,
+            'icon': icon,
+            'color': color,
+            'bg_color': bg_color,
+            'url': self.url,
+            'is_read': self.is_read,
+        }
@@ -0,0 +1,206 @@
+"""
+Writers for the persistent notification inbox.
+
+Every inbox change bumps a per-user version kept in the cache. The version
+is the ETag of the dropdown endpoint, so idle polls are answered with a 304
+before the database is touched.
+"""
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .context_processors import clear_notification_badge
+from .models import Notification
+
+UPCOMING_DAYS = 7
+CONFIRMATION_DAYS = 30
+ACHIEVEMENT_STEP = 5
+
+MY_BOOKINGS_URL = '/booking/my-bookings/'
+
+
+def inbox_version_key(user_id):
+    return f'notification_inbox_version:{user_id}'
+
+
+def get_inbox_version(user_id):
+    """Current inbox version of a user; created on first use"""
+    return cache.get_or_set(inbox_version_key(user_id), lambda: uuid4().hex, settings.CACHE_VERSION_TIMEOUT)
+
+
+def bump_inbox_version(user_id):
+    """Mark the inbox of a user as changed once the transaction commits"""
+    def bump():
+        cache.set(inbox_version_key(user_id), uuid4().hex, settings.CACHE_VERSION_TIMEOUT)
+        clear_notification_badge(user_id)
+    transaction.on_commit(bump)
+
+
+def _upcoming_notification(user_id, booking_id, tour_name, date):
+    return Notification(
+        user_id=user_id,
+        key=f'upcoming_{booking_id}',
+        notification_type='upcoming',
+        title=f'Upcoming Tour: {tour_name}',
+        message=f'Your tour is scheduled for {date.strftime("%B %d, %Y")}',
+        url=MY_BOOKINGS_URL,
+    )
+
+
+def _confirmation_notification(user_id, booking_id, tour_name, created_at=None):
+    return Notification(
+        user_id=user_id,
+        key=f'confirmed_{booking_id}',
+        notification_type='confirmation',
+        title='Booking Confirmed',
+        message=f'{tour_name} has been confirmed',
+        url=MY_BOOKINGS_URL,
+        created_at=created_at or timezone.now(),
+    )
+
+
+def _welcome_notification(user_id):
+    return Notification(
+        user_id=user_id,
+        key='welcome',
+        notification_type='welcome',
+        title='Welcome to UWA Wildlife Tours!',
+        message='Get 10% off your first booking with code WELCOME10',
+        url='/tours/',
+    )
+
+
+def _achievement_notification(user_id, completed):
+    return Notification(
+        user_id=user_id,
+        key=f'achievement_{completed}',
+        notification_type='achievement',
+        title='Achievement Unlocked!',
+        message=f'You\'ve completed {completed} tours! You\'re a true wildlife explorer.',
+        url='/accounts/profile/',
+    )
+
+
+def _store(notifications):
+    """Insert notifications, skipping keys a user already has; returns affected user ids"""
+    if not notifications:
+        return set()
+    Notification.objects.bulk_create(notifications, ignore_conflicts=True)
+    user_ids = {notification.user_id for notification in notifications}
+    for user_id in user_ids:
+        bump_inbox_version(user_id)
+    return user_ids
+
+
+def notify_welcome(user):
+    _store([_welcome_notification(user.id)])
+
+
+def notify_booking_created(booking):
+    """The welcome offer is for users without bookings"""
+    Notification.objects.filter(user_id=booking.tourist_id, key='welcome').delete()
+
+
+def notify_booking_confirmed(booking):
+    availability = booking.availability
+    tour_name = availability.tour.name
+    notifications = [_confirmation_notification(booking.tourist_id, booking.id, tour_name)]
+
+    today = timezone.localdate()
+    if today <= availability.date <= today + timedelta(days=UPCOMING_DAYS):
+        notifications.append(_upcoming_notification(booking.tourist_id, booking.id, tour_name, availability.date))
+    _store(notifications)
+
+
+def withdraw_booking_notifications(booking):
+    """Drop the notifications of a booking that is cancelled or deleted"""
+    Notification.objects.filter(
+        user_id=booking.tourist_id,
+        key__in=[f'upcoming_{booking.id}', f'confirmed_{booking.id}'],
+    ).delete()
+
+
+def mark_notifications_read(user, keys=None):
+    """Mark the given notification keys (or the whole inbox) as read"""
+    unread = Notification.objects.filter(user=user, is_read=False)
+    if keys is not None:
+        unread = unread.filter(key__in=keys)
+    updated = unread.update(is_read=True, read_at=timezone.now())
+    if updated:
+        bump_inbox_version(user.id)
+    return updated
+
+
+def refresh_notifications():
+    """
+    Periodic job: write the date-driven notifications that no booking event
+    produces (upcoming tours, milestones) and backfill missing ones.
+    Returns the number of notifications written per type.
+    """
+    from booking.models import Booking
+
+    today = timezone.localdate()
+    now = timezone.now()
+    written = {}
+    affected_users = set()
+
+    def store(notification_type, notifications):
+        existing = set(Notification.objects.filter(
+            notification_type=notification_type,
+            user_id__in={notification.user_id for notification in notifications},
+        ).values_list('user_id', 'key'))
+        new = [n for n in notifications if (n.user_id, n.key) not in existing]
+        affected_users.update(_store(new))
+        written[notification_type] = len(new)
+
+    # 1. Upcoming tours (next 7 days)
+    upcoming = Booking.objects.filter(
+        booking_status='confirmed',
+        availability__date__gte=today,
+        availability__date__lte=today + timedelta(days=UPCOMING_DAYS),
+    ).values_list('id', 'tourist_id', 'availability__tour__name', 'availability__date')
+    store('upcoming', [
+        _upcoming_notification(tourist_id, booking_id, tour_name, date)
+        for booking_id, tourist_id, tour_name, date in upcoming
+    ])
+
+    # Tours that have taken place are no longer upcoming
+    expired = Notification.objects.filter(
+        notification_type='upcoming',
+        created_at__lt=now - timedelta(days=UPCOMING_DAYS + 1),
+    )
+    expired_users = set(expired.values_list('user_id', flat=True))
+    expired.delete()  # Bumps the inboxes (see accounts/signals.py)
+    affected_users.update(expired_users)
+
+    # 2. Recent booking confirmations (last 30 days)
+    confirmations = Booking.objects.filter(
+        booking_status='confirmed',
+        booking_date__gte=now - timedelta(days=CONFIRMATION_DAYS),
+    ).values_list('id', 'tourist_id', 'availability__tour__name', 'booking_date')
+    store('confirmation', [
+        _confirmation_notification(tourist_id, booking_id, tour_name, booking_date)
+        for booking_id, tourist_id, tour_name, booking_date in confirmations
+    ])
+
+    # 3. Welcome message for users without bookings
+    new_users = User.objects.filter(bookings__isnull=True).values_list('id', flat=True)
+    store('welcome', [_welcome_notification(user_id) for user_id in new_users])
+
+    # 4. Achievement notifications (every 5 completed tours)
+    completed = Booking.objects.filter(booking_status='completed').values('tourist_id').annotate(
+        completed=Count('id')
+    ).filter(completed__gte=ACHIEVEMENT_STEP)
+    store('achievement', [
+        _achievement_notification(row['tourist_id'], row['completed'] - row['completed'] % ACHIEVEMENT_STEP)
+        for row in completed
+    ])
+
+    written['users'] = len(affected_users)
+    return written
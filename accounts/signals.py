@@ -1,8 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 from django.db import transaction
-from .models import Profile
+from booking.models import Booking
+from booking.signals import booking_status_changed
+from .models import Notification, Profile
+from . import notifications
+from .access import bump_access_version
 
 @receiver(post_save, sender=User)
 def create_or_update_profile(sender, instance, created, **kwargs):
@@ -10,4 +14,65 @@ def create_or_update_profile(sender, instance, created, **kwargs):
     if created:
         # Use atomic transaction to prevent race conditions
         with transaction.atomic():
-            Profile.objects.get_or_create(user=instance)
\ No newline at end of file
+            Profile.objects.get_or_create(user=instance)
+
+
+@receiver(m2m_changed, sender=Profile.roles.through)
+def clear_profile_role_cache(sender, instance, action, reverse, pk_set=None, **kwargs):
+    """Drop cached role names when a profile's roles change"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.clear_role_cache()
+        bump_access_version(instance.user_id)
+    elif pk_set:
+        # Profiles added to or removed from a role
+        for user_id in Profile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True):
+            bump_access_version(user_id)
+
+
+@receiver(post_save, sender=User)
+def bump_access_on_user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """is_staff, is_superuser and is_active decide what pages show"""
+    if update_fields is not None and not {'is_staff', 'is_superuser', 'is_active'} & set(update_fields):
+        return  # e.g. the last_login update on every login
+    if not created:
+        bump_access_version(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def welcome_new_user(sender, instance, created, **kwargs):
+    if created:
+        notifications.notify_welcome(instance)
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def bump_inbox_on_notification_change(sender, instance, **kwargs):
+    """
+    Saves and deletes (one row, a queryset delete or the admin) change the
+    inbox. Bulk inserts and updates send no signals and bump it themselves.
+    """
+    notifications.bump_inbox_version(instance.user_id)
+
+
+@receiver(post_save, sender=Booking)
+def notify_on_booking_saved(sender, instance, created, **kwargs):
+    """Bookings feed the notification inbox"""
+    if created:
+        notifications.notify_booking_created(instance)
+        if instance.booking_status == 'confirmed':
+            notifications.notify_booking_confirmed(instance)
+
+
+@receiver(post_delete, sender=Booking)
+def withdraw_on_booking_deleted(sender, instance, **kwargs):
+    notifications.withdraw_booking_notifications(instance)
+
+
+@receiver(booking_status_changed)
+def notify_on_status_change(sender, booking, to_status, **kwargs):
+    if to_status == 'confirmed':
+        notifications.notify_booking_confirmed(booking)
+    elif to_status == 'cancelled':
+        notifications.withdraw_booking_notifications(booking)
@@ -22,6 +22,7 @@ urlpatterns = [
     
     # Notification API
     path('api/notifications/', views.get_notifications, name='get_notifications'),
+    path('api/notifications/read/', views.mark_notifications_read, name='mark_notifications_read'),
     path('notifications/', views.notifications_page, name='notifications'),
     
     # Wishlist URLs
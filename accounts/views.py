@@ -6,10 +6,17 @@ from django.contrib import messages
 from django.contrib.auth.views import LoginView
 from django.urls import reverse_lazy
 from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from django.contrib.auth import SESSION_KEY
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
+from tours.pagination import LISTING_COUNT_LIMIT, keyset_page
 from .forms import UserEditForm, ProfileEditForm, PasswordChangeForm, SignupForm, StaffUserManagementForm, StaffProfileManagementForm
-from .models import Profile, Wishlist, UserRole
+from .models import Profile, Wishlist, UserRole, Notification
+from .context_processors import get_unread_notification_count
+from .notifications import get_inbox_version
+from . import notifications as notification_inbox
 
 
 def is_uwa_staff(user):
@@ -108,31 +115,15 @@ def profile(request):
     conservation_contribution = total_spent * Decimal('0.1')  # Assume 10% goes to conservation
     trees_planted = completed_bookings * 2  # Assume 2 trees per completed tour
     
-    # Mock notification system - calculate unread notifications
-    # In a real system, you'd have a Notification model
-    unread_notifications = 0
-    
-    # Check for upcoming tours (notifications for tours in next 7 days)
+    # Check for upcoming tours (next 7 days)
     from datetime import date
     upcoming_tours = user.bookings.filter(
         booking_status='confirmed',
         availability__date__gte=date.today(),
         availability__date__lte=date.today() + timedelta(days=7)
     ).count()
-    unread_notifications += upcoming_tours
     
-    # Check for recent booking confirmations (last 30 days)
-    recent_confirmations = user.bookings.filter(
-        booking_status='confirmed',
-        booking_date__gte=datetime.now() - timedelta(days=30)
-    ).count()
-    unread_notifications += min(recent_confirmations, 3)  # Cap at 3 to avoid too many notifications
-    
-    # Add some promotional notifications (mock)
-    if total_bookings == 0:
-        unread_notifications += 1  # Welcome/first booking discount
-    elif completed_bookings > 0 and completed_bookings % 5 == 0:
-        unread_notifications += 1  # Milestone achievement notification
+    unread_notifications = get_unread_notification_count(user)
     
     context = {
         'profile': profile,
@@ -224,12 +215,13 @@ def payment_methods(request):
 def wishlist(request):
     """User wishlist view"""
     from .models import Wishlist
-    from tours.models import Tour
+    from tours.models import Tour, SavedAlsoBooked
     
-    wishlist_items = Wishlist.objects.filter(user=request.user).select_related('tour__park')
+    wishlist_items = list(Wishlist.objects.filter(user=request.user).select_related('tour__park'))
     
     context = {
         'wishlist_items': wishlist_items,
+        'recommended_tours': SavedAlsoBooked.tours_for([item.tour_id for item in wishlist_items]),
     }
     return render(request, 'accounts/wishlist.html', context)
 
@@ -340,112 +332,71 @@ def notifications_page(request):
     """Full notifications page view"""
     return render(request, 'accounts/notifications.html')
 
+NOTIFICATIONS_PAGE_SIZE = 10
+
+
+def _notifications_etag(request):
+    """
+    ETag of the dropdown: the user's inbox version plus the requested page
+    and today's date, which the "n days ago" texts depend on. Built from the
+    session and the cache only, so a matching poll returns 304 without a
+    database query.
+    """
+    user_id = request.session.get(SESSION_KEY)
+    if user_id is None:
+        return None
+    today = timezone.now().date().isoformat()
+    return f"{user_id}-{get_inbox_version(user_id)}-{today}-{request.GET.get('before', '')}"
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_notifications_etag)
 @login_required
 def get_notifications(request):
-    """Get user notifications for dropdown"""
-    try:
-        from datetime import datetime, timedelta
-        from booking.models import Booking
-        
-        notifications = []
-        user = request.user
-        
-        # 1. Upcoming tours (next 7 days)
-        upcoming_bookings = user.bookings.filter(
-            booking_status='confirmed',
-            availability__date__gte=datetime.now().date(),
-            availability__date__lte=datetime.now().date() + timedelta(days=7)
-        ).select_related('availability__tour', 'availability__tour__park')
-        
-        for booking in upcoming_bookings:
-            notifications.append({
-                'id': f'upcoming_{booking.id}',
-                'type': 'upcoming',
-                'title': f'Upcoming Tour: {booking.availability.tour.name}',
-                'message': f'Your tour is scheduled for {booking.availability.date.strftime("%B %d, %Y")}',
-                'time': 'Upcoming',
-                'icon': 'calendar-check',
-                'color': 'text-orange-600',
-                'bg_color': 'bg-orange-50',
-                'url': f'/booking/my-bookings/'
-            })
-        
-        # 2. Recent booking confirmations (last 30 days)
-        recent_confirmations = user.bookings.filter(
-            booking_status='confirmed',
-            booking_date__gte=datetime.now() - timedelta(days=30)
-        ).select_related('availability__tour').order_by('-booking_date')[:3]
-        
-        for booking in recent_confirmations:
-            days_ago = (datetime.now().date() - booking.booking_date.date()).days
-            time_text = 'Today' if days_ago == 0 else f'{days_ago} day{"s" if days_ago > 1 else ""} ago'
-            
-            notifications.append({
-                'id': f'confirmed_{booking.id}',
-                'type': 'confirmation',
-                'title': 'Booking Confirmed',
-                'message': f'{booking.availability.tour.name} has been confirmed',
-                'time': time_text,
-                'icon': 'check-circle',
-                'color': 'text-green-600',
-                'bg_color': 'bg-green-50',
-                'url': f'/booking/my-bookings/'
-            })
-        
-        # 3. Welcome message for new users
-        total_bookings = user.bookings.count()
-        if total_bookings == 0:
-            notifications.append({
-                'id': 'welcome',
-                'type': 'welcome',
-                'title': 'Welcome to UWA Wildlife Tours!',
-                'message': 'Get 10% off your first booking with code WELCOME10',
-                'time': 'New',
-                'icon': 'gift',
-                'color': 'text-blue-600',
-                'bg_color': 'bg-blue-50',
-                'url': '/tours/'
-            })
-        
-        # 4. Achievement notifications
-        completed_bookings = user.bookings.filter(booking_status='completed').count()
-        if completed_bookings > 0 and completed_bookings % 5 == 0:
-            notifications.append({
-                'id': f'achievement_{completed_bookings}',
-                'type': 'achievement',
-                'title': f'Achievement Unlocked!',
-                'message': f'You\'ve completed {completed_bookings} tours! You\'re a true wildlife explorer.',
-                'time': 'New',
-                'icon': 'award',
-                'color': 'text-purple-600',
-                'bg_color': 'bg-purple-50',
-                'url': '/accounts/profile/'
-            })
-        
-        # Sort notifications by type priority and limit to 10
-        type_priority = {'upcoming': 1, 'confirmation': 2, 'achievement': 3, 'welcome': 4}
-        notifications.sort(key=lambda x: type_priority.get(x['type'], 5))
-        notifications = notifications[:10]  # Limit to 10 notifications
-        
-        return JsonResponse({
-            'success': True,
-            'notifications': notifications,
-            'count': len(notifications)
-        })
-        
-    except Exception as e:
-        # Log the error for debugging
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.error(f"Error in get_notifications: {str(e)}")
-        
-        # Return error response
-        return JsonResponse({
-            'success': False,
-            'error': str(e),
-            'notifications': [],
-            'count': 0
-        })
+    """Get user notifications for dropdown, newest first"""
+    from datetime import datetime, timedelta, timezone as dt_timezone
+    from django.db.models import Q
+    
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    inbox = Notification.objects.filter(user=request.user)
+    
+    # Keyset pagination on (created_at, id): ?before=<microseconds>_<id>
+    before = request.GET.get('before')
+    if before:
+        try:
+            microseconds, last_id = before.split('_')
+            created_at = epoch + timedelta(microseconds=int(microseconds))
+            last_id = int(last_id)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Invalid cursor', 'notifications': [], 'count': 0}, status=400)
+        inbox = inbox.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id))
+    
+    page = list(inbox[:NOTIFICATIONS_PAGE_SIZE + 1])
+    has_more = len(page) > NOTIFICATIONS_PAGE_SIZE
+    page = page[:NOTIFICATIONS_PAGE_SIZE]
+    
+    next_cursor = None
+    if has_more:
+        last = page[-1]
+        next_cursor = f'{(last.created_at - epoch) // timedelta(microseconds=1)}_{last.id}'
+    
+    notifications = [notification.to_dict() for notification in page]
+    return JsonResponse({
+        'success': True,
+        'notifications': notifications,
+        'count': len(notifications),
+        'unread_count': get_unread_notification_count(request.user),
+        'next_cursor': next_cursor,
+    })
+
+
+@login_required
+@require_POST
+def mark_notifications_read(request):
+    """Mark notifications as read; all of them unless ids are posted"""
+    keys = request.POST.getlist('ids') or None
+    updated = notification_inbox.mark_notifications_read(request.user, keys)
+    return JsonResponse({'success': True, 'updated': updated})
 
 
 @user_passes_test(is_uwa_staff, login_url='accounts:profile')
@@ -479,9 +430,8 @@ def manage_users(request):
         users = users.filter(is_active=False)
     
     # Paginate results
-    paginator = Paginator(users.distinct().order_by('username'), 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    users = users.distinct()
+    page_obj = keyset_page(request, users, 20, ('username', 'id'), count_limit=LISTING_COUNT_LIMIT)
     
     # Get all roles for filter dropdown
     roles = UserRole.objects.all()
@@ -492,7 +442,8 @@ def manage_users(request):
         'role_filter': role_filter,
         'status_filter': status_filter,
         'roles': roles,
-        'total_users': users.count(),
+        'total_users': page_obj.paginator.capped_count,
+        'total_capped': page_obj.paginator.count_is_capped,
     }
     return render(request, 'accounts/manage_users.html', context)
 
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils import timezone
-from .models import Availability, Booking, Payment, BookingNotification
+from .models import Availability, Booking, BookingRollup, Payment, PaymentWebhookEvent, BookingNotification
 
 
 @admin.register(Availability)
@@ -97,6 +97,7 @@ class BookingAdmin(admin.ModelAdmin):
             'processing': 'blue',
             'completed': 'green',
             'failed': 'red',
+            'refund_due': 'darkred',
             'refunded': 'purple'
         }
         color = colors.get(obj.payment_status, 'black')
@@ -177,6 +178,7 @@ class PaymentAdmin(admin.ModelAdmin):
             'processing': 'blue',
             'completed': 'green',
             'failed': 'red',
+            'refund_due': 'darkred',
             'refunded': 'purple'
         }
         color = colors.get(obj.status, 'black')
@@ -190,6 +192,18 @@ class PaymentAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related('booking', 'booking__tourist')
 
 
+@admin.register(PaymentWebhookEvent)
+class PaymentWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['event_id', 'payment', 'status', 'received_at']
+    list_filter = ['status', 'received_at']
+    search_fields = ['event_id', 'payment__gateway_transaction_id', 'payment__booking__booking_id']
+    readonly_fields = ['event_id', 'payment', 'status', 'received_at']
+    date_hierarchy = 'received_at'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('payment')
+
+
 @admin.register(BookingNotification)
 class BookingNotificationAdmin(admin.ModelAdmin):
     list_display = [
@@ -216,3 +230,10 @@ class BookingNotificationAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('booking', 'booking__tourist')
+
+
+@admin.register(BookingRollup)
+class BookingRollupAdmin(admin.ModelAdmin):
+    list_display = ['tour', 'status', 'bookings', 'seats', 'revenue', 'updated_at']
+    list_filter = ['status', 'tour__park']
+    readonly_fields = [field.name for field in BookingRollup._meta.fields]
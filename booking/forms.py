@@ -1,10 +1,12 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.core.validators import RegexValidator
 from django.utils import timezone
 from .models import Booking, Availability
 from accounts.models import Profile
 from tours.models import Park, Guide
+from tours.choices import get_choices, guide_name, park_choices
 
 
 class BookingForm(forms.ModelForm):
@@ -73,6 +75,22 @@ class BookingForm(forms.ModelForm):
         return cleaned_data
 
 
+def parse_range(value):
+    """
+    Split a range filter value into (low, high) numbers: '100-200' covers
+    low <= x < high and '500+' covers x >= 500 (high is None).
+    """
+    if value.endswith('+'):
+        return int(value[:-1]), None
+    low, high = value.split('-')
+    return int(low), int(high)
+
+
+class RangeField(forms.CharField):
+    """Filter value of a data-driven histogram bucket, such as '100-200' or '500+'"""
+    default_validators = [RegexValidator(r'^\d+(-\d+|\+)$', 'Enter a range such as 100-200 or 500+.')]
+
+
 class AvailabilitySearchForm(forms.Form):
     """Enhanced form for searching available tours"""
     
@@ -126,29 +144,17 @@ class AvailabilitySearchForm(forms.Form):
         label='Min. Slots'
     )
     
-    price_range = forms.ChoiceField(
+    # Bucket boundaries come from the data; see tours.facets
+    price_range = RangeField(
         required=False,
-        choices=[
-            ('', 'Any Price'),
-            ('0-100', 'Under $100'),
-            ('100-200', '$100 - $200'),
-            ('200-500', '$200 - $500'),
-            ('500+', '$500+'),
-        ],
         widget=forms.Select(attrs={
             'class': 'w-full px-4 py-3 border border-gray-300 rounded-lg focus:ring-2 focus:ring-safari-500 focus:border-transparent'
         }),
         label='Price Range'
     )
     
-    duration = forms.ChoiceField(
+    duration = RangeField(
         required=False,
-        choices=[
-            ('', 'Any Duration'),
-            ('0-4', 'Half Day (Under 4h)'),
-            ('4-8', 'Full Day (4-8h)'),
-            ('8+', 'Multi-Day (8h+)'),
-        ],
         widget=forms.Select(attrs={
             'class': 'w-full px-4 py-3 border border-gray-300 rounded-lg focus:ring-2 focus:ring-safari-500 focus:border-transparent'
         }),
@@ -167,18 +173,16 @@ class AvailabilitySearchForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
+        # Choices come from the shared cache, so building the form runs no queries
+        self.fields['park'].choices = [('', 'All Parks')] + park_choices()
+        
         # Custom display for guide choices
         guide_choices = [('', 'Any Guide')]
-        for guide in Guide.objects.select_related('user').all():
-            if guide.user.first_name:
-                display_name = f"{guide.user.first_name} {guide.user.last_name or ''}".strip()
-                if guide.specialization:
-                    display_name += f" - {guide.specialization}"
-            else:
-                display_name = guide.user.username
-                if guide.specialization:
-                    display_name += f" - {guide.specialization}"
-            guide_choices.append((guide.id, display_name))
+        for guide in get_choices('guides'):
+            display_name = guide_name(guide) or guide['user__username']
+            if guide['specialization']:
+                display_name += f" - {guide['specialization']}"
+            guide_choices.append((guide['id'], display_name))
         
         self.fields['guide'].choices = guide_choices
     
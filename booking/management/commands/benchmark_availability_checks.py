@@ -0,0 +1,85 @@
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from booking.management.test_database import require_test_database
+from booking.models import Availability
+from booking.views import check_availability, check_availability_batch
+from tours.models import Park, Tour, TourCompany
+
+
+class Command(BaseCommand):
+    help = 'Compare polling check_availability once per date with one check_availability_batch call'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', type=int, default=50, help='Dates checked per poll')
+        parser.add_argument('--rounds', type=int, default=20, help='Polls to time')
+
+    def measure(self, rounds, poll):
+        """Average seconds, queries and response bytes of one poll"""
+        elapsed = queries = size = 0
+        for _ in range(rounds):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                responses = poll()
+                elapsed += time.perf_counter() - start
+            queries += len(captured.captured_queries)
+            size += sum(len(response.content) for response in responses)
+        return elapsed / rounds, queries / rounds, size / rounds
+
+    def handle(self, *args, **options):
+        require_test_database('benchmark_availability_checks')
+        count = options['ids']
+        rounds = options['rounds']
+        factory = RequestFactory()
+
+        self.stdout.write("=== AVAILABILITY CHECK BENCHMARK ===")
+
+        park = Park.objects.create(name='Benchmark Park', description='Temporary', location='Nowhere')
+        company = TourCompany.objects.create(name='Benchmark Company')
+        tour = Tour.objects.create(
+            park=park, company=company, name='Benchmark Tour', description='Temporary',
+            price=100, duration_hours=1
+        )
+        today = timezone.now().date()
+        availabilities = Availability.objects.bulk_create([
+            Availability(tour=tour, date=today + timedelta(days=day + 1), slots_available=day % 4)
+            for day in range(count)
+        ])
+        ids = [availability.id for availability in availabilities]
+
+        def single_polls():
+            return [
+                check_availability(factory.get('/', {'availability_id': availability_id, 'num_people': 2}))
+                for availability_id in ids
+            ]
+
+        batch_url = {'ids': ','.join(map(str, ids)), 'num_people': 2}
+
+        def batch_poll():
+            return [check_availability_batch(factory.get('/', batch_url))]
+
+        try:
+            version = json.loads(batch_poll()[0].content)['version']
+
+            def unchanged_poll():
+                return [check_availability_batch(factory.get('/', dict(batch_url, version=version)))]
+
+            for label, poll in (
+                (f'{count} single checks', single_polls),
+                ('1 batch check', batch_poll),
+                ('1 batch check, unchanged', unchanged_poll),
+            ):
+                seconds, queries, size = self.measure(rounds, poll)
+                self.stdout.write(
+                    f"{label:<28} {seconds * 1000:8.2f} ms  {queries:5.0f} queries  {size:8.0f} bytes per poll"
+                )
+        finally:
+            park.delete()
+            company.delete()
@@ -0,0 +1,100 @@
+import json
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from booking.management.test_database import require_test_database
+from booking.models import Availability, Booking, Payment
+from booking.views import payment_webhook
+from tours.models import Park, Tour, TourCompany
+
+
+class Command(BaseCommand):
+    help = 'Replay payment gateway callbacks against payment_webhook and check each is applied once'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=50, help='Payments completed by a callback')
+        parser.add_argument('--replays', type=int, default=5, help='Times the gateway retries every callback')
+
+    def deliver(self, factory, callbacks):
+        """Seconds, queries and responses of posting the callbacks"""
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            responses = [
+                payment_webhook(factory.post('/', json.dumps(callback), content_type='application/json'))
+                for callback in callbacks
+            ]
+            seconds = time.perf_counter() - start
+        return seconds, len(captured.captured_queries), [json.loads(response.content) for response in responses]
+
+    def report(self, label, seconds, queries, count):
+        self.stdout.write(
+            f"{label:<24} {seconds / count * 1000:8.3f} ms  {queries / count:5.1f} queries per callback"
+        )
+
+    def handle(self, *args, **options):
+        require_test_database('benchmark_payment_webhooks')
+        count = options['payments']
+        replays = options['replays']
+        factory = RequestFactory()
+
+        self.stdout.write("=== PAYMENT WEBHOOK REPLAY BENCHMARK ===")
+
+        park = Park.objects.create(name='Benchmark Park', description='Temporary', location='Nowhere')
+        company = TourCompany.objects.create(name='Benchmark Company')
+        tour = Tour.objects.create(
+            park=park, company=company, name='Benchmark Tour', description='Temporary',
+            price=100, duration_hours=1
+        )
+        availability = Availability.objects.create(
+            tour=tour, date=timezone.now().date() + timedelta(days=1), slots_available=count * 2
+        )
+        tourist = User.objects.create_user('webhook_benchmark_tourist')
+        try:
+            bookings = Booking.objects.bulk_create([
+                Booking(
+                    tourist=tourist, availability=availability, num_of_people=1,
+                    unit_price=100, total_cost=100, contact_email='benchmark@example.com'
+                )
+                for _ in range(count)
+            ])
+            Payment.objects.bulk_create([
+                Payment(
+                    booking=booking, payment_method='card', amount=100,
+                    gateway_transaction_id=f'benchmark-{booking.pk}', status='processing'
+                )
+                for booking in bookings
+            ])
+            callbacks = [
+                {'event_id': f'benchmark-event-{booking.pk}', 'transaction_id': f'benchmark-{booking.pk}',
+                 'status': 'completed'}
+                for booking in bookings
+            ]
+
+            seconds, queries, results = self.deliver(factory, callbacks)
+            self.report('first delivery', seconds, queries, count)
+            if any(result.get('duplicate') for result in results):
+                raise CommandError('A first delivery was taken for a duplicate')
+
+            seconds, queries, results = self.deliver(factory, callbacks * replays)
+            self.report(f'{replays} replays', seconds, queries, count * replays)
+            if not all(result.get('duplicate') for result in results):
+                raise CommandError('A replayed callback was applied again')
+
+            availability.refresh_from_db()
+            confirmed = Booking.objects.filter(availability=availability, booking_status='confirmed').count()
+            self.stdout.write(f"Confirmed bookings: {confirmed} of {count}")
+            self.stdout.write(f"Slots taken: {count * 2 - availability.slots_available} (expected {count})")
+            if confirmed != count or availability.slots_available != count:
+                raise CommandError('Replays changed the bookings or the slots')
+            self.stdout.write(self.style.SUCCESS('Every callback was applied exactly once.'))
+        finally:
+            park.delete()
+            company.delete()
+            tourist.delete()
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from booking.models import Booking
+
+
+class Command(BaseCommand):
+    help = 'Cancel pending bookings whose slot hold has expired and return their seats to availability'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running, sweeping every INTERVAL seconds (default: sweep once)')
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            result = Booking.expire_stale_holds()
+            self.stdout.write(self.style.SUCCESS(
+                f"Expired {result['bookings']} pending bookings, "
+                f"reclaimed {result['seats']} seats on {result['availabilities']} availabilities"
+            ))
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,124 @@
+import asyncio
+import resource
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+
+from booking.management.test_database import require_test_database
+from booking.models import Availability
+from booking.slot_events import get_slot_events
+from tours.models import Park, Tour, TourCompany
+
+
+class StreamClient:
+    """One viewer holding an availability_stream open through the ASGI application"""
+
+    def __init__(self, application, path, query_string):
+        self.scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query_string.encode(), 'root_path': '',
+            'headers': [(b'host', b'localhost'), (b'accept', b'text/event-stream')],
+            'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+        }
+        self.application = application
+        self.status = None
+        self.events = []
+        self.connected = asyncio.Event()
+        self.changed = asyncio.Event()
+        self._disconnect = asyncio.Event()
+        self._request_sent = False
+
+    async def receive(self):
+        if not self._request_sent:
+            self._request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self._disconnect.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.status = message['status']
+        elif message['type'] == 'http.response.body' and message.get('body'):
+            self.events.append(message['body'])
+            if len(self.events) == 1:
+                self.connected.set()
+            elif b'event: slots' in message['body']:
+                self.changed.set()
+
+    async def run(self):
+        await self.application(self.scope, self.receive, self.send)
+        self.connected.set()  # Rejected streams end right away
+
+    def disconnect(self):
+        self._disconnect.set()
+
+
+class Command(BaseCommand):
+    help = 'Hold thousands of idle availability_stream connections on one ASGI worker and time a change fan-out'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=2000, help='Concurrent stream connections')
+        parser.add_argument('--dates', type=int, default=6, help='Dates watched by every connection')
+
+    def handle(self, *args, **options):
+        require_test_database('load_test_slot_stream')
+        self.stdout.write("=== SLOT STREAM LOAD TEST ===")
+
+        park = Park.objects.create(name='Load Test Park', description='Temporary', location='Nowhere')
+        company = TourCompany.objects.create(name='Load Test Company')
+        tour = Tour.objects.create(
+            park=park, company=company, name='Load Test Tour', description='Temporary',
+            price=100, duration_hours=1
+        )
+        today = timezone.now().date()
+        availabilities = Availability.objects.bulk_create([
+            Availability(tour=tour, date=today + timedelta(days=day + 1), slots_available=10)
+            for day in range(options['dates'])
+        ])
+        try:
+            asyncio.run(self.load_test(options['subscribers'], [availability.id for availability in availabilities]))
+        finally:
+            park.delete()
+            company.delete()
+
+    async def load_test(self, count, availability_ids):
+        application = get_asgi_application()
+        events = get_slot_events()
+        path = reverse('booking:availability_stream')
+        query_string = 'ids=' + ','.join(map(str, availability_ids))
+
+        # Peak resident size in kB on Linux
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        clients = [StreamClient(application, path, query_string) for _ in range(count)]
+        tasks = [asyncio.create_task(client.run()) for client in clients]
+        await asyncio.gather(*(client.connected.wait() for client in clients))
+        connect_seconds = time.perf_counter() - start
+        memory = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) * 1024
+
+        rejected = sum(1 for client in clients if client.status != 200)
+        if rejected:
+            raise CommandError(f"{rejected} of {count} streams were not opened")
+        self.stdout.write(f"Opened {count} streams in {connect_seconds:.2f} s")
+        self.stdout.write(f"Idle subscribers: {events.subscriber_count()}")
+        self.stdout.write(f"Memory growth: {memory / 1024 / 1024:.1f} MB ({memory / count / 1024:.1f} kB per stream)")
+
+        availability = await Availability.objects.aget(id=availability_ids[0])
+        start = time.perf_counter()
+        await sync_to_async(availability.reserve_slots)(1)
+        await asyncio.wait_for(asyncio.gather(*(client.changed.wait() for client in clients)), timeout=60)
+        self.stdout.write(f"One booking reached all {count} viewers in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        for client in clients:
+            client.disconnect()
+        await asyncio.wait_for(asyncio.gather(*tasks, return_exceptions=True), timeout=60)
+        left = events.subscriber_count()
+        if left:
+            raise CommandError(f"{left} subscriptions left after every viewer disconnected")
+        self.stdout.write(self.style.SUCCESS('All streams closed and unsubscribed.'))
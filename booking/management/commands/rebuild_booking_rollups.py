@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from booking.models import BookingRollup
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-tour booking, seat and revenue totals from the bookings'
+
+    def handle(self, *args, **options):
+        rebuilt = BookingRollup.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} booking rollups.'))
@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from booking.management.test_database import require_test_database
+from booking.models import Availability
+from tours.models import Park, Tour, TourCompany
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent slot reservations at one availability and verify nothing is oversold'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Number of concurrent reservation attempts')
+        parser.add_argument('--slots', type=int, default=50, help='Slots available on the test date')
+        parser.add_argument('--people', type=int, default=1, help='People per reservation attempt')
+        parser.add_argument('--threads', type=int, default=100, help='Worker threads issuing reservations')
+
+    def handle(self, *args, **options):
+        require_test_database('stress_reservations')
+        num_requests = options['requests']
+        slots = options['slots']
+        people = options['people']
+
+        self.stdout.write("=== SLOT RESERVATION STRESS TEST ===")
+
+        park = Park.objects.create(name='Stress Test Park', description='Temporary', location='Nowhere')
+        company = TourCompany.objects.create(name='Stress Test Company')
+        tour = Tour.objects.create(
+            park=park, company=company, name='Stress Test Tour', description='Temporary',
+            price=100, duration_hours=1, max_participants=max(slots, 1)
+        )
+        availability = Availability.objects.create(
+            tour=tour,
+            date=timezone.now().date() + timedelta(days=1),
+            slots_available=slots
+        )
+
+        start = threading.Barrier(min(options['threads'], num_requests))
+
+        def attempt(_):
+            try:
+                try:
+                    start.wait(timeout=10)
+                except threading.BrokenBarrierError:
+                    pass
+                return Availability.objects.get(pk=availability.pk).reserve_slots(people)
+            finally:
+                connection.close()
+
+        try:
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                results = list(pool.map(attempt, range(num_requests)))
+
+            succeeded = sum(1 for result in results if result)
+            availability.refresh_from_db()
+            expected = min(num_requests, slots // people)
+
+            self.stdout.write(f"Attempts: {num_requests} x {people} people on {slots} slots")
+            self.stdout.write(f"Succeeded: {succeeded}  Rejected: {num_requests - succeeded}")
+            self.stdout.write(f"Slots left: {availability.slots_available}")
+
+            if succeeded * people + availability.slots_available != slots or succeeded != expected:
+                raise CommandError("Oversold or lost reservations detected!")
+        finally:
+            park.delete()
+            company.delete()
+
+        self.stdout.write(self.style.SUCCESS('No oversell detected.'))
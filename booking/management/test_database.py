@@ -0,0 +1,26 @@
+"""
+Guard for the load tests and benchmarks in booking/management/commands,
+which create and delete rows: they only run against a test database.
+The correctness checks they print are also covered by booking/tests.py.
+"""
+import os
+
+from django.core.management.base import CommandError
+from django.db import connection
+
+
+def is_test_database():
+    """Whether the default database is in memory or named like a test database"""
+    settings_dict = connection.settings_dict
+    name = str(settings_dict['NAME'])
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        return True
+    return os.path.basename(name).startswith('test_') or name == settings_dict['TEST'].get('NAME')
+
+
+def require_test_database(command_name):
+    if not is_test_database():
+        raise CommandError(
+            f"{command_name} writes to the database and only runs against a test database "
+            f"(in memory or named test_...), not {connection.settings_dict['NAME']}."
+        )
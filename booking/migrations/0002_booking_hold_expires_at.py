@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:38
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def hold_existing_pending_bookings(apps, schema_editor):
+    """Pending bookings already took their slots at creation; give them a hold so they expire"""
+    Booking = apps.get_model('booking', 'Booking')
+    Booking.objects.filter(booking_status='pending').update(
+        hold_expires_at=F('booking_date') + timedelta(minutes=30)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.RunPython(hold_existing_pending_bookings, migrations.RunPython.noop),
+    ]
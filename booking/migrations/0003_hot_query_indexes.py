@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0002_booking_hold_expires_at'),
+        ('tours', '0010_tour_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(condition=models.Q(('slots_available__gt', 0)), fields=['date', 'id'], name='booking_avail_open_date'),
+        ),
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(fields=['date', 'id'], name='booking_avail_date_id'),
+        ),
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(fields=['tour', 'date', 'slots_available'], name='booking_avail_tour_date_slots'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['tourist', 'booking_status', 'booking_date'], name='booking_tourist_status_date'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['tourist', '-booking_date', '-id'], name='booking_tourist_date'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['availability', 'booking_status', 'num_of_people'], name='booking_avail_status_people'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['gateway_transaction_id'], name='booking_payment_gateway_txn'),
+        ),
+    ]
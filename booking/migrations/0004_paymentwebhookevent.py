@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(help_text='Event ID from payment gateway', max_length=255, unique=True)),
+                ('status', models.CharField(blank=True, help_text='Payment status reported by the event', max_length=20)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_events', to='booking.payment')),
+            ],
+            options={
+                'ordering': ['-received_at'],
+            },
+        ),
+    ]
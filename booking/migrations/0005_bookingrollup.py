@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_rollups(apps, schema_editor):
+    """Add up the bookings that already exist"""
+    Booking = apps.get_model('booking', 'Booking')
+    BookingRollup = apps.get_model('booking', 'BookingRollup')
+
+    rows = Booking.objects.order_by().values('availability__tour_id', 'booking_status').annotate(
+        booking_count=models.Count('id'),
+        seat_count=models.Sum('num_of_people'),
+        revenue_total=models.Sum('total_cost'),
+    )
+    BookingRollup.objects.bulk_create([
+        BookingRollup(
+            tour_id=row['availability__tour_id'], status=row['booking_status'],
+            bookings=row['booking_count'], seats=row['seat_count'] or 0, revenue=row['revenue_total'] or 0,
+        )
+        for row in rows
+    ], batch_size=500)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0004_paymentwebhookevent'),
+        ('tours', '0013_park_geo_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending Payment'), ('confirmed', 'Confirmed'), ('cancelled', 'Cancelled'), ('completed', 'Completed'), ('refunded', 'Refunded')], max_length=20)),
+                ('bookings', models.IntegerField(default=0)),
+                ('seats', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_rollups', to='tours.tour')),
+            ],
+            options={
+                'unique_together': {('tour', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
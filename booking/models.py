@@ -1,9 +1,15 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Sum, Case, When
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from tours.models import Tour, Guide
+import hashlib
 import uuid
+from datetime import timedelta
+
+from .signals import booking_status_changed, availability_slots_changed, payment_completed, holds_expired
 
 
 class Availability(models.Model):
@@ -19,6 +25,13 @@ class Availability(models.Model):
         verbose_name_plural = "Availabilities"
         unique_together = ['tour', 'date']  # Prevent duplicate availabilities for same tour and date
         ordering = ['date']
+        indexes = [
+            # Bookable dates in date order (date lists, keyset pages)
+            models.Index(fields=['date', 'id'], condition=Q(slots_available__gt=0), name='booking_avail_open_date'),
+            models.Index(fields=['date', 'id'], name='booking_avail_date_id'),
+            # A tour's dates with their slots, read without touching the table
+            models.Index(fields=['tour', 'date', 'slots_available'], name='booking_avail_tour_date_slots'),
+        ]
 
     def __str__(self):
         return f"{self.tour.name} on {self.date} ({self.slots_available} slots)"
@@ -42,6 +55,52 @@ class Availability(models.Model):
         """Check if a booking for num_people can be made"""
         return self.can_book and self.slots_available >= num_people
 
+    @classmethod
+    def check_batch(cls, party_sizes):
+        """
+        Whether each of many dates can take a party, from one narrow query.
+        party_sizes maps availability ids to numbers of people.
+        Returns ({id: (slots_available, can_book)}, version); the version
+        changes whenever any of the answers may have. Unknown ids are left out.
+        """
+        today = timezone.now().date()
+        results = {}
+        stamps = [today.isoformat()]
+        rows = cls.objects.filter(id__in=party_sizes).values_list('id', 'date', 'slots_available', 'updated_at')
+        for availability_id, date, slots_available, updated_at in rows.order_by('id'):
+            availability = cls(id=availability_id, date=date, slots_available=slots_available)
+            results[availability_id] = (slots_available, availability.can_book_for(party_sizes[availability_id]))
+            stamps.append(f'{availability_id}:{party_sizes[availability_id]}:{updated_at.timestamp()}')
+        return results, hashlib.md5(','.join(stamps).encode()).hexdigest()[:16]
+
+    def reserve_slots(self, num_people):
+        """
+        Atomically take num_people slots with a single conditional UPDATE.
+        Returns False (and changes nothing) when not enough slots are left.
+        """
+        with transaction.atomic():
+            reserved = Availability.objects.filter(
+                pk=self.pk,
+                slots_available__gte=num_people
+            ).update(
+                slots_available=F('slots_available') - num_people,
+                updated_at=timezone.now()
+            )
+        if reserved:
+            self.slots_available -= num_people
+            availability_slots_changed.send(sender=Availability, availability_ids=[self.pk])
+        return bool(reserved)
+
+    def release_slots(self, num_people):
+        """Atomically give num_people slots back to this availability"""
+        with transaction.atomic():
+            Availability.objects.filter(pk=self.pk).update(
+                slots_available=F('slots_available') + num_people,
+                updated_at=timezone.now()
+            )
+        self.slots_available += num_people
+        availability_slots_changed.send(sender=Availability, availability_ids=[self.pk])
+
 
 class Booking(models.Model):
     """Enhanced booking model with payment integration"""
@@ -61,6 +120,9 @@ class Booking(models.Model):
         ('processing', 'Processing'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
+        # Paid, but the booking could not be confirmed (e.g. its hold lapsed
+        # and the date sold out meanwhile)
+        ('refund_due', 'Refund Due'),
         ('refunded', 'Refunded'),
     ]
 
@@ -90,8 +152,17 @@ class Booking(models.Model):
     confirmed_at = models.DateTimeField(null=True, blank=True)
     cancelled_at = models.DateTimeField(null=True, blank=True)
     
+    # Slots of a pending booking are held until payment or this deadline
+    hold_expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    
     class Meta:
         ordering = ['-booking_date']
+        indexes = [
+            models.Index(fields=['tourist', 'booking_status', 'booking_date'], name='booking_tourist_status_date'),
+            models.Index(fields=['tourist', '-booking_date', '-id'], name='booking_tourist_date'),
+            # Seats held on a date, summed from the index alone
+            models.Index(fields=['availability', 'booking_status', 'num_of_people'], name='booking_avail_status_people'),
+        ]
 
     def __str__(self):
         return f"Booking {self.booking_id} - {self.tourist.username} ({self.get_booking_status_display()})"
@@ -124,34 +195,241 @@ class Booking(models.Model):
         """Check if booking can be cancelled"""
         return self.booking_status in ['pending', 'confirmed'] and not self.availability.is_past_date
 
+    def _transition(self, from_status, to_status, **fields):
+        """
+        Move the booking from one status to another with a conditional UPDATE,
+        so that only one of several concurrent callers wins the transition.
+        """
+        claimed = Booking.objects.filter(
+            pk=self.pk,
+            booking_status=from_status
+        ).update(booking_status=to_status, **fields)
+        if claimed:
+            self.booking_status = to_status
+            for name, value in fields.items():
+                setattr(self, name, value)
+            booking_status_changed.send(
+                sender=Booking, booking=self, from_status=from_status, to_status=to_status
+            )
+        return bool(claimed)
+
+    @property
+    def holds_slots(self):
+        """Whether this pending booking has slots set aside for it"""
+        return self.booking_status == 'pending' and self.hold_expires_at is not None
+
+    @staticmethod
+    def hold_deadline():
+        """Expiry time for a hold placed now"""
+        return timezone.now() + timedelta(minutes=settings.BOOKING_HOLD_MINUTES)
+
     def confirm_booking(self):
         """Confirm the booking and update availability"""
         if self.booking_status == 'pending' and self.payment_status == 'completed':
-            self.booking_status = 'confirmed'
-            self.confirmed_at = timezone.now()
-            
-            # Reduce available slots
-            self.availability.slots_available -= self.num_of_people
-            self.availability.save()
-            
-            self.save()
+            held = self.holds_slots
+            with transaction.atomic():
+                if not self._transition('pending', 'confirmed', confirmed_at=timezone.now(), hold_expires_at=None):
+                    return False
+                
+                # Held slots were taken when the booking was created
+                if not held and not self.availability.reserve_slots(self.num_of_people):
+                    transaction.set_rollback(True)
+                    self.booking_status = 'pending'
+                    self.confirmed_at = None
+                    return False
             return True
         return False
 
+    @property
+    def hold_expired(self):
+        """Whether expire_stale_holds cancelled this booking (user cancellations clear the deadline)"""
+        return self.booking_status == 'cancelled' and self.hold_expires_at is not None
+
+    def reclaim_expired_hold(self):
+        """
+        Confirm a booking whose hold lapsed before its payment came through,
+        if its seats can still be taken. Returns whether it was confirmed.
+        """
+        if not self.hold_expired:
+            return False
+        with transaction.atomic():
+            if not self._transition('cancelled', 'confirmed', confirmed_at=timezone.now(),
+                                    cancelled_at=None, hold_expires_at=None):
+                return False
+            if not self.availability.reserve_slots(self.num_of_people):
+                transaction.set_rollback(True)
+                self.booking_status = 'cancelled'
+                self.confirmed_at = None
+                return False
+        return True
+
     def cancel_booking(self):
         """Cancel the booking and restore availability"""
         if self.can_cancel:
-            if self.booking_status == 'confirmed':
-                # Restore available slots
-                self.availability.slots_available += self.num_of_people
-                self.availability.save()
-            
-            self.booking_status = 'cancelled'
-            self.cancelled_at = timezone.now()
-            self.save()
+            previous_status = self.booking_status
+            held = self.holds_slots
+            with transaction.atomic():
+                if not self._transition(previous_status, 'cancelled', cancelled_at=timezone.now(), hold_expires_at=None):
+                    return False
+                
+                if previous_status == 'confirmed' or held:
+                    # Restore available slots
+                    self.availability.release_slots(self.num_of_people)
             return True
         return False
 
+    @classmethod
+    def _lapsed_hold_ids(cls, now):
+        """Ids of the pending bookings whose hold ran out before now, locked"""
+        return list(cls.objects.select_for_update().filter(
+            booking_status='pending', hold_expires_at__lt=now
+        ).values_list('id', flat=True))
+
+    @classmethod
+    def expire_stale_holds(cls, now=None):
+        """
+        Cancel pending bookings whose hold has run out and return their slots.
+        
+        The bookings are claimed with one UPDATE and the seats are given back
+        with one UPDATE covering every affected availability. Returns a dict
+        with the number of expired bookings, reclaimed seats and availabilities.
+        """
+        now = now or timezone.now()
+        empty = {'bookings': 0, 'seats': 0, 'availabilities': 0}
+        with transaction.atomic():
+            # Lock the lapsed holds, so that a concurrent payment or sweep
+            # waits and then finds them cancelled (on databases with row locks)
+            expired_ids = cls._lapsed_hold_ids(now)
+            if not expired_ids:
+                return empty
+            
+            # Expired holds keep their deadline, which tells them apart from
+            # user cancellations (those clear it)
+            expired = cls.objects.filter(id__in=expired_ids, booking_status='pending').update(
+                booking_status='cancelled', cancelled_at=now
+            )
+            if not expired:
+                return empty
+            # Only the bookings this UPDATE cancelled: without row locks (SQLite)
+            # some may have been cancelled or confirmed since they were read
+            expired_bookings = cls.objects.filter(
+                id__in=expired_ids, booking_status='cancelled', cancelled_at=now, hold_expires_at__isnull=False
+            )
+            seats_per_availability = dict(
+                expired_bookings.order_by().values('availability_id').annotate(
+                    seats=Sum('num_of_people')
+                ).values_list('availability_id', 'seats')
+            )
+            Availability.objects.filter(pk__in=seats_per_availability).update(
+                slots_available=F('slots_available') + Case(
+                    *[When(pk=pk, then=seats) for pk, seats in seats_per_availability.items()],
+                    default=0,
+                ),
+                updated_at=now,
+            )
+            availability_slots_changed.send(sender=Availability, availability_ids=list(seats_per_availability))
+            holds_expired.send(sender=Booking, bookings=expired_bookings)
+        return {
+            'bookings': expired,
+            'seats': sum(seats_per_availability.values()),
+            'availabilities': len(seats_per_availability),
+        }
+
+
+class BookingRollup(models.Model):
+    """
+    Denormalised booking totals of one tour in one booking status: the
+    number of bookings, seats and revenue. Park totals add up the rows of
+    the park's tours. Maintained incrementally by the handlers in
+    booking/signals.py and rebuilt from scratch by the
+    rebuild_booking_rollups command.
+    """
+    # Bookings that still stand, and those whose money was taken
+    ACTIVE_STATUSES = ['pending', 'confirmed', 'completed']
+    EARNED_STATUSES = ['confirmed', 'completed']
+    
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='booking_rollups')
+    status = models.CharField(max_length=20, choices=Booking.BOOKING_STATUS)
+    bookings = models.IntegerField(default=0)
+    seats = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['tour', 'status']
+    
+    def __str__(self):
+        return f"{self.tour_id} {self.status}: {self.bookings} bookings"
+    
+    @staticmethod
+    def contribution(booking):
+        """
+        The amounts a single booking adds to its tour and status.
+        `booking` is a dict with num_of_people and total_cost.
+        """
+        return {'bookings': 1, 'seats': booking['num_of_people'], 'revenue': booking['total_cost'] or 0}
+    
+    @classmethod
+    def apply_deltas(cls, tour_id, status, deltas, create=True):
+        """
+        Add the given amounts to a tour's totals in a status with one UPDATE.
+        Without create, a missing row is left missing (e.g. while the tour's
+        rows are being deleted).
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        
+        rows = cls.objects.filter(tour_id=tour_id, status=status)
+        if create:
+            rollup, created = cls.objects.get_or_create(tour_id=tour_id, status=status)
+            rows = cls.objects.filter(pk=rollup.pk)
+        rows.update(
+            updated_at=timezone.now(),
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+    
+    @classmethod
+    def move(cls, tour_id, from_status, to_status, booking):
+        """Move a booking's contribution from one status to another"""
+        deltas = cls.contribution(booking)
+        cls.apply_deltas(tour_id, from_status, {field: -delta for field, delta in deltas.items()})
+        cls.apply_deltas(tour_id, to_status, deltas)
+    
+    @classmethod
+    def totals(cls, field, statuses, **tour_filter):
+        """
+        Subquery expression summing field over the rows in the statuses of
+        the tours matching one lookup against the outer query, e.g.
+        tour=OuterRef('pk') or tour__park=OuterRef('pk'); 0 without rows.
+        """
+        (lookup, reference), = tour_filter.items()
+        output_field = cls._meta.get_field(field)
+        rows = cls.objects.filter(**{lookup: reference}, status__in=statuses).order_by().values(lookup).annotate(
+            total=Sum(field)
+        ).values('total')
+        return Coalesce(models.Subquery(rows, output_field=output_field), 0, output_field=output_field)
+    
+    @classmethod
+    def rebuild(cls):
+        """Recompute every row from the bookings in one grouped query"""
+        rows = Booking.objects.order_by().values('availability__tour_id', 'booking_status').annotate(
+            booking_count=models.Count('id'),
+            seat_count=Sum('num_of_people'),
+            revenue_total=Sum('total_cost'),
+        )
+        rollups = [
+            cls(
+                tour_id=row['availability__tour_id'], status=row['booking_status'],
+                bookings=row['booking_count'], seats=row['seat_count'] or 0, revenue=row['revenue_total'] or 0,
+            )
+            for row in rows
+        ]
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(rollups, batch_size=500)
+        return len(rollups)
+
 
 class Payment(models.Model):
     """Payment tracking model for integration with payment gateways"""
@@ -164,6 +442,9 @@ class Payment(models.Model):
         ('cash', 'Cash'),
     ]
 
+    # Statuses a gateway callback can no longer change
+    SETTLED_STATUSES = ['completed', 'refund_due', 'refunded']
+
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='payment')
     payment_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     
@@ -186,31 +467,86 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-initiated_at']
+        indexes = [
+            # Payment gateway webhooks look payments up by their transaction id
+            models.Index(fields=['gateway_transaction_id'], name='booking_payment_gateway_txn'),
+        ]
 
     def __str__(self):
         return f"Payment {self.payment_id} - {self.booking.booking_id} ({self.get_status_display()})"
 
     def mark_completed(self):
-        """Mark payment as completed and update booking"""
-        self.status = 'completed'
-        self.completed_at = timezone.now()
-        self.save()
-        
-        # Update booking payment status
-        self.booking.payment_status = 'completed'
-        self.booking.save()
+        """
+        Mark payment as completed and confirm the booking, in one transaction.
+        The payment is claimed with a conditional UPDATE, so repeated calls
+        (e.g. retried gateway callbacks) change nothing after the first.
         
-        # Attempt to confirm booking
-        self.booking.confirm_booking()
+        A booking whose hold lapsed before the payment arrived is confirmed
+        again if its seats are still free. When the booking cannot be
+        confirmed the payment is left as 'refund_due' instead.
+        Returns whether this call completed the payment and confirmed the booking.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            claimed = Payment.objects.filter(pk=self.pk).exclude(status__in=self.SETTLED_STATUSES).update(
+                status='completed', completed_at=now
+            )
+            if not claimed:
+                return False
+            
+            # Update booking payment status
+            booking = self.booking
+            Booking.objects.filter(pk=booking.pk).update(payment_status='completed')
+            booking.payment_status = 'completed'
+            
+            confirmed = booking.booking_status in ('confirmed', 'completed') or booking.confirm_booking()
+            if not confirmed:
+                # The hold may have lapsed since the booking was read
+                booking.refresh_from_db(fields=['booking_status', 'hold_expires_at', 'confirmed_at', 'cancelled_at'])
+                confirmed = booking.booking_status in ('confirmed', 'completed') or booking.reclaim_expired_hold()
+            if not confirmed:
+                # Charged without a seat: keep the claim, but flag it for a refund
+                Payment.objects.filter(pk=self.pk).update(status='refund_due')
+                Booking.objects.filter(pk=booking.pk).update(payment_status='refund_due')
+                self.status = booking.payment_status = 'refund_due'
+                self.completed_at = now
+                return False
+            
+            self.status = 'completed'
+            self.completed_at = now
+            payment_completed.send(sender=Payment, payment=self)
+        return True
 
     def mark_failed(self, reason=""):
-        """Mark payment as failed"""
-        self.status = 'failed'
-        self.save()
-        
-        # Update booking payment status
-        self.booking.payment_status = 'failed'
-        self.booking.save()
+        """Mark a payment still in progress as failed; returns whether it was"""
+        with transaction.atomic():
+            claimed = Payment.objects.filter(pk=self.pk, status__in=['pending', 'processing']).update(status='failed')
+            if not claimed:
+                return False
+            self.status = 'failed'
+            
+            # Update booking payment status
+            Booking.objects.filter(pk=self.booking_id).update(payment_status='failed')
+            self.booking.payment_status = 'failed'
+        return True
+
+
+class PaymentWebhookEvent(models.Model):
+    """
+    Ledger of the payment gateway callbacks already applied. Gateways retry
+    a callback until it is acknowledged; a retry finds its event here and
+    is acknowledged without touching the payment or booking again.
+    """
+    event_id = models.CharField(max_length=255, unique=True, help_text="Event ID from payment gateway")
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='webhook_events')
+    status = models.CharField(max_length=20, blank=True, help_text="Payment status reported by the event")
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-received_at']
+
+    def __str__(self):
+        return f"Webhook event {self.event_id} ({self.status})"
 
 
 class BookingNotification(models.Model):
@@ -0,0 +1,134 @@
+# In booking/signals.py
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import Signal, receiver
+
+from .slot_events import get_slot_events
+
+# Sent after a booking moves from one status to another through
+# Booking.confirm_booking() or Booking.cancel_booking().
+# Arguments: booking, from_status, to_status
+booking_status_changed = Signal()
+
+# Sent after Booking.expire_stale_holds() cancelled lapsed pending bookings
+# with one UPDATE (this bypasses booking_status_changed).
+# Arguments: bookings (queryset of the expired bookings)
+holds_expired = Signal()
+
+# Sent after slots_available of one or more availabilities changed through
+# a bulk or conditional UPDATE (these bypass post_save).
+# Arguments: availability_ids
+availability_slots_changed = Signal()
+
+# Sent once when a payment becomes completed through Payment.mark_completed(),
+# however many times the gateway reports it.
+# Arguments: payment
+payment_completed = Signal()
+
+
+# Live slot counts for the availability_stream viewers
+
+def publish_slots(slots):
+    """Publish {availability_id: slots_available} once the transaction commits"""
+    events = get_slot_events()
+    if slots and events.is_watched(slots):
+        transaction.on_commit(lambda: events.publish(slots))
+
+
+@receiver(availability_slots_changed)
+def publish_changed_slots(sender, availability_ids, **kwargs):
+    """Bulk updates only know the ids; read the new counts if anybody watches"""
+    events = get_slot_events()
+    if events.is_watched(availability_ids):
+        def publish():
+            from .models import Availability
+            events.publish(dict(
+                Availability.objects.filter(id__in=availability_ids).values_list('id', 'slots_available')
+            ))
+        transaction.on_commit(publish)
+
+
+@receiver(post_save, sender='booking.Availability')
+def publish_saved_slots(sender, instance, raw=False, **kwargs):
+    if not raw:
+        publish_slots({instance.pk: instance.slots_available})
+
+
+@receiver(post_delete, sender='booking.Availability')
+def publish_deleted_slots(sender, instance, **kwargs):
+    publish_slots({instance.pk: 0})
+
+
+# Booking totals per tour and status (BookingRollup): every booking counts
+# in its current status; creations, deletions, status transitions and edits
+# apply the difference. Moving a date to another tour is only picked up by
+# the rebuild_booking_rollups command.
+
+ROLLUP_FIELDS = ['availability__tour_id', 'booking_status', 'num_of_people', 'total_cost']
+
+
+@receiver(pre_save, sender='booking.Booking')
+def remember_previous_booking(sender, instance, raw=False, **kwargs):
+    """Remember what the booking contributed before this save"""
+    previous = None
+    if instance.pk and not raw:
+        previous = sender.objects.filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+    instance._rollup_previous = previous
+
+
+@receiver(post_save, sender='booking.Booking')
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """Apply the change in this booking's contribution to the totals"""
+    from .models import BookingRollup
+
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    current = {
+        'availability__tour_id': instance.availability.tour_id,
+        'booking_status': instance.booking_status,
+        'num_of_people': instance.num_of_people,
+        'total_cost': instance.total_cost,
+    }
+    if previous == current:
+        return
+    if previous:
+        old = BookingRollup.contribution(previous)
+        BookingRollup.apply_deltas(previous['availability__tour_id'], previous['booking_status'],
+                                   {field: -delta for field, delta in old.items()})
+    BookingRollup.apply_deltas(current['availability__tour_id'], current['booking_status'],
+                               BookingRollup.contribution(current))
+
+
+@receiver(post_delete, sender='booking.Booking')
+def update_rollup_on_delete(sender, instance, **kwargs):
+    from .models import Availability, BookingRollup
+
+    tour_id = Availability.objects.filter(pk=instance.availability_id).values_list('tour_id', flat=True).first()
+    if tour_id is not None:  # Otherwise the tour and its totals are being deleted too
+        deltas = BookingRollup.contribution({'num_of_people': instance.num_of_people, 'total_cost': instance.total_cost})
+        BookingRollup.apply_deltas(tour_id, instance.booking_status, {field: -delta for field, delta in deltas.items()},
+                                   create=False)
+
+
+@receiver(booking_status_changed)
+def update_rollup_on_transition(sender, booking, from_status, to_status, **kwargs):
+    from .models import BookingRollup
+
+    BookingRollup.move(booking.availability.tour_id, from_status, to_status,
+                       {'num_of_people': booking.num_of_people, 'total_cost': booking.total_cost})
+
+
+@receiver(holds_expired)
+def update_rollup_on_expiry(sender, bookings, **kwargs):
+    """The expired bookings moved from pending to cancelled, in one grouped query"""
+    from .models import BookingRollup
+
+    rows = bookings.order_by().values('availability__tour_id').annotate(
+        booking_count=Count('id'), seat_count=Sum('num_of_people'), revenue_total=Sum('total_cost')
+    )
+    for row in rows:
+        deltas = {'bookings': row['booking_count'], 'seats': row['seat_count'], 'revenue': row['revenue_total'] or 0}
+        BookingRollup.apply_deltas(row['availability__tour_id'], 'pending', {field: -delta for field, delta in deltas.items()})
+        BookingRollup.apply_deltas(row['availability__tour_id'], 'cancelled', deltas)
@@ -0,0 +1,193 @@
+"""
+Publish/subscribe of live slot counts, behind the availability_stream
+Server-Sent Events endpoint.
+
+Every change to slots_available (bookings, cancellations, expired holds,
+staff edits) is published once its transaction commits (see
+booking/signals.py). The streams watching the same dates share one
+SlotChannel, which keeps the latest counts of those dates and the event
+rendering them; a stream only remembers which version of it was sent last.
+An idle stream therefore holds no data of its own, and a change is
+rendered once per channel however many streams watch it.
+
+The backend is chosen with the SLOT_EVENTS_BACKEND setting. The default,
+InProcessSlotEvents, reaches the streams of the process where the change
+was made, which is enough for a single ASGI process. Deployments with
+several workers need a backend relaying events between processes (e.g.
+over Redis pub/sub) that delivers them to its local channels.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+KEEPALIVE_EVENT = b': keepalive\n\n'
+
+
+def render_slot_event(slots):
+    """Server-Sent Event carrying {availability_id: slots_available}"""
+    data = json.dumps({str(availability_id): count for availability_id, count in sorted(slots.items())})
+    return f"event: slots\ndata: {data}\n\n".encode()
+
+
+class SlotChannel:
+    """
+    Latest counts of one set of dates, shared by the streams of one event
+    loop watching exactly that set. Changes arriving before a stream wakes
+    up are merged, so a slow client only ever gets the latest counts.
+    """
+
+    def __init__(self, availability_ids, loop):
+        self.availability_ids = frozenset(availability_ids)
+        self.loop = loop
+        self.streams = 0
+        self.version = 0
+        self.event = None
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._loaded = False
+        self._loading = None
+        self._changed = asyncio.Event()
+
+    def add(self, slots):
+        """Merge {availability_id: slots_available} into the counts; any thread"""
+        with self._lock:
+            self._counts.update(slots)
+
+    def wake(self):
+        """Render the counts and wake the channel's streams; in the channel's loop"""
+        if not self._loaded:
+            return  # The first load renders them
+        with self._lock:
+            self.event = render_slot_event(self._counts)
+        self.version += 1
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def load(self, read_counts):
+        """
+        Read the counts once per channel with read_counts(availability_ids)
+        (a coroutine function); later streams wait for the same read.
+        """
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load(read_counts))
+        try:
+            # A stream closing while the counts are read must not cancel the read
+            await asyncio.shield(self._loading)
+        except Exception:
+            if self._loading.done():
+                self._loading = None  # Read again for the next stream
+            raise
+
+    async def _load(self, read_counts):
+        counts = await read_counts(self.availability_ids)
+        with self._lock:
+            # Changes published while reading are the more recent ones
+            self._counts = {**counts, **self._counts}
+        self._loaded = True
+        self.wake()
+
+    async def wait(self, version, timeout=None):
+        """Whether the counts changed after version, waiting up to timeout seconds"""
+        if self.version != version:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class SlotEventBackend:
+    """Interface of the slot event backends"""
+
+    def subscribe(self, availability_ids):
+        """Channel of the given dates for the running event loop, with one more stream"""
+        raise NotImplementedError
+
+    def unsubscribe(self, channel):
+        """One stream of the channel is gone"""
+        raise NotImplementedError
+
+    def is_watched(self, availability_ids):
+        """Whether anybody may be watching one of the dates"""
+        return True
+
+    def publish(self, slots):
+        """Deliver {availability_id: slots_available} to the channels watching them"""
+        raise NotImplementedError
+
+
+class InProcessSlotEvents(SlotEventBackend):
+    """Channels kept in this process, by date set and indexed by availability id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._watchers = defaultdict(set)
+
+    def subscribe(self, availability_ids):
+        loop = asyncio.get_running_loop()
+        key = (loop, frozenset(availability_ids))
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = self._channels[key] = SlotChannel(availability_ids, loop)
+                for availability_id in channel.availability_ids:
+                    self._watchers[availability_id].add(channel)
+            channel.streams += 1
+        return channel
+
+    def unsubscribe(self, channel):
+        with self._lock:
+            channel.streams -= 1
+            if channel.streams:
+                return
+            del self._channels[channel.loop, channel.availability_ids]
+            for availability_id in channel.availability_ids:
+                channels = self._watchers.get(availability_id)
+                if channels is not None:
+                    channels.discard(channel)
+                    if not channels:
+                        del self._watchers[availability_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(channel.streams for channel in self._channels.values())
+
+    def is_watched(self, availability_ids):
+        with self._lock:
+            return any(availability_id in self._watchers for availability_id in availability_ids)
+
+    def publish(self, slots):
+        with self._lock:
+            targets = {
+                channel
+                for availability_id in slots
+                for channel in self._watchers.get(availability_id, ())
+            }
+        woken = defaultdict(list)
+        for channel in targets:
+            channel.add({
+                availability_id: count for availability_id, count in slots.items()
+                if availability_id in channel.availability_ids
+            })
+            woken[channel.loop].append(channel)
+        # One wake-up per event loop rather than one per channel
+        for loop, channels in woken.items():
+            loop.call_soon_threadsafe(_wake_all, channels)
+
+
+def _wake_all(channels):
+    for channel in channels:
+        channel.wake()
+
+
+@lru_cache(maxsize=None)
+def get_slot_events():
+    """The configured slot event backend (one instance per process)"""
+    return import_string(settings.SLOT_EVENTS_BACKEND)()
@@ -0,0 +1,67 @@
+"""
+Optional in-process periodic sweeper for expired booking holds.
+
+Expired holds are normally released by the expire_pending_bookings
+management command, run from cron or another scheduler. A single-process
+deployment can instead set BOOKING_HOLD_SWEEP_INTERVAL, and the server
+entry points (wsgi.py / asgi.py) then start this thread. It is off by
+default: with several workers, each would run its own sweeper.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+class PeriodicRunner(threading.Thread):
+    """Daemon thread calling func every interval seconds until stopped"""
+
+    def __init__(self, func, interval, name=None):
+        super().__init__(name=name or f'periodic-{func.__name__}', daemon=True)
+        self.func = func
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.func()
+            except Exception:
+                logger.exception('Periodic job %s failed', self.name)
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def sweep_expired_holds():
+    """Expire stale holds once and log what was reclaimed"""
+    from .models import Booking
+
+    result = Booking.expire_stale_holds()
+    if result['bookings']:
+        logger.info(
+            'Expired %(bookings)d pending bookings, reclaimed %(seats)d seats '
+            'on %(availabilities)d availabilities', result
+        )
+    return result
+
+
+def start_hold_sweeper(interval=None):
+    """Start the sweeper thread for this process (idempotent); returns it or None"""
+    global _runner
+    interval = settings.BOOKING_HOLD_SWEEP_INTERVAL if interval is None else interval
+    if not interval:
+        return None
+    with _runner_lock:
+        if _runner is None or not _runner.is_alive():
+            _runner = PeriodicRunner(sweep_expired_holds, interval, name='booking-hold-sweeper')
+            _runner.start()
+    return _runner
@@ -1,3 +1,249 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from tours.models import Park, Tour, TourCompany
+from .models import Availability, Booking, BookingRollup, Payment, PaymentWebhookEvent
+from .slot_events import InProcessSlotEvents, render_slot_event
+
+
+def create_availability(slots, days=1, tour=None):
+    if tour is None:
+        park = Park.objects.create(name='Test Park', description='Test', location='Test')
+        company = TourCompany.objects.create(name='Test Company')
+        tour = Tour.objects.create(
+            park=park, company=company, name='Test Tour', description='Test', price=100, duration_hours=1
+        )
+    return Availability.objects.create(
+        tour=tour, date=timezone.now().date() + timedelta(days=days), slots_available=slots
+    )
+
+
+def create_hold(tourist, availability, people, expires_at=None):
+    """A pending booking holding its slots, as create_booking makes it"""
+    assert availability.reserve_slots(people)
+    return Booking.objects.create(
+        tourist=tourist, availability=availability, num_of_people=people,
+        contact_email='tourist@example.com', hold_expires_at=expires_at or Booking.hold_deadline(),
+    )
+
+
+def rollup_totals():
+    """{(tour id, status): (bookings, seats, revenue)} of the non-empty rollups"""
+    return {
+        (row.tour_id, row.status): (row.bookings, row.seats, row.revenue)
+        for row in BookingRollup.objects.all()
+        if row.bookings or row.seats or row.revenue
+    }
+
+
+class ReserveSlotsTests(TransactionTestCase):
+    def test_stale_copies_never_oversell(self):
+        availability = create_availability(slots=5)
+        # Every copy was read while all five slots were free
+        copies = [Availability.objects.get(pk=availability.pk) for _ in range(8)]
+
+        results = [copy.reserve_slots(1) for copy in copies]
+
+        availability.refresh_from_db()
+        self.assertEqual(sum(results), 5)
+        self.assertEqual(availability.slots_available, 0)
+
+    def test_rejected_reservation_changes_nothing(self):
+        availability = create_availability(slots=3)
+
+        self.assertFalse(availability.reserve_slots(4))
+
+        availability.refresh_from_db()
+        self.assertEqual(availability.slots_available, 3)
+
+    def test_concurrent_reservations_never_oversell(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Threads cannot share an in-memory SQLite test database (set TEST NAME)')
+        availability = create_availability(slots=20)
+        attempts = 60
+        start = threading.Barrier(attempts)
+
+        def attempt(_):
+            try:
+                start.wait(timeout=10)
+                return Availability.objects.get(pk=availability.pk).reserve_slots(1)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=attempts) as pool:
+            results = list(pool.map(attempt, range(attempts)))
+
+        availability.refresh_from_db()
+        self.assertEqual(sum(results), 20)
+        self.assertEqual(availability.slots_available, 0)
+
+
+class PaymentWebhookTests(TransactionTestCase):
+    def setUp(self):
+        self.availability = create_availability(slots=10)
+        self.tourist = User.objects.create_user('tourist')
+        self.booking = create_hold(self.tourist, self.availability, people=2)
+        self.payment = Payment.objects.create(
+            booking=self.booking, payment_method='card', amount=200,
+            gateway_transaction_id='txn-1', status='processing',
+        )
+
+    def deliver(self, callback):
+        response = self.client.post(
+            reverse('booking:payment_webhook'), json.dumps(callback), content_type='application/json'
+        )
+        return response.status_code, json.loads(response.content)
+
+    def test_duplicate_callback_is_acknowledged_without_being_applied(self):
+        callback = {'event_id': 'event-1', 'transaction_id': 'txn-1', 'status': 'completed'}
+
+        self.assertEqual(self.deliver(callback), (200, {'status': 'success'}))
+        self.payment.refresh_from_db()
+        completed_at = self.payment.completed_at
+        for _ in range(3):
+            self.assertEqual(self.deliver(callback), (200, {'status': 'success', 'duplicate': True}))
+
+        self.booking.refresh_from_db()
+        self.availability.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual(self.booking.booking_status, 'confirmed')
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertEqual(self.payment.completed_at, completed_at)
+        self.assertEqual(self.availability.slots_available, 8)
+        self.assertEqual(PaymentWebhookEvent.objects.count(), 1)
+
+    def test_callbacks_without_event_id_are_deduplicated_by_status(self):
+        callback = {'transaction_id': 'txn-1', 'status': 'completed'}
+
+        self.assertEqual(self.deliver(callback)[1], {'status': 'success'})
+        self.assertEqual(self.deliver(callback)[1], {'status': 'success', 'duplicate': True})
+
+        self.availability.refresh_from_db()
+        self.assertEqual(self.availability.slots_available, 8)
+
+
+class ExpireStaleHoldsTests(TransactionTestCase):
+    def test_seats_are_returned_exactly_once(self):
+        availability = create_availability(slots=10)
+        tourist = User.objects.create_user('tourist')
+        lapsed = timezone.now() - timedelta(minutes=1)
+        expired = [create_hold(tourist, availability, 2, lapsed), create_hold(tourist, availability, 3, lapsed)]
+        create_hold(tourist, availability, 1)
+
+        self.assertEqual(
+            Booking.expire_stale_holds(),
+            {'bookings': 2, 'seats': 5, 'availabilities': 1},
+        )
+        self.assertEqual(
+            Booking.expire_stale_holds(),
+            {'bookings': 0, 'seats': 0, 'availabilities': 0},
+        )
+        # An expired booking cannot be cancelled again
+        booking = Booking.objects.get(pk=expired[0].pk)
+        self.assertEqual(booking.booking_status, 'cancelled')
+        self.assertFalse(booking.cancel_booking())
+
+        availability.refresh_from_db()
+        self.assertEqual(availability.slots_available, 9)
+
+    def test_holds_cancelled_or_paid_during_the_sweep_are_left_alone(self):
+        availability = create_availability(slots=10)
+        tourist = User.objects.create_user('tourist')
+        lapsed = timezone.now() - timedelta(minutes=1)
+        cancelled, paid, expired = (create_hold(tourist, availability, people, lapsed) for people in (1, 2, 3))
+        lapsed_hold_ids = Booking._lapsed_hold_ids
+
+        def read_then_race(now):
+            # Without row locks, these land between reading the holds and claiming them
+            ids = lapsed_hold_ids(now)
+            Booking.objects.get(pk=cancelled.pk).cancel_booking()
+            booking = Booking.objects.get(pk=paid.pk)
+            booking.payment_status = 'completed'
+            booking.save()
+            booking.confirm_booking()
+            return ids
+
+        with mock.patch.object(Booking, '_lapsed_hold_ids', side_effect=read_then_race):
+            result = Booking.expire_stale_holds()
+
+        self.assertEqual(result, {'bookings': 1, 'seats': 3, 'availabilities': 1})
+        statuses = dict(Booking.objects.values_list('pk', 'booking_status'))
+        self.assertEqual(
+            [statuses[cancelled.pk], statuses[paid.pk], statuses[expired.pk]],
+            ['cancelled', 'confirmed', 'cancelled'],
+        )
+        availability.refresh_from_db()
+        # Only the paid booking's seats stay taken
+        self.assertEqual(availability.slots_available, 8)
+        maintained = rollup_totals()
+        BookingRollup.rebuild()
+        self.assertEqual(maintained, rollup_totals())
+
+
+class BookingRollupTests(TransactionTestCase):
+    def test_maintained_totals_match_rebuild(self):
+        first = create_availability(slots=30)
+        second = create_availability(slots=30, days=2, tour=first.tour)
+        other = create_availability(slots=30)
+        tourist = User.objects.create_user('tourist')
+
+        paid = create_hold(tourist, first, 2)
+        paid.payment_status = 'completed'
+        paid.save()
+        paid.confirm_booking()
+        create_hold(tourist, second, 3).cancel_booking()
+        create_hold(tourist, other, 4, timezone.now() - timedelta(minutes=1))
+        Booking.expire_stale_holds()
+        resized = create_hold(tourist, other, 1)
+        resized.num_of_people = 2
+        resized.total_cost = 200
+        resized.save()
+        create_hold(tourist, first, 5).delete()
+
+        maintained = rollup_totals()
+        BookingRollup.rebuild()
+        self.assertEqual(maintained, rollup_totals())
+
+
+class SlotChannelTests(SimpleTestCase):
+    def test_streams_of_the_same_dates_share_counts(self):
+        async def scenario():
+            events = InProcessSlotEvents()
+            reads = []
+
+            async def read_counts(availability_ids):
+                reads.append(availability_ids)
+                return {1: 5, 2: 3}
+
+            first, second = events.subscribe([1, 2]), events.subscribe([2, 1])
+            other = events.subscribe([2])
+            await asyncio.gather(first.load(read_counts), second.load(read_counts), other.load(read_counts))
+            self.assertIs(first, second)
+            self.assertEqual(len(reads), 2)
+            self.assertEqual(first.event, render_slot_event({1: 5, 2: 3}))
+
+            # A stream that has not caught up gets the latest counts only
+            version = first.version
+            events.publish({2: 2})
+            events.publish({2: 1, 3: 9})
+            await asyncio.sleep(0)
+            self.assertTrue(await first.wait(version, timeout=0))
+            self.assertEqual(first.event, render_slot_event({1: 5, 2: 1}))
+            self.assertFalse(await first.wait(first.version, timeout=0))
+
+            for channel in (first, second, other):
+                events.unsubscribe(channel)
+            self.assertEqual(events.subscriber_count(), 0)
+            self.assertFalse(events.is_watched([1, 2, 3]))
+
+        asyncio.run(scenario())
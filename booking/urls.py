@@ -24,4 +24,6 @@ urlpatterns = [
     
     # AJAX URLs
     path('api/check-availability/', views.check_availability, name='check_availability'),
+    path('api/check-availability/batch/', views.check_availability_batch, name='check_availability_batch'),
+    path('api/availability-stream/', views.availability_stream, name='availability_stream'),
 ]
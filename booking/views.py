@@ -1,19 +1,23 @@
 from django.shortcuts import get_object_or_404, redirect, render
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.db import IntegrityError, transaction
+from django.conf import settings
 from django.db.models import Q
 from django.core.paginator import Paginator
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST, condition
 from django.views.decorators.csrf import csrf_exempt
 from django.urls import reverse
 import json
 import uuid
 
-from .models import Availability, Booking, Payment
+from .models import Availability, Booking, Payment, PaymentWebhookEvent
+from .slot_events import KEEPALIVE_EVENT, get_slot_events
 from .forms import BookingForm, AvailabilitySearchForm, BookingCancellationForm, PaymentMethodForm
 from tours.models import Tour
+from tours.pagination import keyset_page
 
 
 def availability_list(request):
@@ -90,17 +94,23 @@ def create_booking(request, availability_id):
                 messages.error(request, "Sorry, there are not enough slots available for this booking.")
                 return redirect('booking:availability_detail', availability_id=availability_id)
             
-            # Create the booking
-            booking = form.save(commit=False)
-            booking.availability = availability
-            booking.tourist = request.user
-            booking.save()
+            # Reserve the slots and create the booking in one transaction
+            with transaction.atomic():
+                if not availability.reserve_slots(num_people):
+                    messages.error(request, "Sorry, there are not enough slots available for this booking.")
+                    return redirect('booking:availability_detail', availability_id=availability_id)
+                
+                booking = form.save(commit=False)
+                booking.availability = availability
+                booking.tourist = request.user
+                booking.hold_expires_at = Booking.hold_deadline()
+                booking.save()
             
-            # Reduce available slots
-            availability.slots_available -= num_people
-            availability.save()
-            
-            messages.success(request, f"Booking created successfully! Booking ID: {booking.booking_id}")
+            messages.success(
+                request,
+                f"Booking created successfully! Booking ID: {booking.booking_id}. "
+                f"Your slots are held for {settings.BOOKING_HOLD_MINUTES} minutes while you complete payment."
+            )
             return redirect('booking:booking_detail', booking_id=booking.booking_id)
     else:
         form = BookingForm(availability=availability, user=request.user)
@@ -144,12 +154,9 @@ def user_bookings(request):
         tourist=request.user
     ).select_related(
         'availability', 'availability__tour', 'availability__tour__park'
-    ).order_by('-booking_date')
+    )
     
-    # Pagination
-    paginator = Paginator(bookings, 10)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = keyset_page(request, bookings, 10, ('-booking_date', '-id'))
     
     context = {
         'page_obj': page_obj,
@@ -266,6 +273,23 @@ def process_payment(request, payment_id):
 
 # AJAX Views for real-time availability checking
 
+def _availability_etag(request):
+    """
+    Validator of a check_availability answer: the date's updated_at (bumped
+    by every slot change) and today's date, which decides is_past_date.
+    """
+    try:
+        updated_at = Availability.objects.filter(
+            id=request.GET.get('availability_id') or None
+        ).values_list('updated_at', flat=True).first()
+    except ValueError:
+        return None
+    if updated_at is None:
+        return None
+    return f'{updated_at.timestamp()}-{timezone.localdate().isoformat()}'
+
+
+@condition(etag_func=_availability_etag)
 def check_availability(request):
     """AJAX endpoint to check real-time availability"""
     if request.method == 'GET':
@@ -273,7 +297,7 @@ def check_availability(request):
         num_people = int(request.GET.get('num_people', 1))
         
         try:
-            availability = Availability.objects.get(id=availability_id)
+            availability = Availability.objects.only('date', 'slots_available').get(id=availability_id)
             can_book = availability.can_book_for(num_people)
             
             return JsonResponse({
@@ -291,30 +315,132 @@ def check_availability(request):
     return JsonResponse({'error': 'Invalid request'}, status=400)
 
 
+AVAILABILITY_BATCH_LIMIT = 100
+
+
+@require_GET
+def check_availability_batch(request):
+    """
+    AJAX endpoint checking many dates in one request:
+    ?ids=12,15,19&num_people=2, or one party size per date (num_people=2,1,4).
+    Sending back the last version as ?version= returns {'changed': false}
+    instead of the results while none of them changed.
+    """
+    try:
+        ids = [int(value) for value in request.GET.get('ids', '').split(',') if value]
+        sizes = [int(value) for value in request.GET.get('num_people', '1').split(',')]
+    except ValueError:
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    if not ids or len(ids) > AVAILABILITY_BATCH_LIMIT or len(sizes) not in (1, len(ids)) or min(sizes) < 1:
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    
+    party_sizes = dict(zip(ids, sizes * len(ids) if len(sizes) == 1 else sizes))
+    results, version = Availability.check_batch(party_sizes)
+    if request.GET.get('version') == version:
+        return JsonResponse({'version': version, 'changed': False})
+    
+    return JsonResponse({
+        'version': version,
+        'changed': True,
+        'fields': ['slots_available', 'can_book'],
+        'availabilities': {str(availability_id): result for availability_id, result in results.items()},
+        'missing': [availability_id for availability_id in party_sizes if availability_id not in results],
+    })
+
+
+SLOT_STREAM_LIMIT = 100
+SLOT_STREAM_KEEPALIVE = 15
+SLOT_STREAM_RETRY = b'retry: 5000\n'
+
+
+async def _read_slot_counts(availability_ids):
+    return {
+        availability_id: count
+        async for availability_id, count in Availability.objects.filter(
+            id__in=availability_ids
+        ).values_list('id', 'slots_available')
+    }
+
+
+async def availability_stream(request):
+    """
+    Server-Sent Events stream of slots_available for ?ids=12,15,19: the
+    current counts first, then the counts after every change. Meant to be
+    served by ASGI, where an idle stream costs no thread; streams of the
+    same dates share their counts (see booking/slot_events.py).
+    """
+    try:
+        ids = [int(value) for value in request.GET.get('ids', '').split(',') if value]
+    except ValueError:
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    if not ids or len(ids) > SLOT_STREAM_LIMIT:
+        return JsonResponse({'error': 'Invalid request'}, status=400)
+    
+    async def stream():
+        events = get_slot_events()
+        # Subscribe before reading the counts so that no change is missed
+        channel = events.subscribe(ids)
+        try:
+            await channel.load(_read_slot_counts)
+            version = channel.version
+            yield SLOT_STREAM_RETRY + channel.event
+            while True:
+                if not await channel.wait(version, timeout=SLOT_STREAM_KEEPALIVE):
+                    yield KEEPALIVE_EVENT
+                elif channel.version != version:
+                    version = channel.version
+                    yield channel.event
+        finally:
+            events.unsubscribe(channel)
+    
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @require_POST
 @csrf_exempt
 def payment_webhook(request):
-    """Webhook endpoint for payment gateway callbacks"""
-    # This would handle callbacks from payment gateways like Pesapal or DPO
-    # For now, it's a placeholder
-    
+    """
+    Webhook endpoint for payment gateway callbacks.
+    Gateways retry a callback until it is acknowledged. Every applied event
+    is recorded in the PaymentWebhookEvent ledger, so a retry is
+    acknowledged with one indexed lookup and never reaches the booking.
+    """
+    # The structure of the callback depends on the payment gateway
     try:
         data = json.loads(request.body)
-        
-        # Extract payment information from webhook data
-        # This structure would depend on the specific payment gateway
-        gateway_transaction_id = data.get('transaction_id')
-        status = data.get('status')
-        
-        # Find the payment record
-        payment = Payment.objects.get(gateway_transaction_id=gateway_transaction_id)
-        
-        if status == 'completed':
-            payment.mark_completed()
-        elif status == 'failed':
-            payment.mark_failed()
-        
-        return JsonResponse({'status': 'success'})
+        gateway_transaction_id = data['transaction_id']
+        status = str(data.get('status') or '')
+    except (json.JSONDecodeError, KeyError, TypeError):
+        return JsonResponse({'status': 'error'}, status=400)
+    if not gateway_transaction_id:
+        return JsonResponse({'status': 'error'}, status=400)
     
-    except (json.JSONDecodeError, Payment.DoesNotExist, KeyError):
+    # Gateways without event IDs send one callback per status change
+    event_id = str(data.get('event_id') or f'{gateway_transaction_id}:{status}')
+    if PaymentWebhookEvent.objects.filter(event_id=event_id).exists():
+        return JsonResponse({'status': 'success', 'duplicate': True})
+    
+    try:
+        with transaction.atomic():
+            payment = Payment.objects.select_related('booking__availability__tour').get(
+                gateway_transaction_id=gateway_transaction_id
+            )
+            if status == 'completed':
+                payment.mark_completed()
+                if payment.status == 'refund_due':
+                    # Not applied: the booking could not be confirmed and the
+                    # payment waits for a refund
+                    return JsonResponse({'status': 'refund_due'})
+            elif status == 'failed':
+                payment.mark_failed()
+            PaymentWebhookEvent.objects.create(event_id=event_id, payment=payment, status=status[:20])
+    except (Payment.DoesNotExist, Payment.MultipleObjectsReturned):
         return JsonResponse({'status': 'error'}, status=400)
+    except IntegrityError:
+        # The same event arrived concurrently and the other request recorded it
+        return JsonResponse({'status': 'success', 'duplicate': True})
+    
+    return JsonResponse({'status': 'success'})
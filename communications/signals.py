@@ -1,7 +1,9 @@
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.conf import settings
-from booking.models import Booking, Payment
+from django.db import transaction
+from booking.models import Booking
+from booking.signals import payment_completed
 from .tasks import send_booking_confirmation, send_payment_confirmation
 import logging
 
@@ -20,16 +22,20 @@ def booking_created_handler(sender, instance, created, **kwargs):
             logger.error(f"Failed to queue booking confirmation for {instance.booking_id}: {str(e)}")
 
 
-@receiver(post_save, sender=Payment)
-def payment_completed_handler(sender, instance, created, **kwargs):
-    """Send payment confirmation when payment is completed"""
-    if not created and instance.status == 'completed' and getattr(settings, 'SEND_NOTIFICATIONS', True):
-        try:
-            # Queue payment confirmation task
-            send_payment_confirmation.delay(str(instance.payment_id))
-            logger.info(f"Payment confirmation task queued for payment {instance.payment_id}")
-        except Exception as e:
-            logger.error(f"Failed to queue payment confirmation for {instance.payment_id}: {str(e)}")
+@receiver(payment_completed)
+def payment_completed_handler(sender, payment, **kwargs):
+    """Send payment confirmation once the completed payment is committed"""
+    if getattr(settings, 'SEND_NOTIFICATIONS', True):
+        transaction.on_commit(lambda: queue_payment_confirmation(payment))
+
+
+def queue_payment_confirmation(payment):
+    try:
+        # Queue payment confirmation task
+        send_payment_confirmation.delay(str(payment.payment_id))
+        logger.info(f"Payment confirmation task queued for payment {payment.payment_id}")
+    except Exception as e:
+        logger.error(f"Failed to queue payment confirmation for {payment.payment_id}: {str(e)}")
 
 
 @receiver(post_save, sender=Booking)
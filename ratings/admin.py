@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Rating, RatingPhoto, RatingReply, RatingHelpful
+from .models import Rating, RatingAggregate, RatingPhoto, RatingReply, RatingHelpful
 
 
 class RatingPhotoInline(admin.TabularInline):
@@ -108,3 +108,10 @@ class RatingReplyAdmin(admin.ModelAdmin):
         return '-'
     
     comment_preview.short_description = 'Comment'
+
+
+@admin.register(RatingAggregate)
+class RatingAggregateAdmin(admin.ModelAdmin):
+    list_display = ('id', 'content_type', 'object_id', 'ratings_count', 'average_rating', 'updated_at')
+    list_filter = ('content_type',)
+    readonly_fields = [field.name for field in RatingAggregate._meta.fields]
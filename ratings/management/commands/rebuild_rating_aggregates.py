@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from ratings.models import RatingAggregate
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalised rating aggregates from the approved ratings'
+
+    def handle(self, *args, **options):
+        rebuilt = RatingAggregate.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {rebuilt} objects.'))
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+CATEGORIES = ['value', 'service', 'cleanliness', 'knowledge']
+
+
+def backfill_aggregates(apps, schema_editor):
+    """Build the aggregates of the ratings that already exist"""
+    Rating = apps.get_model('ratings', 'Rating')
+    RatingAggregate = apps.get_model('ratings', 'RatingAggregate')
+
+    annotations = {
+        'ratings_count': models.Count('id'),
+        'rating_sum': models.Sum('overall_rating'),
+        'verified_count': models.Count('id', filter=models.Q(is_verified=True)),
+    }
+    for star in range(1, 6):
+        annotations[f'star_{star}_count'] = models.Count('id', filter=models.Q(overall_rating=star))
+    for prefix in CATEGORIES:
+        annotations[f'{prefix}_sum'] = models.Sum(f'{prefix}_rating')
+        annotations[f'{prefix}_count'] = models.Count(f'{prefix}_rating')
+
+    rows = Rating.objects.filter(status='approved').order_by().values(
+        'content_type_id', 'object_id'
+    ).annotate(**annotations)
+    RatingAggregate.objects.bulk_create(
+        [RatingAggregate(**{name: value or 0 for name, value in row.items()}) for row in rows],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('ratings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('ratings_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('verified_count', models.IntegerField(default=0)),
+                ('star_1_count', models.IntegerField(default=0)),
+                ('star_2_count', models.IntegerField(default=0)),
+                ('star_3_count', models.IntegerField(default=0)),
+                ('star_4_count', models.IntegerField(default=0)),
+                ('star_5_count', models.IntegerField(default=0)),
+                ('value_sum', models.IntegerField(default=0)),
+                ('value_count', models.IntegerField(default=0)),
+                ('service_sum', models.IntegerField(default=0)),
+                ('service_count', models.IntegerField(default=0)),
+                ('cleanliness_sum', models.IntegerField(default=0)),
+                ('cleanliness_count', models.IntegerField(default=0)),
+                ('knowledge_sum', models.IntegerField(default=0)),
+                ('knowledge_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
@@ -16,7 +16,7 @@ class RatableMixin:
         return Rating.objects.filter(
             content_type=content_type, 
             object_id=self.id,
-            status='approved'
+            status=Rating.PUBLISHED_STATUS
         )
     
     @property
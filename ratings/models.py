@@ -1,83 +1,89 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.urls import reverse
 
 
+class RatableQuerySet(models.QuerySet):
+    """QuerySet for ratable models that can annotate rating figures in bulk"""
+    
+    def with_ratings(self):
+        """
+        Annotate the rating count and sum of every object from its
+        RatingAggregate, so a whole list page needs no per-object lookups.
+        """
+        aggregates = RatingAggregate.objects.filter(
+            content_type=ContentType.objects.get_for_model(self.model),
+            object_id=models.OuterRef('pk')
+        )
+        return self.annotate(
+            annotated_ratings_count=Coalesce(
+                models.Subquery(aggregates.values('ratings_count')[:1]), 0
+            ),
+            annotated_rating_sum=Coalesce(
+                models.Subquery(aggregates.values('rating_sum')[:1]), 0
+            ),
+        )
+
+
 class RatableMixin:
     """
     A mixin that adds rating-related functionality to a model.
+    Rating figures are read from the denormalised RatingAggregate row of the
+    object, which is looked up once per instance and then reused. Like the
+    reviews listed by get_ratings, they cover approved ratings only.
     """
     def get_content_type(self):
         """Get the ContentType for this model"""
         return ContentType.objects.get_for_model(self)
+    
+    @property
+    def rating_aggregate(self):
+        """The RatingAggregate for this object (an empty one if never rated)"""
+        if not hasattr(self, '_rating_aggregate'):
+            content_type = ContentType.objects.get_for_model(self)
+            self._rating_aggregate = RatingAggregate.objects.filter(
+                content_type=content_type,
+                object_id=self.id
+            ).first() or RatingAggregate(content_type=content_type, object_id=self.id)
+        return self._rating_aggregate
         
     @property
     def average_rating(self):
         """Get the average rating for this object"""
-        ratings = Rating.objects.filter(
-            content_type=ContentType.objects.get_for_model(self),
-            object_id=self.id
-        )
-        if ratings.exists():
-            return ratings.aggregate(avg=models.Avg('overall_rating'))['avg']
-        return 0
+        count = getattr(self, 'annotated_ratings_count', None)
+        if count is not None:
+            # Annotated by RatableQuerySet.with_ratings()
+            return self.annotated_rating_sum / count if count > 0 else 0
+        return self.rating_aggregate.average_rating
     
     @property
     def ratings_count(self):
         """Get the number of ratings for this object"""
-        return Rating.objects.filter(
-            content_type=ContentType.objects.get_for_model(self),
-            object_id=self.id
-        ).count()
+        count = getattr(self, 'annotated_ratings_count', None)
+        if count is not None:
+            return count
+        return self.rating_aggregate.ratings_count
+    
+    @property
+    def rating_version(self):
+        """Changes with every change to the object's ratings; for fragment cache keys"""
+        aggregate = self.rating_aggregate
+        if aggregate.pk is None:
+            return 'none'
+        return f'{aggregate.ratings_count}-{aggregate.updated_at.timestamp()}'
     
     def get_specific_ratings(self):
         """Get the average of each specific rating category"""
-        ratings = Rating.objects.filter(
-            content_type=ContentType.objects.get_for_model(self),
-            object_id=self.id
-        )
-        
-        if not ratings.exists():
-            return {}
-        
-        # Calculate average for each specific rating field
-        specific_ratings = {}
-        fields = [
-            ('value_rating', 'Value'),
-            ('service_rating', 'Service'),
-            ('cleanliness_rating', 'Cleanliness'),
-            ('knowledge_rating', 'Knowledge')
-        ]
-        
-        for field, label in fields:
-            avg = ratings.aggregate(avg=models.Avg(field))['avg']
-            if avg:
-                specific_ratings[label] = avg
-        
-        return specific_ratings
+        return self.rating_aggregate.get_specific_ratings()
     
     def get_rating_breakdown(self):
         """Get the breakdown of ratings (e.g., how many 5-star, 4-star, etc.)"""
-        ratings = Rating.objects.filter(
-            content_type=ContentType.objects.get_for_model(self),
-            object_id=self.id
-        )
-        
-        total = ratings.count()
-        if total == 0:
-            return []
-        
-        breakdown = []
-        for star in range(5, 0, -1):
-            count = ratings.filter(overall_rating=star).count()
-            percentage = (count / total) * 100 if total > 0 else 0
-            breakdown.append((star, percentage, count))
-        
-        return breakdown
+        return self.rating_aggregate.get_rating_breakdown()
     
     def get_add_rating_url(self):
         """Get URL to add a rating for this object"""
@@ -150,6 +156,9 @@ class Rating(models.Model):
         ('rejected', 'Rejected'),
     ]
     status = models.CharField(max_length=20, choices=RATING_STATUS, default='approved')
+    # Only published ratings are listed and counted in averages; pending and
+    # rejected ones are visible to moderators only
+    PUBLISHED_STATUS = 'approved'
     
     # If the rating is verified (e.g., user actually booked the tour)
     is_verified = models.BooleanField(default=False, help_text="Whether this rating is from a verified booking")
@@ -161,11 +170,163 @@ class Rating(models.Model):
         ordering = ['-created_at']
         # Ensure a user can only rate an object once (can modify their rating later)
         unique_together = ('user', 'content_type', 'object_id')
+        indexes = [
+            # Approved reviews of an object, newest first
+            models.Index(fields=['content_type', 'object_id', 'status', '-created_at'], name='ratings_object_status_created'),
+        ]
     
     def __str__(self):
         return f"{self.user.username}'s {self.overall_rating}-star rating for {self.content_object}"
 
 
+class RatingAggregate(models.Model):
+    """
+    Denormalised rating totals for one rated object (approved ratings only).
+    Maintained incrementally by the handlers in ratings/signals.py and
+    rebuilt from scratch by the rebuild_rating_aggregates command.
+    """
+    # Specific rating fields and the labels they are displayed with
+    CATEGORY_FIELDS = [
+        ('value_rating', 'value', 'Value'),
+        ('service_rating', 'service', 'Service'),
+        ('cleanliness_rating', 'cleanliness', 'Cleanliness'),
+        ('knowledge_rating', 'knowledge', 'Knowledge'),
+    ]
+    
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    
+    # Overall rating totals
+    ratings_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    verified_count = models.IntegerField(default=0)
+    
+    # Histogram of overall ratings
+    star_1_count = models.IntegerField(default=0)
+    star_2_count = models.IntegerField(default=0)
+    star_3_count = models.IntegerField(default=0)
+    star_4_count = models.IntegerField(default=0)
+    star_5_count = models.IntegerField(default=0)
+    
+    # Per-category sums and counts (specific ratings are optional)
+    value_sum = models.IntegerField(default=0)
+    value_count = models.IntegerField(default=0)
+    service_sum = models.IntegerField(default=0)
+    service_count = models.IntegerField(default=0)
+    cleanliness_sum = models.IntegerField(default=0)
+    cleanliness_count = models.IntegerField(default=0)
+    knowledge_sum = models.IntegerField(default=0)
+    knowledge_count = models.IntegerField(default=0)
+    
+    updated_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ('content_type', 'object_id')
+    
+    def __str__(self):
+        return f"Ratings of {self.content_type} #{self.object_id}: {self.ratings_count}"
+    
+    @property
+    def average_rating(self):
+        """Average overall rating, 0 when there are no ratings"""
+        if self.ratings_count > 0:
+            return self.rating_sum / self.ratings_count
+        return 0
+    
+    def get_specific_ratings(self):
+        """Average of each specific rating category, keyed by label"""
+        specific_ratings = {}
+        for field, prefix, label in self.CATEGORY_FIELDS:
+            count = getattr(self, f'{prefix}_count')
+            if count > 0:
+                specific_ratings[label] = getattr(self, f'{prefix}_sum') / count
+        return specific_ratings
+    
+    def get_rating_breakdown(self):
+        """List of (star, percentage, count) tuples from 5 stars down to 1"""
+        total = self.ratings_count
+        if total <= 0:
+            return []
+        
+        breakdown = []
+        for star in range(5, 0, -1):
+            count = getattr(self, f'star_{star}_count')
+            breakdown.append((star, (count / total) * 100, count))
+        return breakdown
+    
+    @classmethod
+    def contribution(cls, rating):
+        """
+        The amounts a single rating adds to its object's aggregate.
+        `rating` may be a Rating instance or a dict of its field values.
+        """
+        get = rating.get if isinstance(rating, dict) else lambda name: getattr(rating, name)
+        if get('status') != Rating.PUBLISHED_STATUS:
+            return {}
+        
+        overall = get('overall_rating')
+        deltas = {
+            'ratings_count': 1,
+            'rating_sum': overall,
+            f'star_{overall}_count': 1,
+            'verified_count': 1 if get('is_verified') else 0,
+        }
+        for field, prefix, label in cls.CATEGORY_FIELDS:
+            value = get(field)
+            if value is not None:
+                deltas[f'{prefix}_sum'] = value
+                deltas[f'{prefix}_count'] = 1
+        return deltas
+    
+    @classmethod
+    def apply_deltas(cls, content_type_id, object_id, deltas):
+        """Add the given amounts to an object's aggregate with one UPDATE"""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        
+        aggregate, created = cls.objects.get_or_create(
+            content_type_id=content_type_id,
+            object_id=object_id
+        )
+        cls.objects.filter(pk=aggregate.pk).update(
+            updated_at=timezone.now(),
+            **{field: models.F(field) + delta for field, delta in deltas.items()}
+        )
+    
+    @classmethod
+    def touch(cls, content_type_id, object_id):
+        """Mark an object's ratings as changed without changing the figures"""
+        cls.objects.filter(content_type_id=content_type_id, object_id=object_id).update(updated_at=timezone.now())
+    
+    @classmethod
+    def rebuild(cls):
+        """Recompute every aggregate from the approved ratings in one grouped query"""
+        annotations = {
+            'ratings_count': models.Count('id'),
+            'rating_sum': models.Sum('overall_rating'),
+            'verified_count': models.Count('id', filter=models.Q(is_verified=True)),
+        }
+        for star in range(1, 6):
+            annotations[f'star_{star}_count'] = models.Count('id', filter=models.Q(overall_rating=star))
+        for field, prefix, label in cls.CATEGORY_FIELDS:
+            annotations[f'{prefix}_sum'] = models.Sum(field)
+            annotations[f'{prefix}_count'] = models.Count(field)
+        
+        rows = Rating.objects.filter(status=Rating.PUBLISHED_STATUS).order_by().values(
+            'content_type_id', 'object_id'
+        ).annotate(**annotations)
+        
+        aggregates = [
+            cls(**{name: value or 0 for name, value in row.items()})
+            for row in rows
+        ]
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(aggregates, batch_size=500)
+        return len(aggregates)
+
+
 class RatingPhoto(models.Model):
     """Photos attached to ratings"""
     rating = models.ForeignKey(Rating, on_delete=models.CASCADE, related_name='photos')
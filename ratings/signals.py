@@ -1,8 +1,64 @@
 # In ratings/signals.py
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Avg
-from .models import Rating
+from .models import Rating, RatingAggregate
 
-# We'll add signal handlers here to update average ratings on related models
-# For example, when a tour gets a new rating, we'll update its average rating
+# Keep RatingAggregate in step with Rating: every save, delete or status change
+# adds the difference between the rating's new and old contribution.
+
+AGGREGATED_FIELDS = [
+    'content_type_id', 'object_id', 'status', 'is_verified', 'overall_rating',
+] + [field for field, prefix, label in RatingAggregate.CATEGORY_FIELDS]
+
+
+def _target(values):
+    return values['content_type_id'], values['object_id']
+
+
+def _snapshot(rating):
+    return {field: getattr(rating, field) for field in AGGREGATED_FIELDS}
+
+
+@receiver(pre_save, sender=Rating)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    """Remember what the rating contributed before this save"""
+    previous = None
+    if instance.pk and not raw:
+        previous = Rating.objects.filter(pk=instance.pk).values(*AGGREGATED_FIELDS).first()
+    instance._aggregate_previous = previous
+
+
+@receiver(post_save, sender=Rating)
+def update_aggregate_on_save(sender, instance, raw=False, **kwargs):
+    """Apply the change in this rating's contribution to its aggregate"""
+    if raw:
+        return
+    
+    previous = getattr(instance, '_aggregate_previous', None)
+    current = _snapshot(instance)
+    new_deltas = RatingAggregate.contribution(current)
+    old_deltas = RatingAggregate.contribution(previous) if previous else {}
+    
+    if previous and _target(previous) != _target(current):
+        # The rating was moved to another object
+        RatingAggregate.apply_deltas(*_target(previous), {k: -v for k, v in old_deltas.items()})
+        old_deltas = {}
+    
+    deltas = dict(new_deltas)
+    for field, value in old_deltas.items():
+        deltas[field] = deltas.get(field, 0) - value
+    if any(deltas.values()):
+        RatingAggregate.apply_deltas(*_target(current), deltas)
+    elif new_deltas:
+        # An approved rating changed without changing the figures (e.g. its
+        # comment); listed reviews still need to be rendered again
+        RatingAggregate.touch(*_target(current))
+    instance._aggregate_previous = current
+
+
+@receiver(post_delete, sender=Rating)
+def update_aggregate_on_delete(sender, instance, **kwargs):
+    """Remove a deleted rating's contribution from its aggregate"""
+    current = _snapshot(instance)
+    deltas = RatingAggregate.contribution(current)
+    RatingAggregate.apply_deltas(*_target(current), {k: -v for k, v in deltas.items()})
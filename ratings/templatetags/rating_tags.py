@@ -72,6 +72,7 @@ def display_rating_summary(obj):
     """
     Display a summary of ratings including average and count
     Usage: {% display_rating_summary tour %}
+    Objects loaded with .with_ratings() render without any query.
     """
     if not hasattr(obj, 'average_rating') or not hasattr(obj, 'ratings_count'):
         return mark_safe('<span class="text-gray-500">No ratings yet</span>')
@@ -113,7 +114,7 @@ def show_recent_ratings(obj, limit=3):
     ratings = Rating.objects.filter(
         content_type=content_type,
         object_id=obj.id,
-        status='approved'
+        status=Rating.PUBLISHED_STATUS
     ).select_related('user').order_by('-created_at')[:limit]
     
     return {
@@ -1,3 +1,78 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import TransactionTestCase
 
-# Create your tests here.
+from tours.models import Park, Tour, TourCompany
+from .models import Rating, RatingAggregate
+
+FIGURES = [
+    field.name for field in RatingAggregate._meta.get_fields()
+    if field.name not in ('id', 'content_type', 'object_id', 'updated_at')
+]
+
+
+def aggregate_figures():
+    """{(content type id, object id): figures} of the non-empty aggregates"""
+    figures = {}
+    for aggregate in RatingAggregate.objects.all():
+        values = tuple(getattr(aggregate, name) for name in FIGURES)
+        if any(values):
+            figures[aggregate.content_type_id, aggregate.object_id] = values
+    return figures
+
+
+class RatingAggregateTests(TransactionTestCase):
+    def setUp(self):
+        park = Park.objects.create(name='Test Park', description='Test', location='Test')
+        company = TourCompany.objects.create(name='Test Company')
+        self.tours = [
+            Tour.objects.create(
+                park=park, company=company, name=f'Test Tour {number}', description='Test',
+                price=100, duration_hours=1
+            )
+            for number in range(2)
+        ]
+        self.tour_type = ContentType.objects.get_for_model(Tour)
+        self.users = [User.objects.create_user(f'rater{number}') for number in range(5)]
+
+    def rate(self, user, tour, overall, **fields):
+        return Rating.objects.create(
+            user=user, content_type=self.tour_type, object_id=tour.pk, overall_rating=overall, **fields
+        )
+
+    def test_maintained_figures_match_rebuild(self):
+        first, second = self.tours
+        self.rate(self.users[0], first, 5, value_rating=4, is_verified=True)
+        pending = self.rate(self.users[1], first, 2, status='pending')
+        rejected = self.rate(self.users[2], first, 1, status='rejected')
+        edited = self.rate(self.users[3], first, 3, service_rating=2)
+        moved = self.rate(self.users[4], first, 4, cleanliness_rating=5)
+
+        pending.status = 'approved'
+        pending.save()
+        rejected.comment = 'Not shown'
+        rejected.save()
+        edited.overall_rating = 4
+        edited.service_rating = None
+        edited.knowledge_rating = 3
+        edited.save()
+        moved.object_id = second.pk
+        moved.save()
+        self.rate(self.users[0], second, 2).delete()
+        withdrawn = self.rate(self.users[1], second, 1)
+        withdrawn.status = 'rejected'
+        withdrawn.save()
+
+        maintained = aggregate_figures()
+        RatingAggregate.rebuild()
+        self.assertEqual(maintained, aggregate_figures())
+
+    def test_only_approved_ratings_count(self):
+        tour = self.tours[0]
+        self.rate(self.users[0], tour, 5)
+        self.rate(self.users[1], tour, 1, status='pending')
+        self.rate(self.users[2], tour, 1, status='rejected')
+
+        aggregate = RatingAggregate.objects.get(content_type=self.tour_type, object_id=tour.pk)
+        self.assertEqual(aggregate.ratings_count, 1)
+        self.assertEqual(aggregate.average_rating, 5)
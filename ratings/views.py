@@ -7,7 +7,9 @@ from django.urls import reverse
 from django.views.decorators.http import require_POST
 from django.db.models import Count, Avg, Q
 
-from .models import Rating, RatingPhoto, RatingReply, RatingHelpful
+from tours.pagination import keyset_page
+
+from .models import Rating, RatingAggregate, RatingPhoto, RatingReply, RatingHelpful
 from .forms import RatingForm, RatingReplyForm
 
 
@@ -292,12 +294,13 @@ def get_ratings(request, app_label, model_name, object_id):
     except ContentType.DoesNotExist:
         return JsonResponse({'status': 'error', 'message': 'Invalid content type'})
     
-    # Get ratings
+    # Get ratings; filtered and unfiltered statistics both cover the
+    # published ratings only, like RatingAggregate
     ratings = Rating.objects.filter(
         content_type=content_type,
         object_id=object_id,
-        status='approved'
-    ).order_by('-is_verified', '-created_at')
+        status=Rating.PUBLISHED_STATUS
+    )
     
     # Apply filters
     rating_filter = request.GET.get('filter')
@@ -309,11 +312,8 @@ def get_ratings(request, app_label, model_name, object_id):
         # Filter by star rating
         ratings = ratings.filter(overall_rating=int(rating_filter))
     
-    # Paginate
-    from django.core.paginator import Paginator
-    paginator = Paginator(ratings, 5)
-    page = request.GET.get('page', 1)
-    ratings_page = paginator.get_page(page)
+    # Paginate by cursor; the total comes with the statistics below
+    ratings_page = keyset_page(request, ratings, 5, ('-is_verified', '-created_at', '-id'))
     
     # Build response
     ratings_data = []
@@ -355,18 +355,33 @@ def get_ratings(request, app_label, model_name, object_id):
         ratings_data.append(rating_data)
     
     # Calculate rating statistics
-    rating_stats = {
-        'average': ratings.aggregate(avg=Avg('overall_rating'))['avg'] or 0,
-        'count': ratings.count(),
-        'verified_count': ratings.filter(is_verified=True).count(),
-        'distribution': {
-            '5': ratings.filter(overall_rating=5).count(),
-            '4': ratings.filter(overall_rating=4).count(),
-            '3': ratings.filter(overall_rating=3).count(),
-            '2': ratings.filter(overall_rating=2).count(),
-            '1': ratings.filter(overall_rating=1).count(),
+    if rating_filter:
+        rating_stats = {
+            'average': ratings.aggregate(avg=Avg('overall_rating'))['avg'] or 0,
+            'count': ratings.count(),
+            'verified_count': ratings.filter(is_verified=True).count(),
+            'distribution': {
+                '5': ratings.filter(overall_rating=5).count(),
+                '4': ratings.filter(overall_rating=4).count(),
+                '3': ratings.filter(overall_rating=3).count(),
+                '2': ratings.filter(overall_rating=2).count(),
+                '1': ratings.filter(overall_rating=1).count(),
+            }
+        }
+    else:
+        # Unfiltered statistics come straight from the denormalised aggregate
+        aggregate = RatingAggregate.objects.filter(
+            content_type=content_type,
+            object_id=object_id
+        ).first() or RatingAggregate()
+        rating_stats = {
+            'average': aggregate.average_rating,
+            'count': aggregate.ratings_count,
+            'verified_count': aggregate.verified_count,
+            'distribution': {
+                str(star): getattr(aggregate, f'star_{star}_count') for star in range(5, 0, -1)
+            }
         }
-    }
     
     return JsonResponse({
         'status': 'success',
@@ -375,7 +390,8 @@ def get_ratings(request, app_label, model_name, object_id):
         'pagination': {
             'has_next': ratings_page.has_next(),
             'has_previous': ratings_page.has_previous(),
-            'current_page': ratings_page.number,
-            'total_pages': paginator.num_pages,
+            'next_cursor': ratings_page.next_cursor,
+            'previous_cursor': ratings_page.previous_cursor,
+            'total': rating_stats['count'],
         }
     })
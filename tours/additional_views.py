@@ -3,6 +3,10 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.utils import timezone
 from .models import Tour, Guide, TourCompany
 from booking.models import Availability
+from .page_cache import cache_public_page
+
+
+@cache_public_page(lambda guide_id: [f'guide:{guide_id}'])
 def guide_detail(request, guide_id):
     """Detailed guide view with ratings and tours"""
     guide = get_object_or_404(Guide.objects.select_related('user'), id=guide_id)
@@ -32,6 +36,7 @@ def guide_detail(request, guide_id):
     return render(request, 'tours/guide_detail.html', context)
 
 
+@cache_public_page(lambda company_id: [f'company:{company_id}'])
 def company_detail(request, company_id):
     """Detailed tour company view with ratings and tours"""
     company = get_object_or_404(TourCompany, id=company_id)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ToursConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tours'
+
+    def ready(self):
+        import tours.checks
+        import tours.signals
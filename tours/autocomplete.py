@@ -0,0 +1,148 @@
+"""
+In-memory prefix index behind the tour search typeahead.
+
+Suggestions (tours, parks, park locations and guide specializations) are
+kept in a sorted array of lowercased keys and found with bisect, so a
+lookup never touches the database. Every word of a label is a key, so
+"trek" suggests "Gorilla trek".
+
+Model signals bump a version stored in the cache (see tours/signals.py);
+each process rebuilds its copy of the index on the next lookup after the
+version changed.
+"""
+import logging
+import re
+import threading
+from bisect import bisect_left
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, transaction
+from django.urls import reverse
+from django.utils.http import urlencode
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_VERSION_KEY = 'tour_autocomplete_version'
+
+# Order of suggestion types in results
+SUGGESTION_TYPES = ['tour', 'park', 'location', 'specialization']
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'\w+', text.lower()))
+
+
+class PrefixIndex:
+    """Sorted (key, suggestion) array answering prefix lookups with bisect"""
+
+    def __init__(self, suggestions=()):
+        entries = []
+        for suggestion in suggestions:
+            words = normalize(suggestion['label']).split()
+            # One key per word, running to the end of the label
+            for position in range(len(words)):
+                entries.append((' '.join(words[position:]), suggestion))
+        entries.sort(key=lambda entry: entry[0])
+        self.keys = [key for key, suggestion in entries]
+        self.suggestions = [suggestion for key, suggestion in entries]
+
+    def lookup(self, prefix, limit=10):
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        matches = []
+        seen = set()
+        position = bisect_left(self.keys, prefix)
+        while position < len(self.keys) and self.keys[position].startswith(prefix):
+            suggestion = self.suggestions[position]
+            identity = (suggestion['type'], suggestion['label'])
+            if identity not in seen:
+                seen.add(identity)
+                matches.append(suggestion)
+            position += 1
+        # Labels starting with the prefix first, then by type and label
+        matches.sort(key=lambda suggestion: (
+            not normalize(suggestion['label']).startswith(prefix),
+            SUGGESTION_TYPES.index(suggestion['type']),
+            suggestion['label'].lower(),
+        ))
+        return matches[:limit]
+
+
+def build_suggestions():
+    """All suggestions from the database, in three queries"""
+    from .models import Tour, Park, Guide
+
+    def search_url(term):
+        return f"{reverse('tours:tour_list')}?{urlencode({'search_query': term})}"
+
+    suggestions = []
+    for tour_id, name, park_name in Tour.objects.values_list('id', 'name', 'park__name'):
+        suggestions.append({
+            'type': 'tour', 'label': name, 'detail': park_name,
+            'url': reverse('tours:tour_detail', args=[tour_id]),
+        })
+    locations = set()
+    for park_id, name, location in Park.objects.values_list('id', 'name', 'location'):
+        suggestions.append({
+            'type': 'park', 'label': name, 'detail': location,
+            'url': reverse('tours:park_detail', args=[park_id]),
+        })
+        locations.add(location)
+    for location in sorted(filter(None, locations)):
+        suggestions.append({'type': 'location', 'label': location, 'detail': '', 'url': search_url(location)})
+    specializations = set(Guide.objects.values_list('specialization', flat=True).distinct())
+    for specialization in sorted(filter(None, specializations)):
+        suggestions.append({
+            'type': 'specialization', 'label': specialization, 'detail': '', 'url': search_url(specialization),
+        })
+    return suggestions
+
+
+class AutocompleteIndex:
+    """Process-wide prefix index, rebuilt when the shared version changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+
+    def current_version(self):
+        return cache.get_or_set(
+            AUTOCOMPLETE_VERSION_KEY, lambda: uuid4().hex, settings.CACHE_VERSION_TIMEOUT
+        )
+
+    def build(self):
+        version = self.current_version()
+        index = PrefixIndex(build_suggestions())
+        with self._lock:
+            self._index, self._version = index, version
+        return index
+
+    def get_index(self):
+        if self._index is None or self._version != self.current_version():
+            return self.build()
+        return self._index
+
+    def lookup(self, prefix, limit=10):
+        return self.get_index().lookup(prefix, limit)
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+def invalidate_autocomplete():
+    """Have every process rebuild its index once the transaction commits"""
+    def bump():
+        cache.set(AUTOCOMPLETE_VERSION_KEY, uuid4().hex, settings.CACHE_VERSION_TIMEOUT)
+    transaction.on_commit(bump)
+
+
+def warm_autocomplete():
+    """Build the index at server startup so the first lookup is fast"""
+    try:
+        autocomplete_index.build()
+    except DatabaseError:
+        logger.warning('Tour autocomplete index not built at startup', exc_info=True)
@@ -0,0 +1,30 @@
+"""
+System checks for the tours app.
+"""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Cache backends keeping their entries inside each worker process
+PER_PROCESS_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_page_cache_backend(app_configs, **kwargs):
+    """
+    The page cache, form choices and notification polls are invalidated by
+    bumping version keys in the default cache. With a per-process backend a
+    bump only reaches the worker making the change, the others serving stale
+    content until CACHE_VERSION_TIMEOUT. Run by check --deploy, since a
+    single runserver process is fine.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PER_PROCESS_CACHE_BACKENDS:
+        return []
+    return [Warning(
+        f'The page cache runs on the per-process cache backend {backend}.',
+        hint='With several worker processes, invalidations only reach the process making '
+             'the change. Use a shared backend (e.g. Redis or Memcached) for CACHES["default"].',
+        id='tours.W001',
+    )]
@@ -0,0 +1,103 @@
+"""
+Shared, versioned cache of the guide, park and tour choices used by the
+search and availability forms.
+
+Each choice set is stored under a key that includes its version. Model
+signals bump the version (see tours/signals.py), so every process reads
+fresh rows on its next lookup, and stale entries simply expire. On a warm
+cache, building the forms costs no queries.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CHOICES_TIMEOUT = 60 * 60 * 24
+
+
+def _version_key(name):
+    return f'form_choices_version:{name}'
+
+
+def _load_guides():
+    from .models import Guide
+    return list(Guide.objects.order_by('id').values(
+        'id', 'specialization', 'user__username', 'user__first_name', 'user__last_name'
+    ))
+
+
+def _load_parks():
+    from .models import Park
+    return list(Park.objects.order_by('id').values_list('id', 'name'))
+
+
+def _load_tours():
+    from .models import Tour, TourCompany
+    tours = list(Tour.objects.order_by('name').values('id', 'name', 'company_id', 'company__is_uwa'))
+    operators = {}
+    for company_id, user_id in TourCompany.operators.through.objects.values_list('tourcompany_id', 'user_id'):
+        operators.setdefault(company_id, set()).add(user_id)
+    return {'tours': tours, 'operators': operators}
+
+
+LOADERS = {
+    'guides': _load_guides,
+    'parks': _load_parks,
+    'tours': _load_tours,
+}
+
+
+def choices_version(name):
+    """Current version of a choice set; changes whenever its rows do"""
+    return cache.get_or_set(_version_key(name), lambda: uuid4().hex, settings.CACHE_VERSION_TIMEOUT)
+
+
+def get_choices(name):
+    """Cached rows of one choice set: 'guides', 'parks' or 'tours'"""
+    key = f'form_choices:{name}:{choices_version(name)}'
+    rows = cache.get(key)
+    if rows is None:
+        rows = LOADERS[name]()
+        cache.set(key, rows, CHOICES_TIMEOUT)
+    return rows
+
+
+def invalidate_choices(*names):
+    """Bump the version of the given choice sets once the transaction commits"""
+    def bump():
+        for name in names:
+            cache.set(_version_key(name), uuid4().hex, settings.CACHE_VERSION_TIMEOUT)
+    transaction.on_commit(bump)
+
+
+def guide_name(guide):
+    """Full name of a cached guide row, or '' when the user has none"""
+    return f"{guide['user__first_name']} {guide['user__last_name'] or ''}".strip()
+
+
+def park_choices():
+    return get_choices('parks')
+
+
+def tour_choices(user=None):
+    """
+    (id, name) pairs of the tours a user may schedule, following the same
+    rules as AvailabilityForm's tour queryset. None means all tours.
+    """
+    rows = get_choices('tours')
+    tours, operators = rows['tours'], rows['operators']
+    if user is None or user.is_superuser or not hasattr(user, 'profile'):
+        visible = tours
+    else:
+        profile = user.profile
+        operated = {company_id for company_id, user_ids in operators.items() if user.id in user_ids}
+        if profile.is_operator() and profile.is_staff():
+            visible = [tour for tour in tours if tour['company_id'] in operated or tour['company__is_uwa']]
+        elif profile.is_operator():
+            visible = [tour for tour in tours if tour['company_id'] in operated]
+        elif profile.is_staff():
+            visible = [tour for tour in tours if tour['company__is_uwa']]
+        else:
+            visible = []
+    return [(tour['id'], tour['name']) for tour in visible]
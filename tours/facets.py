@@ -0,0 +1,150 @@
+"""
+Facet counts for the tour list filters.
+
+The availabilities left by the non-facet filters (dates, slots, search)
+are read once as compact rows. A single pass over them counts, for every
+park, guide, price bucket and duration bucket, the distinct tours that
+would match if that value were picked while the other facet selections
+stay as they are.
+
+Price and duration buckets are histograms over the tours in the result,
+with boundaries at quantiles rounded to readable values.
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from math import floor, log10
+
+from booking.forms import parse_range
+
+PRICE_BUCKETS = 4
+DURATION_BUCKETS = 3
+
+
+def _round_down(value, step):
+    return int(floor(value / step) * step)
+
+
+def _price_step(value):
+    """Readable rounding step for a price: 10, 25, 50, 100, 250, 500, ..."""
+    if value < 10:
+        return 1
+    magnitude = 10 ** int(floor(log10(value)))
+    for step in (magnitude // 4 or 1, magnitude // 2 or 1, magnitude):
+        if value / step <= 10:
+            return step
+    return magnitude
+
+
+def histogram_edges(values, buckets, step=None):
+    """
+    Lower bounds of up to `buckets` ranges splitting values into groups of
+    similar size. The first bound is 0; bounds are rounded down to step
+    (or to a readable step for the value when step is None).
+    """
+    values = sorted(values)
+    if not values:
+        return []
+    edges = [0]
+    for i in range(1, buckets):
+        quantile = values[len(values) * i // buckets]
+        edge = _round_down(quantile, step or _price_step(quantile))
+        if edge > edges[-1]:
+            edges.append(edge)
+    return edges
+
+
+def range_value(edges, index):
+    low = edges[index]
+    return f'{low}-{edges[index + 1]}' if index + 1 < len(edges) else f'{low}+'
+
+
+def range_label(value, unit_prefix='', unit_suffix=''):
+    low, high = parse_range(value)
+    if high is None:
+        return f'{unit_prefix}{low}{unit_suffix}+'
+    if low == 0:
+        return f'Under {unit_prefix}{high}{unit_suffix}'
+    return f'{unit_prefix}{low} - {unit_prefix}{high}{unit_suffix}'
+
+
+def in_range(value, selected):
+    low, high = selected
+    return value >= low and (high is None or value < high)
+
+
+def tour_facets(availabilities, selected, park_choices, guide_choices):
+    """
+    Facet options with tour counts for the tour list filters.
+
+    availabilities: queryset with every filter applied except the facets.
+    selected: dict with the chosen 'park' and 'guide' ids and 'price' and
+      'duration' range values (None when not chosen).
+    park_choices, guide_choices: (id, label) pairs to list.
+    Returns lists of {'value', 'label', 'count', 'selected'} per facet.
+    """
+    rows = list(availabilities.order_by().values_list(
+        'tour_id', 'tour__park_id', 'guide_id', 'tour__price', 'tour__duration_hours'
+    ).distinct())
+
+    tours = {tour_id: (price, duration) for tour_id, park_id, guide_id, price, duration in rows}
+    price_edges = histogram_edges([price for price, duration in tours.values()], PRICE_BUCKETS)
+    duration_edges = histogram_edges([duration for price, duration in tours.values()], DURATION_BUCKETS, step=1)
+
+    price_range = parse_range(selected['price']) if selected.get('price') else None
+    duration_range = parse_range(selected['duration']) if selected.get('duration') else None
+
+    matching = {facet: defaultdict(set) for facet in ('park', 'guide', 'price', 'duration')}
+    for tour_id, park_id, guide_id, price, duration in rows:
+        passes = {
+            'park': not selected.get('park') or park_id == selected['park'],
+            'guide': not selected.get('guide') or guide_id == selected['guide'],
+            'price': price_range is None or in_range(price, price_range),
+            'duration': duration_range is None or in_range(duration, duration_range),
+        }
+        values = {
+            'park': park_id,
+            'guide': guide_id,
+            'price': bisect_right(price_edges, price) - 1,
+            'duration': bisect_right(duration_edges, duration) - 1,
+        }
+        for facet in matching:
+            # Count this facet's value if all the other selections match
+            if all(ok for other, ok in passes.items() if other != facet):
+                matching[facet][values[facet]].add(tour_id)
+
+    def options(facet, choices, selected_value):
+        return [{
+            'value': value,
+            'label': label,
+            'count': len(matching[facet].get(key, ())),
+            'selected': value == selected_value,
+        } for key, value, label in choices]
+
+    price_choices = [
+        (i, range_value(price_edges, i), range_label(range_value(price_edges, i), unit_prefix='$'))
+        for i in range(len(price_edges))
+    ]
+    duration_choices = [
+        (i, range_value(duration_edges, i), range_label(range_value(duration_edges, i), unit_suffix='h'))
+        for i in range(len(duration_edges))
+    ]
+    facets = {
+        'parks': options('park', [(park_id, park_id, label) for park_id, label in park_choices],
+                         selected.get('park')),
+        'guides': options('guide', [(guide_id, guide_id, label) for guide_id, label in guide_choices],
+                          selected.get('guide')),
+        'price_ranges': options('price', price_choices, selected.get('price')),
+        'durations': options('duration', duration_choices, selected.get('duration')),
+    }
+
+    # Keep a chosen range listed even if today's histogram no longer has it
+    for facet, key, unit_prefix, unit_suffix in (('price_ranges', 'price', '$', ''), ('durations', 'duration', '', 'h')):
+        value = selected.get(key)
+        if value and not any(option['selected'] for option in facets[facet]):
+            facets[facet].insert(0, {
+                'value': value,
+                'label': range_label(value, unit_prefix, unit_suffix),
+                'count': None,
+                'selected': True,
+            })
+    return facets
@@ -3,6 +3,7 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 from .models import Park, Tour, Guide
 from booking.models import Availability
+from .choices import get_choices, guide_name, tour_choices
 
 
 class ParkForm(forms.ModelForm):
@@ -462,13 +463,13 @@ class AvailabilityForm(forms.ModelForm):
         self.user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
         
-        # Customize the guide dropdown to show names
+        # Customize the guide dropdown to show names (from the shared choice cache)
         guide_choices = [('', 'No guide assigned')]
-        for guide in Guide.objects.select_related('user').all():
-            name = f"{guide.user.first_name} {guide.user.last_name}".strip()
-            if guide.specialization:
-                name += f" ({guide.specialization})"
-            guide_choices.append((guide.id, name or guide.user.username))
+        for guide in get_choices('guides'):
+            name = guide_name(guide)
+            if guide['specialization']:
+                name += f" ({guide['specialization']})"
+            guide_choices.append((guide['id'], name or guide['user__username']))
         
         self.fields['guide'].choices = guide_choices
         
@@ -502,6 +503,10 @@ class AvailabilityForm(forms.ModelForm):
                     # Regular users don't see any tours
                     self.fields['tour'].queryset = Tour.objects.none()
         
+        # Render the same tours from the shared choice cache; the queryset
+        # above still validates the submitted tour
+        self.fields['tour'].choices = [('', 'Select a tour')] + tour_choices(self.user)
+        
         # If we're editing an existing instance, set initial values
         if self.instance.pk:
             self.fields['total_slots'].initial = self.instance.slots_available
@@ -0,0 +1,144 @@
+"""
+Distance lookups on the Park latitude/longitude columns, without PostGIS.
+
+Every park with coordinates stores the number of its GRID_DEGREES x
+GRID_DEGREES cell in Park.geo_cell (set by Park.save()). Cells are
+numbered row by row from the south-west corner of the map, so the cells of
+one row of a bounding box are a contiguous range: a radius search reads a
+few index ranges of geo_cell, one per row, and computes the great-circle
+distance of those candidates only, with NumPy.
+
+parks_within() answers "parks within X km of here" and nearest_parks()
+"the closest parks to here", looking further only when too few are near.
+"""
+import math
+
+import numpy as np
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+GRID_DEGREES = 0.25  # About 28 km of latitude
+GRID_ROWS = int(180 / GRID_DEGREES)
+GRID_COLUMNS = int(360 / GRID_DEGREES)
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+HALF_CIRCUMFERENCE_KM = math.pi * EARTH_RADIUS_KM
+
+# Beyond this many rows of cells a search is narrowed by latitude only
+MAX_GRID_ROWS = 64
+
+
+def parse_coordinates(latitude, longitude):
+    """(latitude, longitude) as floats, or None unless both are valid"""
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
+
+
+def _row(latitude):
+    return min(int((latitude + 90) // GRID_DEGREES), GRID_ROWS - 1)
+
+
+def _column(longitude):
+    return int((longitude + 180) // GRID_DEGREES) % GRID_COLUMNS
+
+
+def grid_cell(latitude, longitude):
+    """Number of the grid cell holding a point, or None without coordinates"""
+    if latitude is None or longitude is None:
+        return None
+    return _row(float(latitude)) * GRID_COLUMNS + _column(float(longitude))
+
+
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in km from one point to arrays of points"""
+    latitude, longitude = np.radians(latitude), np.radians(longitude)
+    latitudes = np.radians(np.asarray(latitudes, dtype=float))
+    longitudes = np.radians(np.asarray(longitudes, dtype=float))
+    a = (np.sin((latitudes - latitude) / 2) ** 2
+         + np.cos(latitude) * np.cos(latitudes) * np.sin((longitudes - longitude) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def _bounding_cells(latitude, longitude, radius_km):
+    """
+    Filter on geo_cell (or on latitude, for very large radii) selecting the
+    cells of the bounding box of a circle; None when it spans the globe.
+    """
+    latitude_span = radius_km / KM_PER_DEGREE
+    south, north = latitude - latitude_span, latitude + latitude_span
+    if radius_km >= HALF_CIRCUMFERENCE_KM:
+        return None
+    if south <= -90 or north >= 90:
+        # Around a pole every longitude is in reach
+        return Q(latitude__gte=max(south, -90), latitude__lte=min(north, 90))
+
+    # The widest parallel of the box is the one nearest a pole
+    widest = max(abs(south), abs(north))
+    longitude_span = latitude_span / math.cos(math.radians(widest))
+    if longitude_span >= 180:
+        columns = [(0, GRID_COLUMNS - 1)]
+    else:
+        west, east = _column(longitude - longitude_span), _column(longitude + longitude_span)
+        # The box may cross the antimeridian
+        columns = [(west, east)] if west <= east else [(west, GRID_COLUMNS - 1), (0, east)]
+
+    rows = range(_row(south), _row(north) + 1)
+    if len(rows) > MAX_GRID_ROWS:
+        return Q(latitude__gte=south, latitude__lte=north)
+    condition = Q()
+    for row in rows:
+        for first, last in columns:
+            condition |= Q(geo_cell__range=(row * GRID_COLUMNS + first, row * GRID_COLUMNS + last))
+    return condition
+
+
+def _with_coordinates(queryset):
+    from .models import Park
+
+    return (Park.objects.all() if queryset is None else queryset).filter(geo_cell__isnull=False)
+
+
+def _by_distance(latitude, longitude, candidates, radius_km):
+    """The candidates within radius_km (None: any distance), nearest first, with distance_km"""
+    if not candidates:
+        return []
+    distances = haversine_km(
+        latitude, longitude,
+        [park.latitude for park in candidates], [park.longitude for park in candidates],
+    )
+    parks = []
+    for position in np.argsort(distances, kind='stable'):
+        if radius_km is not None and distances[position] > radius_km:
+            break
+        park = candidates[position]
+        park.distance_km = round(float(distances[position]), 1)
+        parks.append(park)
+    return parks
+
+
+def parks_within(latitude, longitude, radius_km, queryset=None):
+    """
+    Parks of the queryset (all parks by default) within radius_km of the
+    point, nearest first, each with its distance in a distance_km attribute.
+    """
+    queryset = _with_coordinates(queryset)
+    cells = _bounding_cells(latitude, longitude, radius_km)
+    if cells is not None:
+        queryset = queryset.filter(cells)
+    return _by_distance(latitude, longitude, list(queryset), radius_km)
+
+
+def nearest_parks(latitude, longitude, limit=5, queryset=None, start_km=100):
+    """
+    The limit parks nearest to the point, as for parks_within. The parks
+    within start_km are read first; only when they are too few are all
+    parks ranked, in one more query.
+    """
+    parks = parks_within(latitude, longitude, start_km, queryset)
+    if len(parks) < limit:
+        parks = _by_distance(latitude, longitude, list(_with_coordinates(queryset)), None)
+    return parks[:limit]
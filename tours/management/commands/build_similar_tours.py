@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tours.similarity import SIMILAR_TOURS_K, build_similar_tours
+
+
+class Command(BaseCommand):
+    help = 'Recompute the similar tours of every tour from parks, prices, descriptions, bookings and wishlists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=SIMILAR_TOURS_K, help='Neighbours kept per tour')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = build_similar_tours(k=options['k'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored the {options["k"]} most similar tours of {count} tours in {time.perf_counter() - start:.2f} s.'
+        ))
@@ -0,0 +1,100 @@
+import re
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from booking.models import Availability, Booking, Payment
+from ratings.models import Rating
+from tours.models import Tour
+
+# Plan lines reading a whole table, per database vendor
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!CONSTANT ROW|\()(\S+)(?!.*\bINDEX\b)'),
+    'postgresql': re.compile(r'\bSeq Scan on (\S+)'),
+}
+
+
+def hot_queries():
+    """(view, description, queryset) for the queries behind the busiest pages"""
+    today = timezone.now().date()
+    tour_id = Tour.objects.values_list('id', flat=True).first() or 0
+    availability_id = Availability.objects.values_list('id', flat=True).first() or 0
+    tourist_id = Booking.objects.values_list('tourist_id', flat=True).first() or 0
+    transaction_id = Payment.objects.exclude(gateway_transaction_id='').values_list(
+        'gateway_transaction_id', flat=True
+    ).first() or 'unknown'
+    tour_type = ContentType.objects.get_for_model(Tour)
+
+    return [
+        ('tour_list', 'open dates in date order',
+         Availability.objects.filter(date__gte=today, slots_available__gt=0).order_by('date', 'id')[:16]),
+        ('public_availability_list', 'future dates, first keyset page',
+         Availability.objects.filter(date__gte=today).order_by('date', 'id')[:16]),
+        ('tour_detail', "a tour's upcoming dates per month",
+         Availability.objects.filter(tour_id=tour_id, date__gte=today).annotate(month=TruncMonth('date'))
+         .values('month').annotate(dates=Count('id'), fully_booked=Count('id', filter=Q(slots_available=0)))
+         .order_by('month')),
+        ('check_availability', 'one date',
+         Availability.objects.filter(pk=availability_id).only('slots_available', 'updated_at')),
+        ('reserve_slots', 'seats held on a date',
+         Booking.objects.filter(availability_id=availability_id, booking_status__in=['pending', 'confirmed'])
+         .order_by().values('availability_id').annotate(seats=Sum('num_of_people'))),
+        ('user_bookings', "a tourist's bookings, first keyset page",
+         Booking.objects.filter(tourist_id=tourist_id).order_by('-booking_date', '-id')[:11]),
+        ('profile', "a tourist's confirmed bookings",
+         Booking.objects.filter(tourist_id=tourist_id, booking_status='confirmed').order_by('-booking_date')),
+        ('get_ratings', 'approved reviews of a tour',
+         Rating.objects.filter(content_type=tour_type, object_id=tour_id, status=Rating.PUBLISHED_STATUS).order_by('-created_at')[:5]),
+        ('payment_webhook', 'payment by gateway transaction',
+         Payment.objects.filter(gateway_transaction_id=transaction_id).order_by()),
+        ('expire_pending_bookings', 'lapsed holds',
+         Booking.objects.filter(booking_status='pending', hold_expires_at__lt=timezone.now()).order_by()),
+        ('manage_users', 'first keyset page of users',
+         User.objects.order_by('username', 'id')[:21]),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Show the query plans of the hot page queries and flag full table scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', action='append', help='Only explain the queries of this view (repeatable)')
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help='Exit with an error when a query reads a whole table')
+
+    def handle(self, *args, **options):
+        full_scan = FULL_SCAN_PATTERNS.get(connection.vendor)
+        if full_scan is None:
+            self.stdout.write(self.style.WARNING(
+                f"Full scans are not recognised on {connection.vendor}; showing the plans only"
+            ))
+
+        self.stdout.write("=== HOT QUERY PLANS ===")
+        flagged = []
+        for view, description, queryset in hot_queries():
+            if options['view'] and view not in options['view']:
+                continue
+            plan = queryset.explain()
+            scans = full_scan.findall(plan) if full_scan else []
+
+            label = f"{view}: {description}"
+            if scans:
+                flagged.append(label)
+                self.stdout.write(self.style.ERROR(f"{label} -- FULL SCAN of {', '.join(scans)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(label))
+            for line in plan.splitlines():
+                self.stdout.write(f"    {line}")
+
+        if flagged:
+            message = f"{len(flagged)} quer{'y reads' if len(flagged) == 1 else 'ies read'} a whole table"
+            if options['fail_on_scan']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('No full table scans.'))
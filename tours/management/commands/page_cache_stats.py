@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tours.page_cache import page_cache_stats, reset_page_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show hit and miss counts of the public page cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Reset the counters after showing them')
+
+    def handle(self, *args, **options):
+        # Importing the URLconf registers the cached views
+        from django.urls import get_resolver
+        get_resolver().url_patterns
+
+        for view_name, counts in sorted(page_cache_stats().items()):
+            total = counts['hits'] + counts['misses']
+            ratio = f"{counts['hits'] / total:.0%}" if total else '-'
+            self.stdout.write(f"{view_name:<20} hits {counts['hits']:>8}  misses {counts['misses']:>8}  hit ratio {ratio}")
+        if options['reset']:
+            reset_page_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from tours.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the tour full-text search index from tours, parks and scheduled guides'
+
+    def handle(self, *args, **options):
+        indexed = get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} tours for search.'))
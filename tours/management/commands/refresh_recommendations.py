@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tours.recommendations import refresh_also_booked
+
+
+class Command(BaseCommand):
+    help = 'Fold new wishlist items and bookings into the "people who saved this also booked" lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recount every list, also dropping removed wishlist items and cancelled bookings')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        result = refresh_also_booked(full=options['full'])
+        counted = 'all users' if result['users'] is None else f"{result['users']} users"
+        self.stdout.write(self.style.SUCCESS(
+            f"Counted {counted}; {result['tours']} tours changed, in {time.perf_counter() - start:.2f} s."
+        ))
@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# The FTS5 table of tours.search.SqliteFTS5SearchBackend, filled from the
+# tables as they are at this migration; later changes are picked up by the
+# index signals or the rebuild_search_index command.
+CREATE_SEARCH_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tours_search USING fts5("
+    "name, description, park_name, park_location, guide_names, guide_specializations, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "INSERT INTO tours_search(rowid, name, description, park_name, park_location, "
+    "guide_names, guide_specializations) "
+    "SELECT t.id, t.name, t.description, p.name, p.location, "
+    "COALESCE((SELECT group_concat(u.first_name || ' ' || u.last_name, ' ') "
+    "FROM (SELECT DISTINCT guide_id FROM booking_availability WHERE tour_id = t.id) a "
+    "JOIN tours_guide g ON g.id = a.guide_id JOIN auth_user u ON u.id = g.user_id), ''), "
+    "COALESCE((SELECT group_concat(g.specialization, ' ') "
+    "FROM (SELECT DISTINCT guide_id FROM booking_availability WHERE tour_id = t.id) a "
+    "JOIN tours_guide g ON g.id = a.guide_id), '') "
+    "FROM tours_tour t JOIN tours_park p ON p.id = t.park_id",
+]
+DROP_SEARCH_INDEX = "DROP TABLE IF EXISTS tours_search"
+
+
+class SqliteRunSQL(migrations.RunSQL):
+    """RunSQL applied on SQLite only; other databases search without FTS5"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0009_park_altitude_m_park_area_sqkm_park_contact_email_and_more'),
+        ('booking', '0002_booking_hold_expires_at'),
+    ]
+
+    operations = [
+        SqliteRunSQL(CREATE_SEARCH_INDEX, DROP_SEARCH_INDEX),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0010_tour_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarTour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbour_of', to='tours.tour')),
+                ('tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='tours.tour')),
+            ],
+            options={
+                'ordering': ['tour', 'rank'],
+                'unique_together': {('tour', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0011_similartour'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecommendationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SavedAlsoBooked',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('users', models.PositiveIntegerField()),
+                ('booked_tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booked_by_savers_of', to='tours.tour')),
+                ('saved_tour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='also_booked', to='tours.tour')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['saved_tour', '-users', 'booked_tour'], name='tours_also_booked_rank')],
+                'unique_together': {('saved_tour', 'booked_tour')},
+            },
+        ),
+    ]
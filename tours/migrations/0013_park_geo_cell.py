@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:09
+
+from django.db import migrations, models
+
+from tours.geo import grid_cell
+
+
+def fill_geo_cells(apps, schema_editor):
+    Park = apps.get_model('tours', 'Park')
+    parks = list(Park.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    for park in parks:
+        park.geo_cell = grid_cell(park.latitude, park.longitude)
+    Park.objects.bulk_update(parks, ['geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0012_savedalsobooked'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='park',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(fill_geo_cells, migrations.RunPython.noop),
+    ]
@@ -2,7 +2,8 @@
 from django.db import models
 from django.conf import settings # To link to the User model
 from accounts.models import Profile, UserRole
-from ratings.models import RatableMixin
+from ratings.models import RatableMixin, RatableQuerySet
+from .geo import grid_cell
 
 class TourCompany(RatableMixin, models.Model):
     """
@@ -26,6 +27,8 @@ class TourCompany(RatableMixin, models.Model):
         help_text="Users with operator permissions for this company"
     )
     
+    objects = RatableQuerySet.as_manager()
+    
     def __str__(self):
         return self.name
     
@@ -44,6 +47,8 @@ class Park(RatableMixin, models.Model):
     altitude_m = models.IntegerField(blank=True, null=True, help_text="Altitude in meters above sea level")
     latitude = models.DecimalField(max_digits=10, decimal_places=6, blank=True, null=True, help_text="Latitude coordinates")
     longitude = models.DecimalField(max_digits=10, decimal_places=6, blank=True, null=True, help_text="Longitude coordinates")
+    # Grid cell of the coordinates, for distance searches (see tours.geo)
+    geo_cell = models.IntegerField(blank=True, null=True, db_index=True, editable=False)
     
     # Wildlife and vegetation information
     vegetation_type = models.TextField(blank=True, help_text="Description of vegetation types")
@@ -62,13 +67,24 @@ class Park(RatableMixin, models.Model):
     contact_phone = models.CharField(max_length=20, blank=True, help_text="Contact phone number")
     website_url = models.URLField(blank=True, help_text="Official website URL")
 
+    objects = RatableQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.geo_cell = grid_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geo_cell'}
+        super().save(*args, **kwargs)
+
 class Guide(RatableMixin, models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     specialization = models.CharField(max_length=100, help_text="e.g., Birding, Primates")
     
+    objects = RatableQuerySet.as_manager()
+    
     def save(self, *args, **kwargs):
         # Automatically add the 'guide' role when creating a Guide
         super().save(*args, **kwargs)
@@ -97,6 +113,8 @@ class Tour(RatableMixin, models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = RatableQuerySet.as_manager()
 
     @property
     def duration(self):
@@ -113,4 +131,60 @@ class Tour(RatableMixin, models.Model):
         return self.company.name
 
     def __str__(self):
-        return f"{self.name} in {self.park.name} by {self.company.name}"
\ No newline at end of file
+        return f"{self.name} in {self.park.name} by {self.company.name}"
+
+
+class SimilarTour(models.Model):
+    """
+    A precomputed neighbour of a tour, ranked from 1 (most similar).
+    Rebuilt offline by tours.similarity.build_similar_tours().
+    """
+    tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='neighbours')
+    similar = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='neighbour_of')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['tour', 'rank']
+        unique_together = ['tour', 'rank']
+
+    def __str__(self):
+        return f"{self.similar_id} is #{self.rank} similar to {self.tour_id}"
+
+
+class SavedAlsoBooked(models.Model):
+    """
+    How many users who saved saved_tour to their wishlist also booked
+    booked_tour; maintained by tours.recommendations.refresh_also_booked().
+    """
+    saved_tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='also_booked')
+    booked_tour = models.ForeignKey(Tour, on_delete=models.CASCADE, related_name='booked_by_savers_of')
+    users = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ['saved_tour', 'booked_tour']
+        indexes = [
+            # The list of one tour, most shared first
+            models.Index(fields=['saved_tour', '-users', 'booked_tour'], name='tours_also_booked_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.users} savers of {self.saved_tour_id} booked {self.booked_tour_id}"
+
+    @staticmethod
+    def tours_for(saved_tour_ids, limit=4):
+        """Tours most booked by users who saved one of the given tours, other than those"""
+        return Tour.objects.filter(
+            booked_by_savers_of__saved_tour_id__in=saved_tour_ids
+        ).exclude(pk__in=saved_tour_ids).annotate(
+            savers=models.Sum('booked_by_savers_of__users')
+        ).select_related('park').order_by('-savers', 'id')[:limit]
+
+
+class RecommendationWatermark(models.Model):
+    """Last row of a source table folded into the recommendations"""
+    source = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.source} up to {self.last_id}"
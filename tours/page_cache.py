@@ -0,0 +1,181 @@
+"""
+Response cache for anonymous visits to the public pages.
+
+A page is cached under its view, arguments and query string together with
+the current versions of the tags it depends on ('tour:12', 'park:3',
+'parks', ...). Model signals bump exactly the tags a change affects (see
+tours/signals.py), which makes every dependent page miss on its next visit;
+stale entries simply expire. Tag versions themselves expire after
+CACHE_VERSION_TIMEOUT, so a process whose cache never sees a bust (a
+per-process backend under several workers) serves stale pages for a
+bounded time only; the tours.W001 check warns about such a setup.
+
+Hits and misses are counted per view in the cache; see the
+page_cache_stats management command.
+
+The same tag versions make the ETag of conditional_page: a visitor
+revalidating an unchanged page gets a 304 before the view runs.
+"""
+import hashlib
+from functools import wraps
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import SESSION_KEY, HASH_SESSION_KEY
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from accounts.access import get_access_version
+from accounts.notifications import get_inbox_version
+
+PAGE_CACHE_TIMEOUT = 60 * 15
+
+# Views using cache_public_page, for the statistics
+CACHED_VIEWS = []
+
+
+def _tag_key(tag):
+    return f'page_cache_tag:{tag}'
+
+
+def _stats_key(view_name, outcome):
+    return f'page_cache_stats:{view_name}:{outcome}'
+
+
+def _count(view_name, outcome):
+    key = _stats_key(view_name, outcome)
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, None)
+
+
+def page_cache_stats():
+    """{view name: {'hits': n, 'misses': n}} for every cached view"""
+    keys = [_stats_key(name, outcome) for name in CACHED_VIEWS for outcome in ('hits', 'misses')]
+    counts = cache.get_many(keys)
+    return {
+        name: {outcome: counts.get(_stats_key(name, outcome), 0) for outcome in ('hits', 'misses')}
+        for name in CACHED_VIEWS
+    }
+
+
+def reset_page_cache_stats():
+    cache.delete_many([_stats_key(name, outcome) for name in CACHED_VIEWS for outcome in ('hits', 'misses')])
+
+
+def _tag_versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, uuid4().hex, settings.CACHE_VERSION_TIMEOUT)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def pages_version(*tags):
+    """Current version of the given tags; changes whenever one is busted"""
+    return ':'.join(_tag_versions(tags))
+
+
+def bust_pages(*tags):
+    """Invalidate every cached page depending on one of the tags, on commit"""
+    tags = set(tags)
+    if tags:
+        def bump():
+            cache.set_many({_tag_key(tag): uuid4().hex for tag in tags}, settings.CACHE_VERSION_TIMEOUT)
+        transaction.on_commit(bump)
+
+
+def cache_public_page(tags):
+    """
+    Cache a view's responses for anonymous GET requests.
+    tags is called with the view's URL keyword arguments and returns the
+    dependency tags of the page.
+    """
+    def decorator(view):
+        view_name = view.__name__
+        CACHED_VIEWS.append(view_name)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (request.method not in ('GET', 'HEAD') or request.user.is_authenticated
+                    or len(messages.get_messages(request))):
+                return view(request, *args, **kwargs)
+
+            versions = _tag_versions(tags(**kwargs))
+            query = sorted(request.GET.lists())
+            fingerprint = repr((view_name, args, sorted(kwargs.items()), query, versions))
+            key = 'page_cache:' + hashlib.md5(fingerprint.encode()).hexdigest()
+
+            cached = cache.get(key)
+            if cached is not None:
+                _count(view_name, 'hits')
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'HIT'
+                return response
+
+            _count(view_name, 'misses')
+            response = view(request, *args, **kwargs)
+            # A page rendering a CSRF token is specific to this visitor
+            if (response.status_code == 200 and not response.streaming and not response.cookies
+                    and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+                cache.set(key, (response.content, response['Content-Type']), PAGE_CACHE_TIMEOUT)
+            response['X-Page-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_page(tags, versions=None):
+    """
+    Answer conditional GETs of a page with 304 Not Modified while it is
+    unchanged for the visitor.
+
+    The ETag combines the versions of the page's dependency tags (tags is
+    called with the URL keyword arguments, as for cache_public_page), those
+    returned by versions(**kwargs) if given, today's date, and what the
+    layout shows of the visitor: their account, notification inbox version,
+    access version (roles and flags, which decide the management buttons)
+    and CSRF cookie. It is built from the session and the cache only, so a
+    304 costs no database query.
+    """
+    def etag(request, *args, **kwargs):
+        if len(messages.get_messages(request)):
+            return None  # Pending messages must be rendered
+        user_id = request.session.get(SESSION_KEY)
+        parts = [
+            timezone.localdate().isoformat(),
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            *_tag_versions(tags(**kwargs)),
+            *(versions(**kwargs) if versions else []),
+        ]
+        if user_id is not None:
+            parts += [
+                str(user_id), request.session.get(HASH_SESSION_KEY, ''),
+                get_inbox_version(user_id), get_access_version(user_id),
+            ]
+        return hashlib.md5(':'.join(parts).encode()).hexdigest()
+
+    def decorator(view):
+        conditional_view = condition(etag_func=etag)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Always revalidate; pages of a signed-in visitor are theirs only
+            patch_cache_control(response, no_cache=True)
+            if request.session.get(SESSION_KEY) is not None:
+                patch_cache_control(response, private=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,197 @@
+"""
+Keyset (cursor) pagination for long listings.
+
+Django's Paginator counts the whole result and reads every page with an
+OFFSET, so deep pages get slower and slower. KeysetPaginator continues
+from the sort key of the row at the edge of the current page instead:
+?after=<cursor> reads the next per_page rows with a WHERE on the ordering
+columns and ?before=<cursor> the previous ones, at the same cost on any
+page. Rows inserted or deleted meanwhile never shift a page.
+
+The ordering must be total: its last field has to be unique (normally the
+primary key) and none of the fields may be NULL.
+
+Totals are optional: paginator.count is only computed when asked for, and
+can be capped with count_limit so it stays cheap on huge results; listings
+then show e.g. "1000+" (see LISTING_COUNT_LIMIT).
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import cached_property
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# Rows counted for the totals of long listings; beyond it they show "N+"
+LISTING_COUNT_LIMIT = 1000
+
+
+def _cursor_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()  # Keeps microseconds, unlike DjangoJSONEncoder
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    data = json.dumps([_cursor_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """The key values of a cursor, or None if it is malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+class KeysetPage:
+    """One page of a KeysetPaginator; iterates like a Django Page"""
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_previous or self._has_next
+
+    @property
+    def next_cursor(self):
+        """Cursor for ?after= to reach the next page"""
+        if self._has_next and self.object_list:
+            return self.paginator.cursor_for(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        """Cursor for ?before= to reach the previous page"""
+        if self._has_previous and self.object_list:
+            return self.paginator.cursor_for(self.object_list[0])
+        return None
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by the values of its ordering fields.
+    ordering: field names as for order_by(), e.g. ('date', 'id') or
+    ('-created_at', '-id'); related fields ('park__name') are allowed.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count_limit=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = list(ordering)
+        self.count_limit = count_limit
+        self._fields = [(name.lstrip('-'), name.startswith('-')) for name in self.ordering]
+
+    @cached_property
+    def count(self):
+        """Number of rows; at most count_limit + 1 when a limit is set"""
+        queryset = self.queryset.order_by()
+        if self.count_limit is None:
+            return queryset.count()
+        return queryset[:self.count_limit + 1].count()
+
+    @property
+    def count_is_capped(self):
+        """Whether there are more rows than count_limit"""
+        return self.count_limit is not None and self.count > self.count_limit
+
+    @property
+    def capped_count(self):
+        """The number of rows to show: at most count_limit, with a + when count_is_capped"""
+        return min(self.count, self.count_limit) if self.count_limit is not None else self.count
+
+    def aggregate(self, **aggregates):
+        """
+        Aggregates of the rows, over the first count_limit + 1 of them when a
+        limit is set. Pass total=Count('id') to fill in paginator.count too.
+        """
+        queryset = self.queryset.order_by()
+        if self.count_limit is not None:
+            queryset = queryset[:self.count_limit + 1]
+        values = queryset.aggregate(**aggregates)
+        if 'total' in values:
+            self.count = values['total']
+        return values
+
+    def cursor_for(self, obj):
+        values = []
+        for name, descending in self._fields:
+            value = obj
+            for attribute in name.split('__'):
+                value = getattr(value, attribute)
+            values.append(value)
+        return encode_cursor(values)
+
+    def _seek(self, values, backwards):
+        """Rows past the given key in the ordering (before it when backwards)"""
+        condition = Q()
+        for position, (name, descending) in enumerate(self._fields):
+            operator = 'lt' if descending != backwards else 'gt'
+            term = Q(**{f'{name}__{operator}': values[position]})
+            for earlier, (earlier_name, _) in enumerate(self._fields[:position]):
+                term &= Q(**{earlier_name: values[earlier]})
+            condition |= term
+        return condition
+
+    def _rows(self, values=None, backwards=False):
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, backwards))
+        ordering = self.ordering
+        if backwards:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        return rows[:self.per_page], len(rows) > self.per_page
+
+    def get_page(self, after=None, before=None):
+        """
+        The page following the `after` cursor, preceding the `before`
+        cursor, or the first page. Invalid cursors give the first page.
+        """
+        for cursor, backwards in ((before, True), (after, False)):
+            values = decode_cursor(cursor) if cursor else None
+            if values is None or len(values) != len(self._fields):
+                continue
+            try:
+                rows, more = self._rows(values, backwards)
+            except (ValidationError, ValueError, TypeError):
+                continue  # Values of the wrong type for the fields
+            if backwards:
+                if rows:
+                    rows.reverse()
+                    return KeysetPage(rows, self, has_previous=more, has_next=True)
+                break  # Nothing before any more: show the first page
+            return KeysetPage(rows, self, has_previous=True, has_next=more)
+
+        rows, more = self._rows()
+        return KeysetPage(rows, self, has_previous=False, has_next=more)
+
+
+def keyset_page(request, queryset, per_page, ordering, count_limit=None):
+    """The page of queryset asked for by the request's ?after= or ?before="""
+    paginator = KeysetPaginator(queryset, per_page, ordering, count_limit)
+    return paginator.get_page(after=request.GET.get('after'), before=request.GET.get('before'))
@@ -0,0 +1,132 @@
+"""
+"People who saved this also booked" lists, shown on tour pages and the
+wishlist (see SavedAlsoBooked.tours_for).
+
+SavedAlsoBooked holds, for every pair of tours, how many users have the
+first in their wishlist and booked the second: the product S^T B of the
+sparse user x tour matrices S (wishlists) and B (bookings), computed with
+tours.similarity.cross_occurrence.
+
+refresh_also_booked() folds in the wishlist and booking rows added since
+its last run (see RecommendationWatermark). Only the users owning new rows
+are counted again, as the difference between their pairs with and without
+the new rows. Wishlist removals and cancelled bookings are only taken out
+by a full rebuild, which the refresh_recommendations command runs with
+--full (e.g. nightly, with the incremental refresh every few minutes).
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Max
+
+from accounts.models import Wishlist
+from booking.models import Booking
+from .models import RecommendationWatermark, SavedAlsoBooked, Tour
+from .page_cache import bust_pages
+from .similarity import IGNORED_BOOKING_STATUSES, cross_occurrence
+
+
+def _saved(up_to, users=None):
+    rows = Wishlist.objects.filter(id__lte=up_to)
+    if users is not None:
+        rows = rows.filter(user_id__in=users)
+    return rows.values_list('user_id', 'tour_id').distinct().order_by()
+
+
+def _booked(up_to, users=None):
+    rows = Booking.objects.filter(id__lte=up_to).exclude(booking_status__in=IGNORED_BOOKING_STATUSES)
+    if users is not None:
+        rows = rows.filter(tourist_id__in=users)
+    return rows.values_list('tourist_id', 'availability__tour_id').distinct().order_by()
+
+
+def also_booked_counts(saved, booked, tour_ids):
+    """
+    Users per (saved tour id, booked tour id) pair from (user, tour id)
+    pairs of wishlist items and bookings; a tour is never paired with itself.
+    """
+    index = {tour_id: position for position, tour_id in enumerate(tour_ids)}
+
+    def arrays(pairs):
+        rows = [(user_id, index[tour_id]) for user_id, tour_id in pairs if tour_id in index]
+        return (np.array([user_id for user_id, _ in rows], dtype=np.int64),
+                np.array([position for _, position in rows], dtype=np.int64))
+
+    matrix = cross_occurrence(*arrays(saved), len(tour_ids), *arrays(booked), len(tour_ids))
+    np.fill_diagonal(matrix, 0)
+    saved_positions, booked_positions = np.nonzero(matrix)
+    return {
+        (tour_ids[saved_position], tour_ids[booked_position]): int(matrix[saved_position, booked_position])
+        for saved_position, booked_position in zip(saved_positions, booked_positions)
+    }
+
+
+def _apply_changes(changes):
+    """Add {(saved tour id, booked tour id): users} to the stored counts"""
+    saved_tour_ids = {saved_tour_id for saved_tour_id, _ in changes}
+    existing = {
+        (row.saved_tour_id, row.booked_tour_id): row
+        for row in SavedAlsoBooked.objects.filter(saved_tour_id__in=saved_tour_ids)
+    }
+    updated, created = [], []
+    for key, users in changes.items():
+        row = existing.get(key)
+        if row is None:
+            created.append(SavedAlsoBooked(saved_tour_id=key[0], booked_tour_id=key[1], users=users))
+        else:
+            row.users += users
+            updated.append(row)
+    SavedAlsoBooked.objects.bulk_update(updated, ['users'], batch_size=500)
+    SavedAlsoBooked.objects.bulk_create(created, batch_size=500)
+
+
+def refresh_also_booked(full=False):
+    """
+    Bring the also-booked counts up to date with the newest wishlist items
+    and bookings, or recount them all when full. Returns a dict with the
+    number of users counted and of tours whose list changed.
+    """
+    tour_ids = list(Tour.objects.order_by('id').values_list('id', flat=True))
+    with transaction.atomic():
+        watermarks = {}
+        for source in ('wishlist', 'booking'):
+            RecommendationWatermark.objects.get_or_create(source=source)
+            # Locked until commit, so that refreshes never overlap
+            watermarks[source] = RecommendationWatermark.objects.select_for_update().get(source=source)
+        wishlist_mark = Wishlist.objects.aggregate(last=Max('id'))['last'] or 0
+        booking_mark = Booking.objects.aggregate(last=Max('id'))['last'] or 0
+
+        if full:
+            counts = also_booked_counts(_saved(wishlist_mark), _booked(booking_mark), tour_ids)
+            changed = set(SavedAlsoBooked.objects.values_list('saved_tour_id', flat=True).distinct())
+            changed.update(saved_tour_id for saved_tour_id, _ in counts)
+            SavedAlsoBooked.objects.all().delete()
+            SavedAlsoBooked.objects.bulk_create([
+                SavedAlsoBooked(saved_tour_id=saved_tour_id, booked_tour_id=booked_tour_id, users=users)
+                for (saved_tour_id, booked_tour_id), users in counts.items()
+            ], batch_size=500)
+            users = None
+        else:
+            wishlist_from = watermarks['wishlist'].last_id
+            booking_from = watermarks['booking'].last_id
+            users = set(Wishlist.objects.filter(
+                id__gt=wishlist_from, id__lte=wishlist_mark
+            ).values_list('user_id', flat=True))
+            users.update(Booking.objects.filter(
+                id__gt=booking_from, id__lte=booking_mark
+            ).values_list('tourist_id', flat=True))
+
+            changes = {}
+            if users:
+                after = also_booked_counts(_saved(wishlist_mark, users), _booked(booking_mark, users), tour_ids)
+                before = also_booked_counts(_saved(wishlist_from, users), _booked(booking_from, users), tour_ids)
+                changes = {key: count - before.get(key, 0) for key, count in after.items()}
+                changes = {key: count for key, count in changes.items() if count}
+                _apply_changes(changes)
+            changed = {saved_tour_id for saved_tour_id, _ in changes}
+
+        watermarks['wishlist'].last_id = wishlist_mark
+        watermarks['booking'].last_id = booking_mark
+        RecommendationWatermark.objects.bulk_update(watermarks.values(), ['last_id'])
+        bust_pages(*[f'tour:{tour_id}' for tour_id in changed])
+
+    return {'users': len(users) if users is not None else None, 'tours': len(changed)}
@@ -0,0 +1,181 @@
+"""
+Full-text search over tours.
+
+Each tour is indexed as one document made of its name and description,
+its park's name and location, and the names and specializations of the
+guides scheduled on it. A search returns tour IDs, best match first, which
+views intersect with their other filters.
+
+The backend is chosen with the TOUR_SEARCH_BACKEND setting. The SQLite
+FTS5 backend keeps a virtual table in sync from model signals (see
+tours/signals.py); the icontains backend needs no index and works on any
+database. Where the FTS5 table does not exist (other databases, or a test
+database built without migrations) the FTS5 backend searches as the
+icontains one and leaves index updates aside.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+SEARCH_TABLE = 'tours_search'
+
+# Index columns with their bm25 weights; a hit in the tour name counts most
+SEARCH_COLUMNS = [
+    ('name', 10.0),
+    ('description', 1.0),
+    ('park_name', 5.0),
+    ('park_location', 3.0),
+    ('guide_names', 4.0),
+    ('guide_specializations', 2.0),
+]
+
+# Stay below SQLite's limit on bound parameters
+INDEX_BATCH_SIZE = 500
+
+
+def search_terms(query):
+    """Words of a search query, lowercased"""
+    return re.findall(r'\w+', query.lower())
+
+
+class TourSearchBackend:
+    """Interface of tour search backends"""
+
+    def search(self, query):
+        """Return matching tour IDs, best match first"""
+        raise NotImplementedError
+
+    def index_tours(self, tour_ids):
+        """(Re)index the given tours; tours that no longer exist are dropped"""
+
+    def remove_tours(self, tour_ids):
+        """Drop the given tours from the index"""
+
+    def rebuild(self):
+        """Rebuild the whole index; returns the number of indexed tours"""
+        return 0
+
+
+class IcontainsSearchBackend(TourSearchBackend):
+    """Unindexed fallback: substring matching in the database, unranked"""
+
+    def search(self, query):
+        from .models import Tour
+
+        matches = Tour.objects.all()
+        for term in search_terms(query):
+            matches = matches.filter(
+                Q(name__icontains=term) |
+                Q(description__icontains=term) |
+                Q(park__name__icontains=term) |
+                Q(park__location__icontains=term) |
+                Q(availability__guide__specialization__icontains=term) |
+                Q(availability__guide__user__first_name__icontains=term) |
+                Q(availability__guide__user__last_name__icontains=term)
+            )
+        return list(matches.order_by('id').values_list('id', flat=True).distinct())
+
+
+class SqliteFTS5SearchBackend(TourSearchBackend):
+    """Ranked prefix search on an SQLite FTS5 virtual table keyed by tour id"""
+
+    def __init__(self):
+        self.fallback = IcontainsSearchBackend()
+        self._has_index = None
+
+    def has_index(self):
+        """Whether the database holds the FTS5 table (checked once per process)"""
+        if self._has_index is None:
+            self._has_index = (
+                connection.vendor == 'sqlite' and SEARCH_TABLE in connection.introspection.table_names()
+            )
+        return self._has_index
+
+    CREATE_TABLE_SQL = (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+        + ', '.join(column for column, weight in SEARCH_COLUMNS)
+        + ", tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+
+    def _documents_sql(self, where):
+        """INSERT ... SELECT building the documents of the tours matching where"""
+        from booking.models import Availability
+        from .models import Tour, Park, Guide
+        from django.contrib.auth import get_user_model
+
+        tour = Tour._meta.db_table
+        park = Park._meta.db_table
+        guide = Guide._meta.db_table
+        user = get_user_model()._meta.db_table
+        availability = Availability._meta.db_table
+
+        scheduled_guides = (
+            f"FROM (SELECT DISTINCT guide_id FROM {availability} WHERE tour_id = t.id) a "
+            f"JOIN {guide} g ON g.id = a.guide_id JOIN {user} u ON u.id = g.user_id"
+        )
+        return (
+            f"INSERT INTO {SEARCH_TABLE}(rowid, {', '.join(column for column, weight in SEARCH_COLUMNS)}) "
+            f"SELECT t.id, t.name, t.description, p.name, p.location, "
+            f"COALESCE((SELECT group_concat(u.first_name || ' ' || u.last_name, ' ') {scheduled_guides}), ''), "
+            f"COALESCE((SELECT group_concat(g.specialization, ' ') {scheduled_guides}), '') "
+            f"FROM {tour} t JOIN {park} p ON p.id = t.park_id {where}"
+        )
+
+    def search(self, query):
+        if not self.has_index():
+            return self.fallback.search(query)
+        terms = search_terms(query)
+        if not terms:
+            return []
+        # Every term must match, as a word prefix
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for column, weight in SEARCH_COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+                f"ORDER BY bm25({SEARCH_TABLE}, {weights})",
+                [match]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def index_tours(self, tour_ids):
+        if not self.has_index():
+            return
+        tour_ids = list(tour_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(tour_ids), INDEX_BATCH_SIZE):
+                batch = tour_ids[start:start + INDEX_BATCH_SIZE]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", batch)
+                cursor.execute(self._documents_sql(f"WHERE t.id IN ({placeholders})"), batch)
+
+    def remove_tours(self, tour_ids):
+        if not self.has_index():
+            return
+        tour_ids = list(tour_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(tour_ids), INDEX_BATCH_SIZE):
+                batch = tour_ids[start:start + INDEX_BATCH_SIZE]
+                placeholders = ', '.join(['%s'] * len(batch))
+                cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", batch)
+
+    def rebuild(self):
+        if connection.vendor != 'sqlite':
+            return self.fallback.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute(self.CREATE_TABLE_SQL)
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+            cursor.execute(self._documents_sql(''))
+            cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+            self._has_index = True
+            return cursor.fetchone()[0]
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    """The configured tour search backend (one instance per process)"""
+    return import_string(settings.TOUR_SEARCH_BACKEND)()
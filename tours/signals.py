@@ -0,0 +1,237 @@
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from booking.models import Availability, Booking
+from booking.signals import booking_status_changed, availability_slots_changed
+from ratings.models import Rating
+from .models import Tour, Park, Guide, TourCompany
+from .search import get_search_backend
+from .autocomplete import invalidate_autocomplete
+from .choices import invalidate_choices
+from .page_cache import bust_pages
+
+logger = logging.getLogger(__name__)
+
+
+# Keep the tour search index in sync with the fields it covers
+
+def _update_search_index(tour_ids, remove=False):
+    """
+    Reindex (or drop) tours in a savepoint. A failed update is logged and
+    never fails the save; rebuild_search_index repairs the index.
+    """
+    backend = get_search_backend()
+    try:
+        with transaction.atomic():
+            if remove:
+                backend.remove_tours(tour_ids)
+            else:
+                backend.index_tours(tour_ids)
+    except DatabaseError:
+        logger.warning('Tour search index not updated', exc_info=True)
+
+
+@receiver(post_save, sender=Tour)
+def index_saved_tour(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _update_search_index([instance.pk])
+
+
+@receiver(post_delete, sender=Tour)
+def unindex_deleted_tour(sender, instance, **kwargs):
+    _update_search_index([instance.pk], remove=True)
+
+
+@receiver(post_save, sender=Park)
+def index_park_tours(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        _update_search_index(instance.tours.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Guide)
+def index_guide_tours(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        _update_search_index(
+            Availability.objects.filter(guide=instance).values_list('tour_id', flat=True).distinct()
+        )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def index_guide_user_tours(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Guide names come from their user account"""
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return  # e.g. the last_login update on every login
+    if not created and not raw:
+        _update_search_index(
+            Availability.objects.filter(guide__user=instance).values_list('tour_id', flat=True).distinct()
+        )
+
+
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def index_availability_tour(sender, instance, raw=False, **kwargs):
+    """The guides scheduled on a tour are part of its document"""
+    if not raw:
+        _update_search_index([instance.tour_id])
+
+
+# Suggestions of the search typeahead
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+@receiver(post_save, sender=Park)
+@receiver(post_delete, sender=Park)
+@receiver(post_save, sender=Guide)
+@receiver(post_delete, sender=Guide)
+def refresh_autocomplete(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_autocomplete()
+
+
+# Shared form choices
+
+@receiver(post_save, sender=Guide)
+@receiver(post_delete, sender=Guide)
+def refresh_guide_choices(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_choices('guides')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_guide_user_choices(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guide labels show the user's name"""
+    if update_fields is not None and not {'username', 'first_name', 'last_name'} & set(update_fields):
+        return
+    if not raw and Guide.objects.filter(user=instance).exists():
+        invalidate_choices('guides')
+
+
+@receiver(post_save, sender=Park)
+@receiver(post_delete, sender=Park)
+def refresh_park_choices(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_choices('parks')
+
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+@receiver(post_save, sender=TourCompany)
+@receiver(post_delete, sender=TourCompany)
+@receiver(m2m_changed, sender=TourCompany.operators.through)
+def refresh_tour_choices(sender, raw=False, **kwargs):
+    if not raw:
+        invalidate_choices('tours')
+
+
+# Public page cache: bust exactly the pages showing the changed object
+
+def _tour_page_tags(tour_ids):
+    """A tour appears on its own page and on its park's and company's pages"""
+    tags = set()
+    for tour_id, park_id, company_id in Tour.objects.filter(id__in=tour_ids).values_list('id', 'park_id', 'company_id'):
+        tags.update([f'tour:{tour_id}', f'park:{park_id}', f'company:{company_id}'])
+    return tags
+
+
+def _availability_page_tags(availabilities):
+    """Tour dates show on the tour, park (booking figures), guide and date list pages"""
+    tags = set()
+    for tour_id, park_id, guide_id in availabilities.values_list('tour_id', 'tour__park_id', 'guide_id'):
+        tags.update([f'tour:{tour_id}', f'park:{park_id}', 'availabilities'])
+        if guide_id:
+            tags.add(f'guide:{guide_id}')
+    return tags
+
+
+@receiver(post_save, sender=Tour)
+@receiver(post_delete, sender=Tour)
+def bust_tour_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bust_pages(
+            f'tour:{instance.pk}', f'park:{instance.park_id}', f'company:{instance.company_id}', 'parks', 'tours',
+            *_availability_page_tags(Availability.objects.filter(tour_id=instance.pk)),
+        )
+
+
+@receiver(post_save, sender=Park)
+@receiver(post_delete, sender=Park)
+def bust_park_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bust_pages(f'park:{instance.pk}', 'parks', 'tours',
+                   *_tour_page_tags(Tour.objects.filter(park_id=instance.pk).values('id')))
+
+
+@receiver(post_save, sender=TourCompany)
+@receiver(post_delete, sender=TourCompany)
+def bust_company_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bust_pages(f'company:{instance.pk}',
+                   *_tour_page_tags(Tour.objects.filter(company_id=instance.pk).values('id')))
+
+
+@receiver(post_save, sender=Guide)
+@receiver(post_delete, sender=Guide)
+def bust_guide_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bust_pages(f'guide:{instance.pk}', *_availability_page_tags(Availability.objects.filter(guide_id=instance.pk)))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def bust_guide_user_pages(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guide pages and tour dates show the guide's name"""
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    if not raw:
+        guide_ids = list(Guide.objects.filter(user=instance).values_list('id', flat=True))
+        if guide_ids:
+            bust_pages(*[f'guide:{guide_id}' for guide_id in guide_ids],
+                       *_availability_page_tags(Availability.objects.filter(guide_id__in=guide_ids)))
+
+
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def bust_availability_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        tags = {f'tour:{instance.tour_id}', 'availabilities'}
+        if instance.guide_id:
+            tags.add(f'guide:{instance.guide_id}')
+        tags.update(f'park:{park_id}' for park_id in Tour.objects.filter(pk=instance.tour_id).values_list('park_id', flat=True))
+        bust_pages(*tags)
+
+
+@receiver(availability_slots_changed)
+def bust_slot_pages(sender, availability_ids, **kwargs):
+    bust_pages(*_availability_page_tags(Availability.objects.filter(id__in=availability_ids)))
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def bust_booking_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bust_pages(*_availability_page_tags(Availability.objects.filter(id=instance.availability_id)))
+
+
+@receiver(booking_status_changed)
+def bust_booking_status_pages(sender, booking, **kwargs):
+    bust_pages(*_availability_page_tags(Availability.objects.filter(id=booking.availability_id)))
+
+
+RATED_PAGE_TAGS = {
+    'tour': ['tours'],
+    'park': ['parks'],
+    'guide': [],
+    'tourcompany': [],
+}
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def bust_rated_object_pages(sender, instance, raw=False, **kwargs):
+    """Ratings show on the rated object's page and, for tours and parks, on listings"""
+    model = instance.content_type.model
+    if not raw and model in RATED_PAGE_TAGS:
+        tag_prefix = 'company' if model == 'tourcompany' else model
+        bust_pages(f'{tag_prefix}:{instance.object_id}', *RATED_PAGE_TAGS[model])
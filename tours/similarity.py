@@ -0,0 +1,178 @@
+"""
+Offline similar-tours recommender behind tours.views.similar_tours.
+
+build_similar_tours() scores every pair of tours with NumPy and keeps the
+best SIMILAR_TOURS_K neighbours of each in the SimilarTour table, so the
+view answers with one indexed query. A pair's score is a weighted sum of
+components in [0, 1]:
+
+- park: 1 for tours in the same park
+- text: cosine of the TF-IDF vectors of name and description
+- price, duration: closeness of the log values, in standard deviations
+- booked, wishlisted: cosine of the tours' sets of users who booked or
+  saved them ("people who booked this also booked that")
+
+Run it with the build_similar_tours management command, e.g. nightly.
+Tours created since the last build fall back to tours of the same park.
+The matrices are tours x tours, which is small for any tour catalogue.
+"""
+from collections import Counter
+
+import numpy as np
+from django.db import transaction
+
+from accounts.models import Wishlist
+from booking.models import Booking
+from .models import SimilarTour, Tour
+from .page_cache import bust_pages
+from .search import search_terms
+
+SIMILAR_TOURS_K = 6
+
+WEIGHTS = {
+    'park': 0.30,
+    'text': 0.25,
+    'price': 0.10,
+    'duration': 0.10,
+    'booked': 0.15,
+    'wishlisted': 0.10,
+}
+
+# Bookings that say nothing about what the tourist liked
+IGNORED_BOOKING_STATUSES = ['cancelled', 'refunded']
+
+
+def text_similarity(documents):
+    """Cosine similarity of the TF-IDF vectors of the documents"""
+    counts = [Counter(term for term in search_terms(document) if len(term) > 2 and not term.isdigit())
+              for document in documents]
+    vocabulary = {term: column for column, term in enumerate(sorted(set().union(*counts)))}
+    vectors = np.zeros((len(documents), len(vocabulary)))
+    for row, terms in enumerate(counts):
+        for term, count in terms.items():
+            vectors[row, vocabulary[term]] = count
+    document_frequency = np.count_nonzero(vectors, axis=0)
+    vectors *= np.log((1 + len(documents)) / (1 + document_frequency)) + 1
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    return vectors @ vectors.T
+
+
+def closeness(values):
+    """exp(-d^2 / 2) of the distance d between log values, in standard deviations"""
+    logs = np.log1p(np.asarray(values, dtype=float))
+    spread = logs.std() or 1.0
+    distances = (logs[:, None] - logs[None, :]) / spread
+    return np.exp(-distances ** 2 / 2)
+
+
+def cross_occurrence(users_a, items_a, count_a, users_b, items_b, count_b):
+    """
+    count_a x count_b matrix of how many users have both an item of A and
+    an item of B: the product A^T B of the sparse user x item matrices given
+    as parallel arrays of (user, item index) pairs. No user x item matrix
+    is built: the pairs are joined on the user with array arithmetic and
+    counted with one bincount.
+    """
+    users_a, users_b = np.asarray(users_a), np.asarray(users_b)
+    items_a, items_b = np.asarray(items_a, dtype=np.int64), np.asarray(items_b, dtype=np.int64)
+    if not len(items_a) or not len(items_b):
+        return np.zeros((count_a, count_b), dtype=np.int64)
+
+    # Number the users and sort both sides by user
+    all_users, codes = np.unique(np.r_[users_a, users_b], return_inverse=True)
+    codes_a, codes_b = codes[:len(users_a)], codes[len(users_a):]
+    order_b = np.argsort(codes_b, kind='stable')
+    items_b = items_b[order_b]
+    sizes_b = np.bincount(codes_b, minlength=len(all_users))
+    starts_b = np.cumsum(sizes_b) - sizes_b
+
+    # Each element of A is paired with every element of B of its user
+    partners = sizes_b[codes_a]
+    left = np.repeat(np.arange(len(items_a)), partners)
+    offset = np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners)
+    right = np.repeat(starts_b[codes_a], partners) + offset
+    pairs = items_a[left] * count_b + items_b[right]
+    return np.bincount(pairs, minlength=count_a * count_b).reshape(count_a, count_b)
+
+
+def co_occurrence(users, items, item_count):
+    """item_count x item_count matrix of how many users have both items"""
+    return cross_occurrence(users, items, item_count, users, items, item_count)
+
+
+def co_occurrence_similarity(users, items, item_count):
+    """Cosine similarity of the items' sets of users"""
+    counts = co_occurrence(users, items, item_count).astype(float)
+    norms = np.sqrt(np.diag(counts))
+    scale = np.outer(norms, norms)
+    return np.divide(counts, scale, out=np.zeros_like(counts), where=scale > 0)
+
+
+def _interactions(pairs, index):
+    """Distinct (user, tour index) pairs as two arrays, for known tours"""
+    rows = [(user_id, index[tour_id]) for user_id, tour_id in set(pairs) if tour_id in index]
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    users, items = zip(*rows)
+    return np.array(users), np.array(items)
+
+
+def similarity_matrix(tours, bookings, wishlists):
+    """
+    Weighted pair scores of the tours.
+    tours: dicts with id, park_id, price, duration_hours, name, description
+    bookings, wishlists: (user id, tour id) pairs
+    """
+    index = {tour['id']: position for position, tour in enumerate(tours)}
+    count = len(tours)
+
+    parks = np.array([tour['park_id'] for tour in tours])
+    components = {
+        'park': (parks[:, None] == parks[None, :]).astype(float),
+        'text': text_similarity([f"{tour['name']} {tour['description']}" for tour in tours]),
+        'price': closeness([tour['price'] for tour in tours]),
+        'duration': closeness([tour['duration_hours'] for tour in tours]),
+        'booked': co_occurrence_similarity(*_interactions(bookings, index), count),
+        'wishlisted': co_occurrence_similarity(*_interactions(wishlists, index), count),
+    }
+    return sum(WEIGHTS[name] * matrix for name, matrix in components.items())
+
+
+def top_neighbours(scores, k):
+    """Indexes and scores of the k best other items of each row, best first"""
+    scores = scores.copy()
+    np.fill_diagonal(scores, -np.inf)
+    k = min(k, len(scores) - 1)
+    if k <= 0:
+        return np.zeros((len(scores), 0), dtype=np.int64), np.zeros((len(scores), 0))
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind='stable')
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+def build_similar_tours(k=SIMILAR_TOURS_K):
+    """Recompute the neighbours of every tour; returns the number of tours"""
+    tours = list(Tour.objects.order_by('id').values(
+        'id', 'park_id', 'price', 'duration_hours', 'name', 'description'
+    ))
+    bookings = Booking.objects.exclude(booking_status__in=IGNORED_BOOKING_STATUSES).values_list(
+        'tourist_id', 'availability__tour_id'
+    ).order_by()
+    wishlists = Wishlist.objects.values_list('user_id', 'tour_id').order_by()
+
+    neighbours = []
+    if len(tours) > 1:
+        best, best_scores = top_neighbours(similarity_matrix(tours, bookings, wishlists), k)
+        for position, tour in enumerate(tours):
+            for rank, (neighbour, score) in enumerate(zip(best[position], best_scores[position]), start=1):
+                neighbours.append(SimilarTour(
+                    tour_id=tour['id'], similar_id=tours[neighbour]['id'], rank=rank, score=float(score)
+                ))
+
+    with transaction.atomic():
+        SimilarTour.objects.all().delete()
+        SimilarTour.objects.bulk_create(neighbours, batch_size=500)
+        bust_pages('similar_tours')
+    return len(tours)
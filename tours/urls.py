@@ -15,6 +15,8 @@ urlpatterns = [
     path('guides/<int:guide_id>/', views.guide_detail, name='guide_detail'),
     path('companies/<int:company_id>/', views.company_detail, name='company_detail'),
     path('availability/', views.public_availability_list, name='public_availability_list'),
+    path('api/autocomplete/', views.tour_autocomplete, name='tour_autocomplete'),
+    path('api/parks/nearby/', views.nearby_parks, name='nearby_parks'),
     
     # Management views (Tour Operators and UWA Staff only)
     path('manage/parks/', views.manage_parks, name='manage_parks'),
@@ -5,13 +5,24 @@ from django.contrib import messages
 from django.utils import timezone
 from django.core.paginator import Paginator
 from django.http import JsonResponse
-from django.db.models import Q, Count, Min, Max, Sum, Avg
+from django.urls import reverse
+from django.views.decorators.http import condition
+from django.db.models import Q, Count, Min, Max, Sum, Avg, Case, When, F, Value, ExpressionWrapper, FloatField, OuterRef
+from django.db.models.functions import TruncMonth
+from datetime import date, timedelta
 import json
-from .models import Tour, Park, Guide, TourCompany
+from .models import Tour, Park, Guide, TourCompany, SavedAlsoBooked
+from .search import get_search_backend
+from .autocomplete import autocomplete_index
+from .facets import tour_facets
+from .page_cache import cache_public_page, conditional_page, pages_version
+from .choices import choices_version
+from .pagination import LISTING_COUNT_LIMIT, keyset_page
+from .geo import nearest_parks, parks_within, parse_coordinates
 # Import views from additional_views.py
 from .additional_views import guide_detail, company_detail
-from booking.models import Availability, Booking
-from booking.forms import AvailabilitySearchForm
+from booking.models import Availability, Booking, BookingRollup
+from booking.forms import AvailabilitySearchForm, parse_range
 from .forms import TourForm, ParkForm, AvailabilityForm
 from collections import defaultdict
 
@@ -30,6 +41,57 @@ def can_manage_tours(user):
     """Check if user can manage tours (Tour Operators or UWA Staff)"""
     return user.is_authenticated and (user.is_staff or (hasattr(user, 'profile') and (user.profile.is_operator() or user.profile.is_staff())))
 
+def _calculated_tour_rating(total_bookings, completed_tours):
+    """Popularity based rating shown on the tour cards"""
+    if total_bookings > 0:
+        completion_rate = completed_tours / total_bookings
+        # Base rating of 4.0, adjusted by completion rate and popularity
+        calculated_rating = 4.0 + (completion_rate * 0.8) + min(total_bookings / 100, 0.8)
+        calculated_rating = min(calculated_rating, 5.0)  # Cap at 5.0
+    else:
+        calculated_rating = 4.2  # Default rating for new tours
+    return round(calculated_rating, 1)
+
+def _tour_booking_stats(tour_ids):
+    """
+    Booking statistics for several tours in a single grouped query.
+    Returns {tour_id: {'current_bookings', 'completed_tours', 'total_bookings'}}.
+    """
+    if not tour_ids:
+        return {}
+
+    rows = Booking.objects.filter(
+        availability__tour_id__in=tour_ids
+    ).order_by().values('availability__tour_id').annotate(
+        # Current active bookings (confirmed and pending)
+        current_bookings=Count('id', filter=Q(
+            booking_status__in=['confirmed', 'pending'],
+            availability__date__gte=timezone.now().date()
+        )),
+        # Total completed tours
+        completed_tours=Count('id', filter=Q(booking_status='completed')),
+        total_bookings=Count('id'),
+    )
+    return {row.pop('availability__tour_id'): row for row in rows}
+
+def _guides_by_tour(availabilities, tour_ids):
+    """Distinct guides of the given availabilities, grouped by tour id"""
+    pairs = availabilities.filter(
+        tour_id__in=tour_ids,
+        guide__isnull=False
+    ).order_by().values_list('tour_id', 'guide_id').distinct()
+
+    guide_ids_by_tour = defaultdict(set)
+    for tour_id, guide_id in pairs:
+        guide_ids_by_tour[tour_id].add(guide_id)
+
+    all_guide_ids = set().union(*guide_ids_by_tour.values()) if guide_ids_by_tour else set()
+    guides = Guide.objects.select_related('user').in_bulk(all_guide_ids)
+    return {
+        tour_id: {guides[guide_id] for guide_id in guide_ids}
+        for tour_id, guide_ids in guide_ids_by_tour.items()
+    }
+
 def tour_list(request):
     """
     Modern tour list view with enhanced search and filtering.
@@ -41,9 +103,11 @@ def tour_list(request):
     availabilities = Availability.objects.filter(
         date__gte=timezone.now().date(),
         slots_available__gt=0
-    ).select_related('tour', 'tour__park', 'guide', 'guide__user').order_by('date')
+    )
     
     # Apply search filters
+    search_ranking = None
+    selected_facets = {}
     if form.is_valid():
         date_from = form.cleaned_data.get('date_from')
         date_to = form.cleaned_data.get('date_to')
@@ -60,112 +124,95 @@ def tour_list(request):
         if date_to:
             availabilities = availabilities.filter(date__lte=date_to)
             
-        # Park filter
-        if park:
-            availabilities = availabilities.filter(tour__park=park)
-            
-        # Guide filter
-        if guide:
-            availabilities = availabilities.filter(guide=guide)
-            
         # Minimum slots filter
         if min_slots:
             availabilities = availabilities.filter(slots_available__gte=min_slots)
             
-        # Price range filter
-        if price_range:
-            if price_range == '0-100':
-                availabilities = availabilities.filter(tour__price__lt=100)
-            elif price_range == '100-200':
-                availabilities = availabilities.filter(tour__price__gte=100, tour__price__lt=200)
-            elif price_range == '200-500':
-                availabilities = availabilities.filter(tour__price__gte=200, tour__price__lt=500)
-            elif price_range == '500+':
-                availabilities = availabilities.filter(tour__price__gte=500)
-                
-        # Duration filter
-        if duration:
-            if duration == '0-4':
-                availabilities = availabilities.filter(tour__duration_hours__lt=4)
-            elif duration == '4-8':
-                availabilities = availabilities.filter(tour__duration_hours__gte=4, tour__duration_hours__lte=8)
-            elif duration == '8+':
-                availabilities = availabilities.filter(tour__duration_hours__gt=8)
-                
-        # Search query filter
+        # Search query filter: ranked tour ids from the search index
         if search_query:
-            availabilities = availabilities.filter(
-                Q(tour__name__icontains=search_query) |
-                Q(tour__description__icontains=search_query) |
-                Q(tour__park__name__icontains=search_query) |
-                Q(tour__park__location__icontains=search_query) |
-                Q(guide__specialization__icontains=search_query) |
-                Q(guide__user__first_name__icontains=search_query) |
-                Q(guide__user__last_name__icontains=search_query)
-            )
-    
-    # Group availabilities by tour and calculate aggregate data
-    tour_data = {}
-    for availability in availabilities:
-        tour_id = availability.tour.id
-        if tour_id not in tour_data:
-            # Calculate booking statistics for this tour
-            tour_bookings = Booking.objects.filter(availability__tour_id=tour_id)
-            
-            # Current active bookings (confirmed and pending)
-            current_bookings = tour_bookings.filter(
-                booking_status__in=['confirmed', 'pending'],
-                availability__date__gte=timezone.now().date()
-            ).count()
-            
-            # Total completed tours
-            completed_tours = tour_bookings.filter(
-                booking_status='completed'
-            ).count()
-            
-            # Calculate average rating (mock for now - you can implement a rating system later)
-            # For now, we'll use a calculated rating based on popularity and completion rate
-            total_bookings = tour_bookings.count()
-            if total_bookings > 0:
-                completion_rate = completed_tours / total_bookings
-                # Base rating of 4.0, adjusted by completion rate and popularity
-                calculated_rating = 4.0 + (completion_rate * 0.8) + min(total_bookings / 100, 0.8)
-                calculated_rating = min(calculated_rating, 5.0)  # Cap at 5.0
-            else:
-                calculated_rating = 4.2  # Default rating for new tours
-            
-            tour_data[tour_id] = {
-                'tour': availability.tour,
-                'availabilities': [],
-                'total_dates': 0,
-                'earliest_date': availability.date,
-                'latest_date': availability.date,
-                'total_slots': 0,
-                'guides': set(),
-                'sample_availability': availability,
-                'current_bookings': current_bookings,
-                'completed_tours': completed_tours,
-                'rating': round(calculated_rating, 1)
-            }
-        
-        tour_data[tour_id]['availabilities'].append(availability)
-        tour_data[tour_id]['total_dates'] += 1
-        tour_data[tour_id]['total_slots'] += availability.slots_available
+            search_ranking = get_search_backend().search(search_query)
+            availabilities = availabilities.filter(tour_id__in=search_ranking)
         
-        # Track date range
-        if availability.date < tour_data[tour_id]['earliest_date']:
-            tour_data[tour_id]['earliest_date'] = availability.date
-        if availability.date > tour_data[tour_id]['latest_date']:
-            tour_data[tour_id]['latest_date'] = availability.date
-            
-        # Track unique guides
-        if availability.guide:
-            tour_data[tour_id]['guides'].add(availability.guide)
+        selected_facets = {
+            'park': park.id if park else None,
+            'guide': guide.id if guide else None,
+            'price': price_range or None,
+            'duration': duration or None,
+        }
     
-    # Convert to list and sort by earliest date
-    grouped_tours = list(tour_data.values())
-    grouped_tours.sort(key=lambda x: x['earliest_date'])
+    # Facet counts over the result before the facet filters narrow it
+    facets = tour_facets(
+        availabilities,
+        selected_facets,
+        park_choices=[choice for choice in form.fields['park'].choices if choice[0]],
+        guide_choices=[choice for choice in form.fields['guide'].choices if choice[0]],
+    )
     
+    # Facet filters: park, guide, price and duration buckets
+    if selected_facets.get('park'):
+        availabilities = availabilities.filter(tour__park_id=selected_facets['park'])
+    if selected_facets.get('guide'):
+        availabilities = availabilities.filter(guide_id=selected_facets['guide'])
+    if selected_facets.get('price'):
+        low, high = parse_range(selected_facets['price'])
+        availabilities = availabilities.filter(tour__price__gte=low)
+        if high is not None:
+            availabilities = availabilities.filter(tour__price__lt=high)
+    if selected_facets.get('duration'):
+        low, high = parse_range(selected_facets['duration'])
+        availabilities = availabilities.filter(tour__duration_hours__gte=low)
+        if high is not None:
+            availabilities = availabilities.filter(tour__duration_hours__lt=high)
+    
+    # Group availabilities by tour in the database; only the grouped rows are
+    # paginated, so the cost of the page does not grow with the catalogue
+    grouped_rows = availabilities.order_by().values('tour_id').annotate(
+        total_dates=Count('id'),
+        total_slots=Sum('slots_available'),
+        earliest_date=Min('date'),
+        latest_date=Max('date'),
+    )
+    if search_ranking:
+        # Best search matches first
+        grouped_rows = grouped_rows.order_by(
+            Case(*[When(tour_id=tour_id, then=rank) for rank, tour_id in enumerate(search_ranking)]),
+            'tour_id',
+        )
+    else:
+        grouped_rows = grouped_rows.order_by('earliest_date', 'tour_id')
+
+    paginator = Paginator(grouped_rows, 12)
+    page_number = request.GET.get('page')
+    page_obj = paginator.get_page(page_number)
+
+    page_rows = list(page_obj.object_list)
+    page_tour_ids = [row['tour_id'] for row in page_rows]
+
+    # Hydrate only the tours, guides and booking statistics of the current page
+    tours_by_id = Tour.objects.select_related('park').in_bulk(page_tour_ids)
+    guides_by_tour = _guides_by_tour(availabilities, page_tour_ids)
+    booking_stats = _tour_booking_stats(page_tour_ids)
+
+    grouped_tours = []
+    for row in page_rows:
+        tour_id = row['tour_id']
+        stats = booking_stats.get(tour_id, {})
+        grouped_tours.append({
+            'tour': tours_by_id[tour_id],
+            'total_dates': row['total_dates'],
+            'earliest_date': row['earliest_date'],
+            'latest_date': row['latest_date'],
+            'total_slots': row['total_slots'] or 0,
+            'guides': guides_by_tour.get(tour_id, set()),
+            'current_bookings': stats.get('current_bookings', 0),
+            'completed_tours': stats.get('completed_tours', 0),
+            'rating': _calculated_tour_rating(
+                stats.get('total_bookings', 0),
+                stats.get('completed_tours', 0),
+            ),
+        })
+    page_obj.object_list = grouped_tours
+
     # Get user's wishlist if authenticated
     user_wishlist_tour_ids = set()
     if request.user.is_authenticated:
@@ -181,21 +228,19 @@ def tour_list(request):
     # Add wishlist information to each tour
     for tour_data_item in grouped_tours:
         tour_data_item['is_in_wishlist'] = tour_data_item['tour'].id in user_wishlist_tour_ids
-    
-    # Pagination
-    paginator = Paginator(grouped_tours, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
+
     context = {
         'form': form,
         'grouped_tours': page_obj,
         'page_obj': page_obj,
         'user_wishlist_tour_ids': list(user_wishlist_tour_ids),
+        'facets': facets,
     }
     
     return render(request, 'tours/tour_list_modern.html', context)
 
+@conditional_page(lambda tour_id: [f'tour:{tour_id}'])
+@cache_public_page(lambda tour_id: [f'tour:{tour_id}'])
 def tour_detail(request, tour_id):
     """
     Modern tour detail view with enhanced booking interface and pagination.
@@ -206,88 +251,123 @@ def tour_detail(request, tour_id):
     base_query = Availability.objects.filter(
         tour=tour,
         date__gte=timezone.now().date()
-    ).select_related('guide', 'guide__user').order_by('date')
+    )
+    
+    # Every figure of the page comes from one grouped query with a row per
+    # month of upcoming dates, read from the (tour, date, slots_available)
+    # index: the months for the dropdown and the number of dates and fully
+    # booked dates of each
+    month_rows = list(
+        base_query.annotate(month=TruncMonth('date')).values('month').annotate(
+            dates=Count('id'),
+            fully_booked=Count('id', filter=Q(slots_available=0)),
+        ).order_by('month')
+    )
+    available_months = [row['month'] for row in month_rows]
+    total_count = sum(row['dates'] for row in month_rows)
+    fully_booked_count = sum(row['fully_booked'] for row in month_rows)
+    available_count = total_count - fully_booked_count
     
     # Handle month filtering
     selected_month = request.GET.get('month', '')
     filtered_availabilities = base_query
+    filtered_count = total_count
     
     if selected_month:
         try:
             year, month = map(int, selected_month.split('-'))
-            filtered_availabilities = base_query.filter(
-                date__year=year,
-                date__month=month
-            )
-        except (ValueError, TypeError):
+            month_start = date(year, month, 1)
+            month_end = (month_start + timedelta(days=31)).replace(day=1)
+        except (ValueError, TypeError, OverflowError):
             # Invalid month format, use all availabilities
             pass
-    
-    # Get available months for dropdown
-    available_months = base_query.dates('date', 'month', order='ASC')
-    
-    # Pagination - show 6 dates per page
-    from django.core.paginator import Paginator
+        else:
+            filtered_availabilities = base_query.filter(date__gte=month_start, date__lt=month_end)
+            filtered_count = sum(row['dates'] for row in month_rows if row['month'] == month_start)
+    
+    # Booking figures of each date are computed in the query, so the page of
+    # dates is only read when the availability fragment is rendered, and
+    # only with the columns it shows
+    total_spots = tour.max_participants
+    filtered_availabilities = filtered_availabilities.select_related('guide__user').only(
+        'date', 'slots_available', 'guide__user__username', 'guide__user__first_name', 'guide__user__last_name'
+    ).annotate(
+        total_spots=Value(total_spots),
+        spots_booked=Value(total_spots) - F('slots_available'),
+        booking_percentage=ExpressionWrapper(
+            (Value(total_spots) - F('slots_available')) * 100.0 / total_spots if total_spots > 0 else Value(0),
+            output_field=FloatField()
+        ),
+    ).order_by('date')
+    
+    # Pagination - show 6 dates per page; the count is known already
     paginator = Paginator(filtered_availabilities, 6)
+    paginator.count = filtered_count
     page_number = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_number)
     
-    # Calculate popularity statistics for all dates (not just filtered ones)
-    all_availabilities = base_query
-    fully_booked_count = 0
-    available_count = 0
-    
-    for availability in all_availabilities:
-        if availability.slots_available == 0:
-            fully_booked_count += 1
-        else:
-            available_count += 1
-    
-    # Add calculated fields for each availability on current page
-    for availability in page_obj:
-        # Calculate total spots and booked spots
-        total_spots = tour.max_participants
-        spots_booked = total_spots - availability.slots_available
-        availability.total_spots = total_spots
-        availability.spots_booked = spots_booked
-        availability.booking_percentage = (spots_booked / total_spots * 100) if total_spots > 0 else 0
+    # Every change to the tour's dates and bookings busts its page tag
+    availability_version = '{}-{}'.format(timezone.now().date().isoformat(), pages_version(f'tour:{tour.pk}'))
     
     context = {
         'tour': tour,
         'upcoming_availabilities': page_obj,
         'page_obj': page_obj,
-        'has_availability': all_availabilities.exists(),
+        'has_availability': total_count > 0,
         'fully_booked_count': fully_booked_count,
         'available_count': available_count,
-        'total_dates': filtered_availabilities.count(),
+        'total_dates': filtered_count,
         'available_months': available_months,
         'selected_month': selected_month,
+        'availability_version': availability_version,
+        # Kept up to date by tours.recommendations, which busts this page
+        'also_booked': SavedAlsoBooked.tours_for([tour.pk]),
     }
     
     # Use modern template
     return render(request, 'tours/tour_detail_modern.html', context)
 
+@cache_public_page(lambda tour_id: [f'tour:{tour_id}', 'tours', 'similar_tours'])
 def similar_tours(request, tour_id):
     """
     HTMX endpoint for loading similar tours.
+    Neighbours are precomputed by tours.similarity; one indexed query reads them.
     """
-    tour = get_object_or_404(Tour, pk=tour_id)
-    
-    # Find similar tours in the same park
-    similar = Tour.objects.filter(
-        park=tour.park
-    ).exclude(pk=tour_id).select_related('park')[:3]
+    similar = list(
+        Tour.objects.filter(neighbour_of__tour_id=tour_id).select_related('park').order_by('neighbour_of__rank')[:3]
+    )
     
-    # If not enough similar tours, add tours from other parks
-    if similar.count() < 3:
-        additional = Tour.objects.exclude(
-            park=tour.park
-        ).exclude(pk=tour_id).select_related('park')[:3 - similar.count()]
-        similar = list(similar) + list(additional)
+    if not similar:
+        # Tour added since the last build: other tours of the same park first
+        tour = get_object_or_404(Tour.objects.only('park_id'), pk=tour_id)
+        similar = Tour.objects.exclude(pk=tour_id).select_related('park').order_by(
+            Case(When(park_id=tour.park_id, then=0), default=1), 'id'
+        )[:3]
     
     context = {'similar_tours': similar}
     return render(request, 'tours/similar_tours_partial.html', context)
 
+AUTOCOMPLETE_LIMIT = 8
+
+
+def _autocomplete_etag(request):
+    """Suggestions only change with the index version; no query needed"""
+    return autocomplete_index.current_version()
+
+
+@condition(etag_func=_autocomplete_etag)
+def tour_autocomplete(request):
+    """
+    JSON typeahead suggestions for the tour search box.
+    Served from the in-memory prefix index, without database queries.
+    """
+    query = request.GET.get('q', '').strip()
+    return JsonResponse({
+        'query': query,
+        'suggestions': autocomplete_index.lookup(query, AUTOCOMPLETE_LIMIT),
+    })
+
+@conditional_page(lambda tour_id: [f'tour:{tour_id}'])
 def tour_booking_options(request, tour_id):
     """
     Show all available booking options for a specific tour.
@@ -320,11 +400,91 @@ def tour_booking_options(request, tour_id):
     return render(request, 'tours/tour_booking_options.html', context)
 
 
+NEARBY_RADIUS_KM = 100
+NEARBY_MAX_RADIUS_KM = 2000
+NEARBY_LIMIT = 10
+
+
+def _nearby_radius(request):
+    """The ?radius= in km (NEARBY_RADIUS_KM by default), or None if invalid"""
+    try:
+        radius = float(request.GET.get('radius') or NEARBY_RADIUS_KM)
+    except ValueError:
+        return None
+    return radius if 0 < radius <= NEARBY_MAX_RADIUS_KM else None
+
+
+def _park_distance_data(park):
+    return {
+        'id': park.id,
+        'name': park.name,
+        'location': park.location,
+        'latitude': float(park.latitude),
+        'longitude': float(park.longitude),
+        'distance_km': park.distance_km,
+        'url': reverse('tours:park_detail', args=[park.id]),
+    }
+
+
+@cache_public_page(lambda: ['parks', 'tours'])
+def nearby_parks(request):
+    """
+    JSON distance search over the parks with coordinates.
+    ?lat=&lng=&radius= gives the parks (and their tours) within radius km;
+    ?park=<id> the parks nearest to that one. Both take ?limit=.
+    """
+    try:
+        limit = min(int(request.GET.get('limit') or NEARBY_LIMIT), 50)
+    except ValueError:
+        limit = NEARBY_LIMIT
+    limit = max(limit, 1)
+
+    park_id = request.GET.get('park', '')
+    if park_id:
+        origin = None
+        if park_id.isdigit():
+            origin = Park.objects.filter(pk=park_id, geo_cell__isnull=False).only('latitude', 'longitude').first()
+        if origin is None:
+            return JsonResponse({'status': 'error', 'message': 'Unknown park or park without coordinates'}, status=404)
+        parks = nearest_parks(
+            float(origin.latitude), float(origin.longitude), limit, queryset=Park.objects.exclude(pk=origin.pk)
+        )
+        return JsonResponse({'status': 'success', 'parks': [_park_distance_data(park) for park in parks]})
+
+    near = parse_coordinates(request.GET.get('lat'), request.GET.get('lng'))
+    radius = _nearby_radius(request)
+    if near is None or radius is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Give lat and lng in degrees and a radius of at most {NEARBY_MAX_RADIUS_KM} km, or a park',
+        }, status=400)
+
+    parks = parks_within(*near, radius)[:limit]
+    distances = {park.id: park.distance_km for park in parks}
+    tours = Tour.objects.filter(park__in=distances).values('id', 'name', 'price', 'park_id')
+    tours = sorted(tours, key=lambda tour: (distances[tour['park_id']], tour['name']))
+    return JsonResponse({
+        'status': 'success',
+        'radius_km': radius,
+        'parks': [_park_distance_data(park) for park in parks],
+        'tours': [
+            {
+                **tour,
+                'price': float(tour['price']),
+                'distance_km': distances[tour['park_id']],
+                'url': reverse('tours:tour_detail', args=[tour['id']]),
+            }
+            for tour in tours
+        ],
+    })
+
+
 # Park Management Views (UWA Staff only)
 
+@cache_public_page(lambda: ['parks'])
 def park_list(request):
     """Public park list view"""
-    parks = Park.objects.prefetch_related('tours').annotate(
+    parks = Park.objects.with_ratings().prefetch_related('tours').annotate(
         tour_count=Count('tours'),
         min_price=Min('tours__price'),
         max_price=Max('tours__price')
@@ -339,7 +499,14 @@ def park_list(request):
             Q(location__icontains=search_query)
         )
     
+    # Parks within ?radius= km of ?lat=&lng=, nearest first
+    near = parse_coordinates(request.GET.get('lat'), request.GET.get('lng'))
+    radius = _nearby_radius(request)
+    if near is not None and radius is not None:
+        parks = parks_within(*near, radius, queryset=parks)
+    
     # Calculate total tours across all parks
+    parks = list(parks)
     total_tours = sum(park.tour_count for park in parks)
     
     # Check if user can manage parks
@@ -347,7 +514,10 @@ def park_list(request):
     
     context = {
         'parks': parks,
+        'parks_count': len(parks),
         'search_query': search_query,
+        'near': near if radius is not None else None,
+        'radius': radius,
         'total_tours': total_tours,
         'user_can_manage': user_can_manage,
         'is_management_view': False,  # This is the public view
@@ -356,17 +526,17 @@ def park_list(request):
     return render(request, 'tours/park_list.html', context)
 
 
-@user_passes_test(can_manage_parks, login_url='tours:tour_list')
 @user_passes_test(can_manage_parks, login_url='tours:tour_list')
 def manage_parks(request):
     """Park management dashboard for UWA Staff only"""
     search_query = request.GET.get('search', '')
     
-    parks = Park.objects.prefetch_related('tours').annotate(
+    parks = Park.objects.with_ratings().annotate(
         tour_count=Count('tours'),
         min_price=Min('tours__price'),
         max_price=Max('tours__price'),
-        total_bookings=Count('tours__availability__bookings')
+        total_bookings=BookingRollup.totals('bookings', BookingRollup.ACTIVE_STATUSES, tour__park=OuterRef('pk')),
+        total_revenue=BookingRollup.totals('revenue', BookingRollup.EARNED_STATUSES, tour__park=OuterRef('pk')),
     ).order_by('name')
     
     # Apply search filter
@@ -378,6 +548,7 @@ def manage_parks(request):
         )
     
     # Calculate total tours across all parks
+    parks = list(parks)
     total_tours = sum(park.tour_count for park in parks)
     
     context = {
@@ -386,7 +557,8 @@ def manage_parks(request):
         'total_tours': total_tours,
         'user_can_manage': True,
         'is_management_view': True,  # This is the management view
-        'total_parks': parks.count(),
+        'parks_count': len(parks),
+        'total_parks': len(parks),
     }
     return render(request, 'tours/park_list.html', context)
 
@@ -463,21 +635,24 @@ def delete_park(request, park_id):
     return JsonResponse({'success': False, 'message': 'Invalid request method.'})
 
 
+@conditional_page(lambda park_id: [f'park:{park_id}'])
+@cache_public_page(lambda park_id: [f'park:{park_id}'])
 def park_detail(request, park_id):
     """Detailed park view with tours - accessible to all users"""
     park = get_object_or_404(Park, id=park_id)
     
-    # Get park tours with statistics
-    tours = Tour.objects.filter(park=park).annotate(
+    # Get park tours with statistics; booking figures come from the
+    # per-tour rollups, so the only join is the one counted
+    tours = list(Tour.objects.filter(park=park).annotate(
         availability_count=Count('availability'),
-        booking_count=Count('availability__bookings'),
-        total_revenue=Sum('availability__bookings__total_cost')
-    ).order_by('name')
+        booking_count=BookingRollup.totals('bookings', BookingRollup.ACTIVE_STATUSES, tour=OuterRef('pk')),
+        total_revenue=BookingRollup.totals('revenue', BookingRollup.EARNED_STATUSES, tour=OuterRef('pk')),
+    ).order_by('name'))
     
     # Get park statistics
-    total_tours = tours.count()
-    total_bookings = sum(tour.booking_count or 0 for tour in tours)
-    total_revenue = sum(tour.total_revenue or 0 for tour in tours)
+    total_tours = len(tours)
+    total_bookings = sum(tour.booking_count for tour in tours)
+    total_revenue = sum(tour.total_revenue for tour in tours)
     
     # Calculate price range
     prices = [tour.price for tour in tours if tour.price]
@@ -549,6 +724,8 @@ def manage_tours(request):
     if company_filter:
         tours = tours.filter(company_id=company_filter)
     
+    filtered_tours = tours
+    
     # Get tour statistics
     tours = tours.annotate(
         availability_count=Count('availability'),
@@ -569,27 +746,28 @@ def manage_tours(request):
     else:
         companies = TourCompany.objects.none()
     
-    # Calculate statistics only on the filtered tours the user can access
-    average_price = tours.aggregate(avg_price=Avg('price'))['avg_price'] or 0
-    average_duration = tours.aggregate(avg_duration=Avg('duration_hours'))['avg_duration'] or 0
+    # Calculate statistics only on the filtered tours the user can access, in one query
+    stats = Tour.objects.filter(pk__in=filtered_tours.values('pk')).aggregate(
+        total=Count('id'), avg_price=Avg('price'), avg_duration=Avg('duration_hours')
+    )
+    average_price = stats['avg_price'] or 0
+    average_duration = stats['avg_duration'] or 0
     
-    # Paginate results
-    paginator = Paginator(tours, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination in park and tour name order
+    page_obj = keyset_page(request, tours.select_related('park'), 15, ('park__name', 'name', 'id'))
     
     # Check if user can manage parks
     user_can_manage_parks = request.user.is_authenticated and can_manage_parks(request.user)
     
     context = {
-        'tours': tours,  # For template compatibility
+        'tours': page_obj,  # For template compatibility
         'page_obj': page_obj,
         'search_query': search_query,
         'park_filter': park_filter,
         'company_filter': company_filter,
         'parks': parks,
         'companies': companies,
-        'total_tours': tours.count(),
+        'total_tours': stats['total'],
         'average_price': average_price,
         'average_duration': average_duration,
         'user_can_manage_parks': user_can_manage_parks,
@@ -856,7 +1034,6 @@ def manage_availability(request):
         
         if profile.is_operator() and profile.is_staff():
             # User has both operator and staff roles - show their company tours and UWA tours
-            from django.db.models import Q
             availabilities = availabilities.filter(
                 Q(tour__company__operators=request.user) | 
                 Q(tour__company__is_uwa=True)
@@ -907,10 +1084,6 @@ def manage_availability(request):
     # Order by date
     availabilities = availabilities.select_related('tour', 'tour__park', 'guide', 'guide__user').order_by('date')
     
-    # Get statistics
-    total_availabilities = availabilities.count()
-    total_available = availabilities.filter(slots_available__gt=0).count()
-    total_booked = availabilities.filter(slots_available=0).count()
     
     # Get tours and guides for filters, filtered by company access
     if request.user.is_superuser:
@@ -921,7 +1094,6 @@ def manage_availability(request):
         
         if profile.is_operator() and profile.is_staff():
             # User has both operator and staff roles - show their company tours and UWA tours
-            from django.db.models import Q
             tours = Tour.objects.filter(
                 Q(company__operators=request.user) | 
                 Q(company__is_uwa=True)
@@ -941,10 +1113,16 @@ def manage_availability(request):
         
     guides = Guide.objects.select_related('user').all().order_by('user__first_name')
     
-    # Pagination
-    paginator = Paginator(availabilities, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (date, id); the statistics count at most
+    # LISTING_COUNT_LIMIT dates, in one pass
+    page_obj = keyset_page(request, availabilities, 15, ('date', 'id'), count_limit=LISTING_COUNT_LIMIT)
+    stats = page_obj.paginator.aggregate(
+        total=Count('id'),
+        available=Count('id', filter=Q(slots_available__gt=0)),
+    )
+    total_availabilities = page_obj.paginator.capped_count
+    total_available = min(stats['available'], LISTING_COUNT_LIMIT)
+    total_booked = min(stats['total'] - stats['available'], LISTING_COUNT_LIMIT)
     
     # Create form for adding new availability
     if request.method == 'POST':
@@ -966,6 +1144,7 @@ def manage_availability(request):
         'total_availabilities': total_availabilities,
         'total_available': total_available,
         'total_booked': total_booked,
+        'counts_capped': page_obj.paginator.count_is_capped,
         'tours': tours,
         'guides': guides,
         'form': form,
@@ -1075,13 +1254,17 @@ def edit_availability_form(request, availability_id):
     return render(request, 'tours/availability_form.html', context)
 
 
+@conditional_page(
+    lambda: ['availabilities'],
+    lambda: [choices_version(name) for name in ('guides', 'parks', 'tours')],
+)
 def public_availability_list(request):
     """
     Public page for viewing tour availabilities/dates
     Shows the same information as manage_availability but with management buttons only for authorized users
     """
     # Get all availabilities (future dates only for public view)
-    availabilities = Availability.objects.select_related('tour', 'tour__company', 'tour__park').filter(
+    availabilities = Availability.objects.select_related('tour', 'tour__company', 'tour__park', 'guide', 'guide__user').filter(
         date__gte=timezone.now().date()  # Only show future dates for public view
     )
     
@@ -1128,10 +1311,6 @@ def public_availability_list(request):
     # Order by date
     availabilities = availabilities.order_by('date')
     
-    # Get statistics
-    total_availabilities = availabilities.count()
-    total_available = availabilities.filter(slots_available__gt=0).count()
-    total_booked = availabilities.filter(slots_available=0).count()
     
     # Get tours, parks and guides for filters
     tours = Tour.objects.all().order_by('name')
@@ -1141,16 +1320,23 @@ def public_availability_list(request):
     # Check if user can manage availabilities
     user_can_manage = request.user.is_authenticated and can_manage_tours(request.user)
     
-    # Pagination
-    paginator = Paginator(availabilities, 15)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on (date, id); the statistics count at most
+    # LISTING_COUNT_LIMIT dates, in one pass
+    page_obj = keyset_page(request, availabilities, 15, ('date', 'id'), count_limit=LISTING_COUNT_LIMIT)
+    stats = page_obj.paginator.aggregate(
+        total=Count('id'),
+        available=Count('id', filter=Q(slots_available__gt=0)),
+    )
+    total_availabilities = page_obj.paginator.capped_count
+    total_available = min(stats['available'], LISTING_COUNT_LIMIT)
+    total_booked = min(stats['total'] - stats['available'], LISTING_COUNT_LIMIT)
     
     context = {
         'page_obj': page_obj,
         'total_availabilities': total_availabilities,
         'total_available': total_available,
         'total_booked': total_booked,
+        'counts_capped': page_obj.paginator.count_is_capped,
         'tours': tours,
         'parks': parks,
         'guides': guides,